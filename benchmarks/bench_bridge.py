@@ -0,0 +1,427 @@
+"""Offline benchmark / load test for the bridge against a stub backend.
+
+Runs the real list_available_tools_impl, execute_tool_impl and the stdio
+`server.run` loop against benchmarks/stub_backend.py (an in-process
+httpx.MockTransport), so only bridge overhead is measured unless
+--upstream-latency-ms is set. Reports:
+
+* schema      - cold schema load + first tools/list, warm tools/list and
+                retained memory, for each schema size in --sizes
+* call        - sequential execute_tool_impl latency (p50/p99) and memory
+* concurrency - throughput and latency with N calls in flight
+* stdio       - tools/call round trips through stdio_server + server.run over
+                OS pipes, sequential and pipelined
+* feeds       - one order book feed fanned out to N subscribers: upstream
+                polls per update and time to notify every subscriber
+* endpoints   - three stub endpoints with different latencies: call latency
+                and traffic share once probed, then with the fastest one down
+
+Usage:
+    python benchmarks/bench_bridge.py [--quick] [--json results.json] [--compare baseline.json]
+
+Save --json output on one commit and pass it to --compare on another to see
+the change per metric.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from stub_backend import BASE_URL, StubBackend, routed_transport  # noqa: E402
+
+TICKER_ARGS = {"exchange": "binance", "symbol": "BTC/USDT"}
+
+
+def _configure_environment(args: argparse.Namespace) -> None:
+    """Settings must be in place before alara.bridge is imported."""
+    os.environ["ALARA_SCHEMA_CACHE"] = "0" # Every schema size is loaded cold
+    os.environ["ALARA_PREWARM_SCHEMA"] = "0"
+    os.environ["ALARA_RATE_LIMIT_EXCHANGE_RPS"] = "0" # Measure the bridge, not the client-side rate limit
+    if not args.response_cache:
+        os.environ["ALARA_RESPONSE_CACHE_SIZE"] = "0"
+    os.environ["LOG_LEVEL"] = args.log_level
+    os.environ.setdefault("ALARA_LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="alara-bench-"), "alara.log"))
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "p50_us": round(pick(0.50) * 1e6, 1),
+        "p99_us": round(pick(0.99) * 1e6, 1),
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 1),
+    }
+
+
+def _reset_schema_state(bridge: Any) -> None:
+    if bridge._schema_refresh_task:
+        bridge._schema_refresh_task.cancel()
+    bridge._schema = None
+
+
+async def _timed(fn: Callable[[], Awaitable[Any]]) -> float:
+    started = time.perf_counter()
+    await fn()
+    return time.perf_counter() - started
+
+
+async def bench_schema(bridge: Any, stub: StubBackend, sizes: List[int]) -> Dict[str, Any]:
+    results = {}
+    for size in sizes:
+        stub.set_schema_size(size)
+        _reset_schema_state(bridge)
+        cold = await _timed(bridge.list_available_tools_impl)
+        # Memory on a second cold load; tracemalloc would distort the timing above
+        _reset_schema_state(bridge)
+        gc.collect()
+        tracemalloc.start()
+        await bridge.list_available_tools_impl()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        warm = [await _timed(bridge.list_available_tools_impl) for _ in range(20)]
+        tools = await bridge.list_available_tools_impl()
+        results[str(size)] = {
+            "tools": len(tools),
+            "cold_ms": round(cold * 1000, 2),
+            "warm_p50_us": _percentiles(warm)["p50_us"],
+            "retained_kib": round(retained / 1024, 1),
+            "peak_kib": round(peak / 1024, 1),
+        }
+    # Leave a small schema loaded for the call benchmarks
+    stub.set_schema_size(10)
+    _reset_schema_state(bridge)
+    await bridge.list_available_tools_impl()
+    return results
+
+
+async def _check_call(bridge: Any, name: str, arguments: Dict[str, Any]) -> None:
+    result = await bridge.execute_tool_impl(name, dict(arguments))
+    if result and result[0].text.startswith("Error:"):
+        raise RuntimeError(f"Benchmark call {name} failed: {result[0].text}")
+
+
+async def bench_calls(bridge: Any, calls: int) -> Dict[str, Any]:
+    results = {}
+    scenarios = {
+        "fetch_ticker": TICKER_ARGS,
+        "fetch_trades_500": {**TICKER_ARGS, "limit": "500"}, # String limit exercises coercion
+        "create_order": {"exchange": "binance", "symbol": "BTC/USDT", "amount": 0.5, "side": "buy"},
+    }
+    for name, arguments in scenarios.items():
+        operation = name.split("_500")[0]
+        await _check_call(bridge, operation, arguments)
+        latencies = [await _timed(lambda: bridge.execute_tool_impl(operation, dict(arguments))) for _ in range(calls)]
+
+        gc.collect()
+        tracemalloc.start()
+        for _ in range(min(calls, 200)):
+            await bridge.execute_tool_impl(operation, dict(arguments))
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            **_percentiles(latencies),
+            "calls_per_s": round(calls / sum(latencies), 1),
+            "peak_kib_per_200_calls": round(peak / 1024, 1),
+            "retained_bytes_per_call": round(current / min(calls, 200), 1),
+        }
+    return results
+
+
+async def bench_concurrency(bridge: Any, calls: int, levels: List[int]) -> Dict[str, Any]:
+    results = {}
+    for level in levels:
+        semaphore = asyncio.Semaphore(level)
+        latencies: List[float] = []
+
+        async def one(i: int) -> None:
+            # Distinct symbols so single-flight coalescing does not hide the work
+            arguments = {"exchange": "binance", "symbol": f"SYM{i}/USDT"}
+            async with semaphore:
+                latencies.append(await _timed(lambda: bridge.execute_tool_impl("fetch_ticker", arguments)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        elapsed = time.perf_counter() - started
+        results[str(level)] = {**_percentiles(latencies), "calls_per_s": round(calls / elapsed, 1)}
+    return results
+
+
+class _CountingSession:
+    """Stands in for a ServerSession subscribed to a feed."""
+
+    def __init__(self, counter: Dict[str, int], done: asyncio.Event, expected: int):
+        self._counter = counter
+        self._done = done
+        self._expected = expected
+
+    async def send_notification(self, notification: Any) -> None:
+        self._counter["received"] += 1
+        if self._counter["received"] >= self._expected:
+            self._done.set()
+
+
+async def bench_feeds(bridge: Any, stub: StubBackend, levels: List[int], updates: int = 20) -> Dict[str, Any]:
+    feeds = bridge.get_feed_manager()
+    feeds.interval = 0.001
+    uri = "alara://orderbook/binance/BTC/USDT"
+    results = {}
+    for level in levels:
+        counter = {"received": 0}
+        done = asyncio.Event()
+        sessions = [_CountingSession(counter, done, level) for _ in range(level)]
+        for session in sessions:
+            feeds.subscribe(uri, bridge.api_key_identity("bench-key"), session)
+        while not feeds.get(uri, bridge.api_key_identity("bench-key")).version:
+            await asyncio.sleep(0.001)
+        fan_out: List[float] = []
+        requests_before = stub.requests
+        for _ in range(updates):
+            counter["received"] = 0
+            done.clear()
+            started = time.perf_counter()
+            stub.ticks += 1
+            await done.wait()
+            fan_out.append(time.perf_counter() - started)
+        polls = stub.requests - requests_before
+        for session in sessions:
+            feeds.unsubscribe(uri, bridge.api_key_identity("bench-key"), session)
+        results[str(level)] = {
+            "update_to_all_p50_us": _percentiles(fan_out)["p50_us"],
+            "upstream_polls_per_update": round(polls / updates, 1),
+        }
+    return results
+
+
+async def bench_endpoints(bridge: Any, calls: int) -> Dict[str, Any]:
+    from alara.http_client import create_http_client, get_http_client, set_http_client
+
+    backends = {"alara-eu.invalid": StubBackend(latency=0.006), "alara-us.invalid": StubBackend(latency=0.001),
+                "alara-ap.invalid": StubBackend(latency=0.003)}
+    original_client, original_url = get_http_client(), bridge.ALARA_PROD_URL
+    client = create_http_client(transport=routed_transport(backends))
+    set_http_client(client)
+    bridge.ALARA_PROD_URL = ",".join(f"http://{host}" for host in backends)
+    pool = bridge.get_endpoint_pool()
+    results = {}
+    try:
+        await pool.probe_all()
+
+        async def measure(label: str) -> None:
+            before = {host: backend.requests for host, backend in backends.items()}
+            samples = []
+            for i in range(calls):
+                samples.append(await _timed(lambda: _check_call(bridge, "fetch_ticker", {"exchange": "binance", "symbol": f"S{i}"})))
+            share = {host.split(".")[0]: backend.requests - before[host] for host, backend in backends.items()}
+            results[label] = {**_percentiles(samples), **{f"to_{name}": count for name, count in share.items()}}
+
+        await measure("fastest_up")
+        backends["alara-us.invalid"].down = "connect"
+        await measure("fastest_down")
+        results["failovers"] = pool.stats()["failovers"]
+    finally:
+        pool.stop_probes()
+        bridge.ALARA_PROD_URL = original_url
+        set_http_client(original_client)
+        await client.aclose()
+    return results
+
+
+class _StdioClient:
+    """Minimal JSON-RPC client talking to the bridge's stdio_server over OS pipes."""
+
+    def __init__(self, write_file: Any, read_file: Any):
+        self._write_file = write_file
+        self._read_file = read_file
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._reader: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock() # Writes run in worker threads; keep lines whole
+
+    async def _send(self, message: Dict[str, Any]) -> None:
+        async with self._write_lock:
+            await self._write_file.write(json.dumps(message) + "\n")
+            await self._write_file.flush()
+
+    def start(self) -> None:
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        async for line in self._read_file:
+            message = json.loads(line)
+            future = self._pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None) -> None:
+        message = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._send(message)
+
+    async def request(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        response = await future
+        if "error" in response or response.get("result", {}).get("isError"):
+            raise RuntimeError(f"{method} failed: {response}")
+        return response
+
+    async def close_input(self) -> None:
+        """Send EOF to the server, which makes server.run() return."""
+        await self._write_file.aclose()
+
+    async def wait_closed(self) -> None:
+        if self._reader:
+            await self._reader
+
+
+async def bench_stdio(bridge: Any, calls: int, pipelined: int) -> Dict[str, Any]:
+    import anyio
+    from mcp.server.lowlevel.server import NotificationOptions
+    from mcp.server.stdio import stdio_server
+
+    server = bridge.create_server()
+    init_options = server.create_initialization_options(NotificationOptions(tools_changed=True))
+    to_server_r, to_server_w = os.pipe()
+    to_client_r, to_client_w = os.pipe()
+    server_in = anyio.wrap_file(open(to_server_r, "r", encoding="utf-8"))
+    server_out = anyio.wrap_file(open(to_client_w, "w", encoding="utf-8"))
+    client = _StdioClient(anyio.wrap_file(open(to_server_w, "w", encoding="utf-8")),
+                          anyio.wrap_file(open(to_client_r, "r", encoding="utf-8")))
+
+    async with stdio_server(server_in, server_out) as (read_stream, write_stream):
+        server_task = asyncio.create_task(server.run(read_stream, write_stream, init_options))
+        client.start()
+        initialize = await _timed(lambda: client.request("initialize", {
+            "protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "alara-bench", "version": "0"},
+        }))
+        await client.notify("notifications/initialized")
+        tools_list = await _timed(lambda: client.request("tools/list", {}))
+
+        call_params = {"name": "fetch_ticker", "arguments": TICKER_ARGS}
+        await client.request("tools/call", call_params)
+        latencies = [await _timed(lambda: client.request("tools/call", call_params)) for _ in range(calls)]
+
+        semaphore = asyncio.Semaphore(pipelined)
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                await client.request("tools/call", {"name": "fetch_ticker", "arguments": {"exchange": "binance", "symbol": f"SYM{i}/USDT"}})
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        pipelined_elapsed = time.perf_counter() - started
+
+        await client.close_input()
+        await server_task
+    await server_out.aclose() # EOF for the client's read loop
+    await client.wait_closed()
+
+    return {
+        "initialize_us": round(initialize * 1e6, 1),
+        "tools_list_us": round(tools_list * 1e6, 1),
+        "sequential": {**_percentiles(latencies), "calls_per_s": round(calls / sum(latencies), 1)},
+        f"pipelined_{pipelined}": {"calls_per_s": round(calls / pipelined_elapsed, 1)},
+    }
+
+
+def _flatten(prefix: str, value: Any, out: Dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+
+
+def print_comparison(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    before: Dict[str, float] = {}
+    after: Dict[str, float] = {}
+    _flatten("", baseline.get("results", {}), before)
+    _flatten("", current["results"], after)
+    print(f"{'metric':<52} {'baseline':>12} {'current':>12} {'change':>9}")
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:<52} {old:>12} {new:>12} {change:>9}")
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    for section, values in results["results"].items():
+        print(f"\n[{section}]")
+        for name, metrics in values.items():
+            if isinstance(metrics, dict):
+                print(f"  {name:<22} " + "  ".join(f"{k}={v}" for k, v in metrics.items()))
+            else:
+                print(f"  {name:<22} {metrics}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import alara.bridge as bridge
+    from alara.http_client import close_http_client, create_http_client, set_http_client
+    from alara.logging_setup import configure_logging
+
+    configure_logging()
+    stub = StubBackend(latency=args.upstream_latency_ms / 1000)
+    bridge.ALARA_API_KEY = "bench-key"
+    bridge.ALARA_PROD_URL = BASE_URL
+    set_http_client(create_http_client(transport=stub.transport()))
+    results: Dict[str, Any] = {}
+    try:
+        results["schema"] = await bench_schema(bridge, stub, args.sizes)
+        results["call"] = await bench_calls(bridge, args.calls)
+        results["concurrency"] = await bench_concurrency(bridge, args.calls, args.concurrency)
+        results["stdio"] = await bench_stdio(bridge, args.calls, max(args.concurrency))
+        results["feeds"] = await bench_feeds(bridge, stub, args.subscribers)
+        results["endpoints"] = await bench_endpoints(bridge, min(args.calls, 200))
+    finally:
+        await close_http_client()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Alara bridge.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000], help="Schema sizes (operations) to load.")
+    parser.add_argument("--calls", type=int, default=2000, help="Tool calls per latency / throughput measurement.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64], help="Calls in flight for the throughput runs.")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 100, 1000], help="Subscribers per feed for the fan-out runs.")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0, help="Simulated backend latency per request.")
+    parser.add_argument("--response-cache", action="store_true", help="Keep the response cache enabled (off by default).")
+    parser.add_argument("--log-level", default="WARNING", help="Bridge LOG_LEVEL during the run (default WARNING).")
+    parser.add_argument("--quick", action="store_true", help="Small run for a smoke test (sizes 10 100, 200 calls, 1 and 100 subscribers).")
+    parser.add_argument("--json", metavar="PATH", help="Write results to PATH as JSON.")
+    parser.add_argument("--compare", metavar="PATH", help="Baseline JSON from a previous run to compare against.")
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes, args.calls, args.subscribers = [10, 100], 200, [1, 100]
+
+    _configure_environment(args)
+    results = {
+        "python": sys.version.split()[0],
+        "argv": sys.argv[1:],
+        "results": asyncio.run(run(args)),
+    }
+    print_results(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        print()
+        print_comparison(json.loads(Path(args.compare).read_text()), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Startup-time benchmark for the Alara bridge.
+
+Measures, in fresh interpreter processes:
+
+* import      - `import alara.main` (minus a bare interpreter start)
+* config      - wall time of `python -m alara.main --print-mcp-config`
+* initialize  - spawn of `python -m alara.main` until the MCP `initialize`
+                response arrives on stdout
+* tools_list  - as above, until the first `tools/list` response (only with
+                --backend-url, since it needs a reachable schema endpoint)
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--json] [--backend-url URL --api-key KEY]
+
+Run it on two commits with --json and diff the output to compare.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {
+        "protocolVersion": "2024-11-05",
+        "capabilities": {},
+        "clientInfo": {"name": "alara-bench", "version": "0"},
+    },
+}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+TOOLS_LIST = {"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+
+
+def _env(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+    env.update(extra or {})
+    return env
+
+
+def _wall(cmd: List[str], env: Dict[str, str]) -> float:
+    started = time.perf_counter()
+    subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+
+def _read_response(proc: subprocess.Popen, request_id: int) -> dict:
+    for line in proc.stdout:
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+    raise RuntimeError(f"bridge exited before answering request {request_id}")
+
+
+def _time_session(env: Dict[str, str], list_tools: bool) -> Dict[str, float]:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "alara.main"], env=env, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    timings = {}
+    try:
+        proc.stdin.write(json.dumps(INITIALIZE) + "\n")
+        proc.stdin.flush()
+        _read_response(proc, 1)
+        timings["initialize"] = time.perf_counter() - started
+        if list_tools:
+            proc.stdin.write(json.dumps(INITIALIZED) + "\n" + json.dumps(TOOLS_LIST) + "\n")
+            proc.stdin.flush()
+            _read_response(proc, 2)
+            timings["tools_list"] = time.perf_counter() - started
+    finally:
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return timings
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    p90 = ordered[min(len(ordered) - 1, int(round(0.9 * (len(ordered) - 1))))]
+    return {
+        "median_ms": round(statistics.median(ordered) * 1000, 1),
+        "p90_ms": round(p90 * 1000, 1),
+        "min_ms": round(ordered[0] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Processes started per measurement (default 10).")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results.")
+    parser.add_argument("--backend-url", help="Backend to load the schema from; enables the tools_list measurement.")
+    parser.add_argument("--api-key", default="bench", help="API key sent to --backend-url.")
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix="alara-bench-")
+    env = _env({
+        "ALARA_API_KEY": args.api_key,
+        # Without a backend, point at a closed port: the schema prewarm fails fast and in the background
+        "ALARA_MCP_URL": args.backend_url or "http://127.0.0.1:9",
+        "ALARA_LOG_FILE": os.path.join(log_dir, "alara.log"),
+        "ALARA_CACHE_DIR": os.path.join(log_dir, "cache"),
+    })
+
+    samples: Dict[str, List[float]] = {"import": [], "config": [], "initialize": []}
+    if args.backend_url:
+        samples["tools_list"] = []
+    for _ in range(args.runs):
+        bare = _wall([sys.executable, "-c", "pass"], env)
+        samples["import"].append(max(0.0, _wall([sys.executable, "-c", "import alara.main"], env) - bare))
+        samples["config"].append(_wall([sys.executable, "-m", "alara.main", "--api-key", "x", "--print-mcp-config"], env))
+        for name, value in _time_session(env, bool(args.backend_url)).items():
+            samples[name].append(value)
+
+    results = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "results": {name: _summary(values) for name, values in samples.items()},
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"Python {results['python']}, {args.runs} runs")
+    print(f"{'measurement':<12} {'median':>10} {'p90':>10} {'min':>10}")
+    for name, stats in results["results"].items():
+        print(f"{name:<12} {stats['median_ms']:>8.1f}ms {stats['p90_ms']:>8.1f}ms {stats['min_ms']:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
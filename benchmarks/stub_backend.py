@@ -0,0 +1,159 @@
+"""In-process stand-in for the Alara backend, used by the benchmarks.
+
+Serves a synthetic OpenAPI schema with a configurable number of operations and
+canned JSON responses through an httpx.MockTransport, so the bridge's real HTTP
+client, retry and parsing code runs without any network access. Several stubs
+can stand in for several backend endpoints behind one transport (see
+routed_transport), each with its own latency and outages.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, Optional, Union
+
+import httpx
+
+BASE_URL = "http://alara-stub.invalid"
+
+# Operations the benchmarks call directly; always present whatever the schema size
+FIXED_PATHS: Dict[str, Any] = {
+    "/api/ccxt/{exchange}/ticker": {"get": {
+        "operationId": "fetch_ticker", "tags": ["CCXT"], "summary": "Fetch ticker",
+        "parameters": [
+            {"$ref": "#/components/parameters/Exchange"},
+            {"name": "symbol", "in": "query", "required": True, "schema": {"type": "string"}},
+        ],
+        "responses": {"200": {"description": "ok"}},
+    }},
+    "/api/ccxt/{exchange}/orderbook": {"get": {
+        "operationId": "fetch_order_book", "tags": ["CCXT"], "summary": "Fetch order book",
+        "parameters": [
+            {"$ref": "#/components/parameters/Exchange"},
+            {"name": "symbol", "in": "query", "required": True, "schema": {"type": "string"}},
+        ],
+        "responses": {"200": {"description": "ok"}},
+    }},
+    "/api/ccxt/{exchange}/trades": {"get": {
+        "operationId": "fetch_trades", "tags": ["CCXT"], "summary": "Fetch trades",
+        "parameters": [
+            {"$ref": "#/components/parameters/Exchange"},
+            {"name": "symbol", "in": "query", "required": True, "schema": {"type": "string"}},
+            {"name": "since", "in": "query", "schema": {"type": "integer"}},
+            {"name": "limit", "in": "query", "schema": {"type": "integer", "minimum": 1, "maximum": 1000}},
+        ],
+        "responses": {"200": {"description": "ok"}},
+    }},
+    "/api/ccxt/{exchange}/order": {"post": {
+        "operationId": "create_order", "tags": ["CCXT"], "summary": "Create order",
+        "parameters": [{"$ref": "#/components/parameters/Exchange"}],
+        "requestBody": {"content": {"application/json": {"schema": {"$ref": "#/components/schemas/Order"}}}},
+        "responses": {"200": {"description": "ok"}},
+    }},
+}
+
+COMPONENTS: Dict[str, Any] = {
+    "parameters": {
+        "Exchange": {"name": "exchange", "in": "path", "required": True, "schema": {"type": "string"}},
+    },
+    "schemas": {
+        "Order": {
+            "type": "object", "required": ["symbol", "amount"],
+            "properties": {
+                "symbol": {"type": "string"},
+                "amount": {"type": "number", "exclusiveMinimum": 0},
+                "side": {"$ref": "#/components/schemas/Side"},
+                "params": {"type": "object", "additionalProperties": True},
+            },
+        },
+        "Side": {"type": "string", "enum": ["buy", "sell"]},
+    },
+}
+
+
+def make_schema(operations: int) -> Dict[str, Any]:
+    """Synthetic schema with `operations` generated operations besides FIXED_PATHS.
+
+    Every fifth generated operation carries a tag the bridge filters out, like
+    the internal endpoints of the real backend.
+    """
+    paths = dict(FIXED_PATHS)
+    for i in range(operations):
+        tag = "Internal" if i % 5 == 4 else ("CCXT" if i % 2 else "Exchanges")
+        paths[f"/api/ccxt/{{exchange}}/generated/{i}"] = {"get": {
+            "operationId": f"generated_{i}", "tags": [tag], "summary": f"Generated operation {i}",
+            "parameters": [
+                {"$ref": "#/components/parameters/Exchange"},
+                {"name": "symbol", "in": "query", "schema": {"type": "string"}},
+                {"name": "limit", "in": "query", "schema": {"type": "integer"}},
+            ],
+            "responses": {"200": {"description": "ok", "content": {"application/json": {
+                "schema": {"type": "object", "properties": {"value": {"type": "number"}}}}}}},
+        }}
+    return {"openapi": "3.1.0", "info": {"title": "Alara stub", "version": "1"}, "paths": paths, "components": COMPONENTS}
+
+
+class StubBackend:
+    def __init__(self, operations: int = 10, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        # Simulated outage: "connect" refuses connections, a status code answers every request with it
+        self.down: Optional[Union[str, int]] = None
+        self.ticks = 0 # Market data moves when this is advanced
+        self.set_schema_size(operations)
+
+    def set_schema_size(self, operations: int) -> None:
+        self.schema_body = json.dumps(make_schema(operations)).encode("utf-8")
+        self.schema_etag = '"' + hashlib.sha256(self.schema_body).hexdigest()[:32] + '"'
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.down == "connect":
+            raise httpx.ConnectError("stub endpoint is down", request=request)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.down is not None:
+            return httpx.Response(int(self.down), json={"detail": "stub endpoint unavailable"})
+        path = request.url.path
+        if path == "/openapi.json":
+            if request.headers.get("If-None-Match") == self.schema_etag:
+                return httpx.Response(304, headers={"ETag": self.schema_etag})
+            return httpx.Response(200, content=self.schema_body,
+                                  headers={"Content-Type": "application/json", "ETag": self.schema_etag})
+        parts = path.strip("/").split("/")
+        action = parts[-1] if len(parts) >= 4 else ""
+        query = dict(request.url.params)
+        if action == "ticker":
+            return httpx.Response(200, json={
+                "symbol": query.get("symbol"), "last": 64250.5 + self.ticks, "bid": 64250.0 + self.ticks, "ask": 64251.0 + self.ticks,
+                "baseVolume": 1234.5, "timestamp": 1700000000000 + self.ticks,
+            })
+        if action == "orderbook":
+            # 50 levels per side; each tick changes only the best level's size
+            return httpx.Response(200, json={
+                "symbol": query.get("symbol"),
+                "bids": [[64250.0 - i, 1.0 + (self.ticks if i == 0 else 0)] for i in range(50)],
+                "asks": [[64251.0 + i, 1.0 + (self.ticks if i == 0 else 0)] for i in range(50)],
+                "timestamp": 1700000000000 + self.ticks,
+            })
+        if action == "trades":
+            limit = int(query.get("limit", 100))
+            return httpx.Response(200, json=[
+                {"id": str(i), "timestamp": 1700000000000 + i, "price": 64000.0 + i, "amount": 0.01, "side": "buy"}
+                for i in range(limit)
+            ])
+        if action == "order":
+            return httpx.Response(200, json={"id": "stub-order", "status": "open", **json.loads(request.content or b"{}")})
+        return httpx.Response(200, json={"value": 1.0})
+
+
+def routed_transport(backends: Dict[str, StubBackend]) -> httpx.MockTransport:
+    """One transport for several stubs, chosen by the request's host name."""
+    async def handle(request: httpx.Request) -> httpx.Response:
+        backend = backends.get(request.url.host)
+        if backend is None:
+            raise httpx.ConnectError(f"no stub for {request.url.host}", request=request)
+        return await backend.handle(request)
+    return httpx.MockTransport(handle)
@@ -0,0 +1,1337 @@
+"""The Alara MCP server: schema loading, tool generation and tool execution.
+
+Imported lazily by alara.main so that the config helper and interpreter start
+stay fast; heavy dependencies (mcp, httpx) load here.
+"""
+import sys
+import json
+import logging
+import os
+import asyncio
+import hashlib
+import random
+import time
+import weakref
+from contextvars import Context, ContextVar
+from dataclasses import dataclass, replace
+import httpx
+import mcp.types as types
+from mcp.server.lowlevel.server import Server, InitializationOptions, NotificationOptions, request_ctx
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp.server.session import ServerSession
+from mcp.server.stdio import stdio_server
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from alara import schema_cache
+from alara.config import DEFAULT_BACKEND_URL, env_bool, env_float, env_int
+from alara.logging_setup import configure_logging
+from alara.continuations import ContinuationStore
+from alara.deadlines import CallTimeoutError, TimeoutPolicy, run_with_deadline, time_left
+from alara.encoding import RESULT_FORMATS, encode_result
+from alara.endpoints import Endpoint, EndpointPool, parse_endpoint_urls
+from alara.feeds import SYMBOL_ARGUMENT_NAMES, Feed, FeedError, FeedManager
+from alara.http_client import get_http_client, http_client_lifespan, pool_stats
+from alara.metrics import CallMetrics, Metrics, write_metrics_file
+from alara.pagination import Paginator
+from alara.projection import PROJECTION_OPTIONS, Projection, ProjectionError, compile_projection, projection_cache_stats
+from alara.resilience import CircuitOpenError, Resilience
+from alara.response_cache import EXCHANGE_ARGUMENT_NAMES, ResponseCache, exchange_scope
+from alara.singleflight import SingleFlight
+from alara.routes import RouteBindingError, bind_arguments
+from alara.schema_index import OperationRecord, SchemaIndex, build_schema_index
+from alara.validation import ArgumentValidationError
+
+# Handlers are attached by alara.logging_setup.configure_logging() when the bridge starts
+logger = logging.getLogger("AlaraStdioBridge")
+
+
+# --- Global Variables (consider class structure later) --- #
+_schema: Optional["SchemaSnapshot"] = None # Replaced as a whole, never mutated
+_schema_lock = asyncio.Lock()
+_schema_refresh_task: Optional[asyncio.Task] = None
+_schema_failures = 0 # Consecutive failed fetches, for the retry backoff
+_schema_refresh_key: Optional[str] = None # Key of the latest session that used the schema, for background refreshes
+ALARA_API_KEY: Optional[str] = None
+ALARA_PROD_URL: Optional[str] = None
+
+# API key of the client session being served; set per connection by alara.daemon.
+# The standalone bridge leaves it unset and uses ALARA_API_KEY.
+session_api_key: ContextVar[Optional[str]] = ContextVar("alara_session_api_key", default=None)
+
+def current_api_key() -> Optional[str]:
+    return session_api_key.get() or ALARA_API_KEY
+
+def api_key_identity(api_key: Optional[str]) -> str:
+    """Short fingerprint of an API key, used to keep per-key cache entries apart."""
+    if not api_key:
+        return ""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+# --- OpenAPI Schema (fetched, indexed and refreshed in the background) --- #
+# Re-fetch the schema this often to pick up backend changes without a restart (0 = never)
+SCHEMA_REFRESH_INTERVAL = env_float("ALARA_SCHEMA_REFRESH_INTERVAL", 600.0)
+# Backoff after failed fetches: doubles from SCHEMA_RETRY_MIN up to SCHEMA_RETRY_MAX seconds
+SCHEMA_RETRY_MIN = env_float("ALARA_SCHEMA_RETRY_MIN", 5.0)
+SCHEMA_RETRY_MAX = env_float("ALARA_SCHEMA_RETRY_MAX", 300.0)
+
+@dataclass(frozen=True)
+class SchemaSnapshot:
+    """One schema version: its index (routes, validators) and the tools generated from it.
+
+    Built completely before it is installed, so callers holding a snapshot keep a
+    consistent view while a newer one is swapped in.
+    """
+    index: SchemaIndex
+    content_hash: Optional[str]
+    etag: Optional[str]
+    tools: List[types.Tool]
+
+async def get_schema_index() -> Optional[SchemaIndex]:
+    snapshot = await get_schema_snapshot()
+    return snapshot.index if snapshot else None
+
+async def get_schema_snapshot() -> Optional[SchemaSnapshot]:
+    global _schema, _schema_failures, _schema_refresh_key
+    api_key = session_api_key.get()
+    if api_key:
+        _schema_refresh_key = api_key
+    if _schema:
+        return _schema
+    
+    if not ALARA_PROD_URL:
+        logger.error("ALARA_MCP_URL not configured.")
+        return None
+    if not current_api_key():
+        logger.error("ALARA_API_KEY not configured.")
+        return None
+    if _schema_failures and _schema_refresh_task and not _schema_refresh_task.done():
+        # The first fetch failed and the refresher is retrying; fail fast instead of stalling this request
+        return None
+
+    async with _schema_lock:
+        if _schema: # Another caller loaded it while we waited
+            return _schema
+
+        # Warm start: serve the last known schema from disk and revalidate in the background
+        cached = schema_cache.load_cached_schema(ALARA_PROD_URL)
+        if cached:
+            try:
+                _schema = _build_snapshot(cached["schema"], cached.get("content_hash"), cached.get("etag"))
+                age = time.time() - cached.get("fetched_at", 0)
+                logger.info("Loaded OpenAPI schema from disk cache (version: %s, age: %.0fs). Revalidating in background.", _schema.index.openapi, age)
+                _start_schema_refresher(0.0)
+                return _schema
+            except Exception as e:
+                logger.warning("Cached OpenAPI schema could not be parsed, fetching a fresh copy: %s", e)
+
+        if not await _fetch_openapi_schema():
+            _schema_failures = 1
+            delay = _schema_retry_delay(_schema_failures)
+            logger.warning("OpenAPI schema unavailable; retrying in the background in %.1fs.", delay)
+            _start_schema_refresher(delay)
+        elif SCHEMA_REFRESH_INTERVAL > 0:
+            _start_schema_refresher(SCHEMA_REFRESH_INTERVAL)
+        return _schema
+
+async def _fetch_openapi_schema(api_key: Optional[str] = None) -> bool:
+    """Download the schema and install it as a new snapshot if it changed; False on failure.
+
+    Uses If-None-Match when a schema is already loaded, and keeps the current
+    snapshot when the backend answers 304, when the content hash is unchanged,
+    or when the backend cannot be reached.
+    """
+    global _schema
+    current = _schema
+    headers = {"X-API-Key": api_key or current_api_key()}
+    if current and current.etag:
+        headers["If-None-Match"] = current.etag
+    started = time.perf_counter()
+    outcome = "error"
+
+    async def fetch(endpoint: Endpoint) -> httpx.Response:
+        schema_url = f"{endpoint.url}/openapi.json"
+        logger.info("Attempting to fetch OpenAPI schema from %s using API key.", schema_url)
+        # Increased timeout slightly
+        response = await get_http_client().get(schema_url, headers=headers, timeout=20.0)
+        if response.is_error:
+            response.raise_for_status() # Lets the endpoint pool fail over on 502/503/504
+        return response
+
+    try:
+        response = await get_endpoint_pool().request("GET", fetch)
+        logger.debug("Schema fetch response status: %s", response.status_code)
+        if response.status_code == 304 and current:
+            logger.info("OpenAPI schema not modified (ETag match); keeping cached copy.")
+            outcome = "not_modified"
+            return True
+        response.raise_for_status() # Raise HTTPStatusError for bad responses (4xx or 5xx)
+        new_hash = schema_cache.content_hash(response.content)
+        new_etag = response.headers.get("ETag")
+        schema_data = response.json()
+        if current and new_hash == current.content_hash:
+            logger.info("OpenAPI schema content unchanged; keeping cached copy.")
+            _schema = replace(current, etag=new_etag)
+            outcome = "unchanged"
+            if new_etag == current.etag:
+                return True # The disk copy already matches
+        else:
+            snapshot = _build_snapshot(schema_data, new_hash, new_etag)
+            _schema = snapshot # Atomic swap: calls already running keep the snapshot they started with
+            logger.info("Successfully fetched and indexed OpenAPI schema (version: %s, %s operations)", snapshot.index.openapi, len(snapshot.index.operations))
+            outcome = "updated"
+            if current is not None and _dump_tools(current.tools) != _dump_tools(snapshot.tools):
+                _background_tasks_add(asyncio.create_task(_notify_tools_changed()))
+        # Serializing a large schema takes a while; keep it off the event loop
+        await asyncio.to_thread(schema_cache.save_cached_schema, ALARA_PROD_URL, schema_data, new_etag, new_hash)
+        return True
+    except httpx.HTTPStatusError as e:
+        # Log HTTP errors specifically
+        logger.error("HTTP error fetching schema: %s - Response: %s", e.response.status_code, e.response.text[:500], exc_info=True)
+        return False
+    except httpx.RequestError as e:
+        # Log other request errors (timeouts, connection issues)
+        logger.error("Request error fetching schema: %s", e, exc_info=True)
+        return False
+    except Exception as e:
+        # Log any other unexpected errors during fetch/parse
+        logger.error("Unexpected error fetching/parsing OpenAPI schema: %s", e, exc_info=True)
+        return False
+    finally:
+        get_metrics().record_schema_fetch(time.perf_counter() - started, outcome)
+
+def _parse_schema(schema_data: Dict[str, Any]) -> SchemaIndex:
+    # Full openapi_pydantic validation only runs with ALARA_SCHEMA_VALIDATE=1
+    started = time.perf_counter()
+    index = build_schema_index(schema_data, ALLOWED_TAGS)
+    get_metrics().record_schema_build(time.perf_counter() - started, len(index.operations))
+    return index
+
+def _build_snapshot(schema_data: Dict[str, Any], content_hash: Optional[str], etag: Optional[str]) -> SchemaSnapshot:
+    index = _parse_schema(schema_data)
+    return SchemaSnapshot(index, content_hash, etag, _build_tools(index, content_hash))
+
+def _schema_retry_delay(failures: int) -> float:
+    delay = min(SCHEMA_RETRY_MAX, SCHEMA_RETRY_MIN * 2 ** min(failures - 1, 16))
+    return delay * random.uniform(0.8, 1.2) # Jitter, so bridges sharing a backend do not retry in lockstep
+
+def _start_schema_refresher(initial_delay: float) -> None:
+    """Keep the schema current from a background task (one per process).
+
+    The task starts from an empty context rather than the caller's, so it does not
+    keep using (or outlive the revocation of) the API key of the session that started it.
+    """
+    global _schema_refresh_task
+    if _schema_refresh_task and not _schema_refresh_task.done():
+        return
+    _schema_refresh_task = Context().run(asyncio.create_task, _refresh_schema_periodically(initial_delay))
+
+async def _refresh_schema_periodically(delay: float) -> None:
+    """Re-fetch every SCHEMA_REFRESH_INTERVAL; after failures retry with backoff, keeping the current snapshot."""
+    global _schema_failures
+    while True:
+        await asyncio.sleep(delay)
+        # The bridge's own key, else the one most recently used by a client session (daemon / HTTP modes)
+        api_key = ALARA_API_KEY or _schema_refresh_key
+        async with _schema_lock:
+            ok = await _fetch_openapi_schema(api_key) if api_key else False
+        if ok:
+            _schema_failures = 0
+            if SCHEMA_REFRESH_INTERVAL <= 0:
+                return # Refreshing disabled: this was the one revalidation after a warm start
+            delay = SCHEMA_REFRESH_INTERVAL
+        else:
+            _schema_failures += 1
+            delay = _schema_retry_delay(_schema_failures)
+            logger.warning("OpenAPI schema refresh failed %s time(s) in a row; next attempt in %.1fs.", _schema_failures, delay)
+
+def _dump_tools(tools: List[types.Tool]) -> List[Dict[str, Any]]:
+    return [tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in tools]
+
+# --- Backend Endpoints (ALARA_MCP_URL may list several, see alara.endpoints) --- #
+_endpoint_pool: Optional[EndpointPool] = None
+_endpoint_pool_spec: Optional[str] = None # The ALARA_PROD_URL the pool was built from
+
+def get_endpoint_pool() -> EndpointPool:
+    """The pool for the configured ALARA_PROD_URL, rebuilt if that setting changes."""
+    global _endpoint_pool, _endpoint_pool_spec
+    if _endpoint_pool is None or _endpoint_pool_spec != ALARA_PROD_URL:
+        if _endpoint_pool is not None:
+            _endpoint_pool.stop_probes()
+        urls = parse_endpoint_urls(ALARA_PROD_URL)
+        _endpoint_pool = EndpointPool.from_env(urls)
+        _endpoint_pool_spec = ALARA_PROD_URL
+        if len(urls) > 1:
+            logger.info("Backend endpoint pool: %s", ", ".join(urls))
+    return _endpoint_pool
+
+# --- Response Cache (idempotent GETs) --- #
+_response_cache: Optional[ResponseCache] = None
+_background_tasks: "set[asyncio.Task]" = set()
+_inflight_requests = SingleFlight()
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache.from_env()
+        logger.info("Response cache configured: max_entries=%s, ttl=%ss, stale=%ss", _response_cache.max_entries, _response_cache.default_ttl, _response_cache.stale_ttl)
+    return _response_cache
+
+def _background_tasks_add(task: asyncio.Task) -> None:
+    """Keep a reference to fire-and-forget tasks so they are not garbage collected mid-flight."""
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+# --- Upstream Protection (rate limits, retries, circuit breakers) --- #
+_resilience: Optional[Resilience] = None
+
+def get_resilience() -> Resilience:
+    global _resilience
+    if _resilience is None:
+        _resilience = Resilience()
+    return _resilience
+
+# --- Metrics --- #
+METRICS_RESOURCE_URI = "alara://metrics"
+# Operation name recorded for calls to tools the schema does not define
+UNKNOWN_OPERATION = "_unknown"
+
+_metrics: Optional[Metrics] = None
+
+def get_metrics() -> Metrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+# Extra stats sources (e.g. the daemon's session counts), keyed by component name
+_component_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def register_component_stats(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    _component_providers[name] = provider
+
+def _component_stats() -> Dict[str, Any]:
+    """Point-in-time stats of the shared pool, caches and upstream protection."""
+    components: Dict[str, Any] = {
+        "http_pool": pool_stats(),
+        "inflight_dedup": _inflight_requests.stats(),
+        "resilience": get_resilience().stats(),
+        "projections": projection_cache_stats(),
+    }
+    if _response_cache is not None:
+        components["response_cache"] = _response_cache.stats()
+    if _endpoint_pool is not None:
+        components["endpoints"] = _endpoint_pool.stats()
+    if _feed_manager is not None:
+        components["feeds"] = _feed_manager.stats()
+    if _continuation_store is not None:
+        components["continuations"] = _continuation_store.stats()
+    for name, provider in _component_providers.items():
+        components[name] = provider()
+    return components
+
+def metrics_snapshot() -> Dict[str, Any]:
+    return get_metrics().snapshot(_component_stats())
+
+def metrics_prometheus() -> str:
+    return get_metrics().render_prometheus(_component_stats())
+
+async def _write_metrics_periodically(path: str, interval: float) -> None:
+    """Rewrite path with a Prometheus snapshot every interval seconds (atomically, off the event loop)."""
+    logger.info("Writing Prometheus metrics to %s every %ss.", path, interval)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(write_metrics_file, path, metrics_prometheus())
+        except OSError as e:
+            logger.warning("Could not write metrics file %s: %s", path, e)
+
+# --- Tool Listing Logic --- #
+# Only operations carrying one of these tags are exposed as tools
+ALLOWED_TAGS = frozenset({"CCXT", "Exchanges"})
+
+# Bump when the way tools are generated changes, so cached tool tables are rebuilt
+TOOL_TABLE_VERSION = 8
+
+# Optional arguments added to every generated tool; handled by the bridge itself
+BRIDGE_OPTION_PROPERTIES: Dict[str, Dict[str, Any]] = {
+    "_format": {
+        "type": "string",
+        "enum": list(RESULT_FORMATS),
+        "description": "Result encoding: 'json' (compact JSON) or 'columnar' (arrays of records or of candle/order book rows packed into per-field arrays).",
+    },
+    "_timeout": {
+        "type": "number",
+        "description": "Give up after this many seconds (the bridge also applies its own per-operation limit when this is not set).",
+    },
+}
+
+# Also added to every generated tool: trim the result before it is serialized (see alara.projection)
+PROJECTION_OPTION_PROPERTIES: Dict[str, Dict[str, Any]] = {
+    "_fields": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Only return these field paths, e.g. [\"free.USDT\"] or [\"bids.0\", \"asks.0\"] ('*' matches any key). Applied to each record of list results.",
+    },
+    "_filter": {
+        "type": "string",
+        "description": "Only return records matching this condition, e.g. 'side == \"buy\" and price > 100' (==, !=, <, <=, >, >=, and, or).",
+    },
+    "_limit": {
+        "type": "integer",
+        "minimum": 0,
+        "description": "Return at most this many records (after _filter).",
+    },
+}
+
+# Added to tools whose results come in pages (see alara.pagination)
+PAGINATION_OPTION_PROPERTIES: Dict[str, Dict[str, Any]] = {
+    "_fetch_all": {
+        "type": "boolean",
+        "description": "Fetch every page from the given start and return the records merged and de-duplicated in one result.",
+    },
+    "_max_records": {
+        "type": "integer",
+        "description": "With _fetch_all: stop after this many records. The result's 'next' holds the arguments to continue from.",
+    },
+}
+
+# Client sessions seen by our handlers; notified when the tool list changes
+_active_sessions: "weakref.WeakSet[ServerSession]" = weakref.WeakSet()
+
+def _remember_session() -> None:
+    """Track the session of the current MCP request so it can receive list_changed notifications."""
+    try:
+        _active_sessions.add(request_ctx.get().session)
+    except LookupError:
+        pass # Not called from within an MCP request
+
+def _make_tool_list_key(schema_hash: Optional[str], allowed_tags: FrozenSet[str]) -> Optional[str]:
+    if not schema_hash:
+        return None
+    return f"v{TOOL_TABLE_VERSION}:{schema_hash}:{','.join(sorted(allowed_tags))}"
+
+async def _notify_tools_changed() -> None:
+    for session in list(_active_sessions):
+        try:
+            await session.send_tool_list_changed()
+        except Exception as e:
+            logger.warning("Could not send tools/list_changed notification: %s", e)
+            _active_sessions.discard(session)
+    logger.info("Sent tools/list_changed to %s session(s).", len(_active_sessions))
+
+async def list_available_tools_impl() -> list[types.Tool]:
+    _remember_session()
+    tools = await _list_schema_tools()
+    if not tools:
+        return tools
+    return tools + _bridge_tools()
+
+async def _list_schema_tools() -> List[types.Tool]:
+    """Tools generated from the current schema snapshot."""
+    snapshot = await get_schema_snapshot()
+    if not snapshot:
+        logger.error("OpenAPI schema not available or has no paths, returning empty tool list.")
+        return []
+    return snapshot.tools
+
+def _build_tools(index: SchemaIndex, schema_hash: Optional[str]) -> List[types.Tool]:
+    """Tool definitions for every indexed operation (reusing the on-disk tool table when possible)."""
+    allowed_tags = ALLOWED_TAGS
+    tools_key = _make_tool_list_key(schema_hash, allowed_tags)
+
+    # Reuse the tool table generated from this exact schema by a previous bridge process
+    if tools_key:
+        cached_tools = schema_cache.load_tool_table(ALARA_PROD_URL, tools_key)
+        if cached_tools is not None:
+            try:
+                tools = [types.Tool.model_validate(tool_data) for tool_data in cached_tools]
+                logger.info("Loaded %s tools from disk cache.", len(tools))
+                return tools
+            except Exception as e:
+                logger.warning("Cached tool table could not be loaded, regenerating: %s", e)
+
+    # The index only holds operations that passed the tag filter
+    tools = [_tool_from_record(index, record) for record in index.operations.values()]
+
+    if not tools:
+        logger.warning("No tools generated from schema. Check paths, tags (%s), and operationIds in the OpenAPI spec.", allowed_tags)
+    else:
+        # Restore simplified log message
+        logger.info("Successfully generated %s BASIC tools from OpenAPI schema.", len(tools))
+        if tools_key:
+            schema_cache.save_tool_table(ALARA_PROD_URL, tools_key, _dump_tools(tools))
+    return tools
+
+def _json_type(schema_type: Any, allow_array: bool = False) -> str:
+    # Basic type mapping (can be expanded)
+    if schema_type in ("integer", "number", "boolean"):
+        return schema_type
+    if allow_array and schema_type == "array":
+        return "array"
+    # TODO: Handle nested objects if needed
+    return "string"
+
+def _tool_from_record(index: SchemaIndex, record: OperationRecord) -> types.Tool:
+    # --- Generate Tool Definition with Proper Input Schema --- #
+    tool_name = record.operation_id
+    logger.debug("Generating tool definition for: %s", tool_name)
+
+    # Prepare input schema properties and required list
+    input_properties = {}
+    input_required = []
+
+    for param in record.parameters:
+        param_schema = index.resolve_schema(param.schema) if param.schema else {}
+        if not isinstance(param_schema, dict):
+            param_schema = {}
+        json_type = _json_type(param_schema.get("type"))
+        input_properties[param.name] = {
+            "type": json_type,
+            "description": param.description or f"{param.location} parameter: {param.name}"
+        }
+        if param_schema.get("format"):
+            input_properties[param.name]["format"] = param_schema["format"]
+        if param.required:
+            input_required.append(param.name)
+        logger.debug("    - Param: %s (in: %s, type: %s, required: %s)", param.name, param.location, json_type, param.required)
+
+    # Handle requestBody (basic handling for application/json)
+    # Note: MCP clients might handle request bodies differently than simple params.
+    # This adds body parameters to the same input schema for simplicity here.
+    body_schema = index.resolve_schema(record.body_schema) if record.body_schema else None
+    if isinstance(body_schema, dict) and isinstance(body_schema.get("properties"), dict):
+        logger.debug("  Processing requestBody properties for %s", tool_name)
+        for prop_name, prop_schema in body_schema["properties"].items():
+            if not isinstance(prop_schema, dict):
+                prop_schema = {}
+            json_prop_type = _json_type(prop_schema.get("type"), allow_array=True)
+            input_properties[prop_name] = {
+                "type": json_prop_type,
+                "description": prop_schema.get("description") or f"Body property: {prop_name}"
+            }
+            # Add format / enum if available
+            if prop_schema.get("format"):
+                input_properties[prop_name]["format"] = prop_schema["format"]
+            if prop_schema.get("enum"):
+                input_properties[prop_name]["enum"] = prop_schema["enum"]
+            logger.debug("    - Body Prop: %s (type: %s)", prop_name, json_prop_type)
+        # Check for required body properties
+        for req_prop in body_schema.get("required") or []:
+            if req_prop not in input_required: # Avoid duplicates
+                input_required.append(req_prop)
+                logger.debug("    - Body Prop Required: %s", req_prop)
+
+    # Bridge-level options (stripped before the request is forwarded)
+    input_properties.update(BRIDGE_OPTION_PROPERTIES)
+    input_properties.update(PROJECTION_OPTION_PROPERTIES)
+    if index.pagination(record.operation_id):
+        input_properties.update(PAGINATION_OPTION_PROPERTIES)
+
+    # Construct the final input schema
+    input_schema = {"type": "object"}
+    if input_properties:
+        input_schema["properties"] = input_properties
+    if input_required:
+        input_schema["required"] = input_required
+
+    return types.Tool(
+        name=tool_name,
+        description=record.summary or f"{record.method} {record.path}",
+        inputSchema=input_schema,
+        # No outputSchema: results are returned as text content, which MCP
+        # servers reject as "no structured output" when an outputSchema is set
+    )
+
+# --- Tool Execution Logic --- #
+# Reject calls whose arguments do not match the schema without contacting the backend
+VALIDATE_ARGUMENTS = env_bool("ALARA_VALIDATE_ARGUMENTS", True)
+
+_timeout_policy: Optional[TimeoutPolicy] = None
+
+def get_timeout_policy() -> TimeoutPolicy:
+    global _timeout_policy
+    if _timeout_policy is None:
+        _timeout_policy = TimeoutPolicy.from_env()
+    return _timeout_policy
+
+class ToolError(Exception):
+    """A tool call failed; the message is returned to the client as 'Error: <message>'.
+
+    `reason` is a short machine-readable cause used to label error metrics.
+    """
+    def __init__(self, message: str, reason: str = "internal"):
+        super().__init__(message)
+        self.reason = reason
+
+async def execute_tool_impl(name: str, arguments: Dict[str, Any] | None) -> List[types.TextContent]:
+    # ---> ADD ENTRY LOGGING <--
+    logger.debug("[execute_tool_impl N:%s] ENTERED function. Args: %s", name, arguments)
+    # ---> END LOGGING <--
+    log_prefix = f"[execute_tool_impl N:{name}]"
+    # ---> Log Script Path <---\
+    logger.debug("%s EXECUTING SCRIPT: %s", log_prefix, __file__)
+    logger.info("%s EXECUTE TOOL HANDLER CALLED. Args: %s", log_prefix, arguments) 
+
+    if not arguments: arguments = {} # Ensure arguments is always a dict
+    _remember_session()
+
+    bridge_handler = BRIDGE_TOOL_HANDLERS.get(name)
+    if bridge_handler is not None:
+        return await bridge_handler(arguments)
+
+    # Bridge options travel as underscore-prefixed arguments and are never forwarded
+    arguments = dict(arguments)
+    result_format = arguments.pop("_format", None)
+    if result_format is not None and result_format not in RESULT_FORMATS:
+        return [types.TextContent(type="text", text=f"Error: '_format' must be one of {list(RESULT_FORMATS)}.")]
+
+    try:
+        data = await _run_tool(name, arguments, log_prefix)
+    except ToolError as e:
+        return [types.TextContent(type="text", text=f"Error: {e}")]
+    return _success_result(data, result_format)
+
+async def _run_tool(name: str, arguments: Dict[str, Any], log_prefix: str) -> Any:
+    """One backend tool call with the bridge options (pagination, projection) applied; used by tools and batch items."""
+    fetch_all, max_records = _pop_pagination_options(arguments)
+    projection = _pop_projection(arguments)
+    if fetch_all:
+        data = await _fetch_all_pages(name, arguments, max_records, log_prefix)
+    else:
+        data = await _execute_operation(name, arguments, log_prefix)
+    return _apply_projection(projection, data)
+
+def _pop_pagination_options(arguments: Dict[str, Any]) -> Tuple[bool, Any]:
+    """Remove `_fetch_all` / `_max_records`; only an explicit true `_fetch_all` walks the pages."""
+    fetch_all = arguments.pop("_fetch_all", False)
+    max_records = arguments.pop("_max_records", None)
+    if isinstance(fetch_all, str) and fetch_all.strip().lower() in ("true", "false"):
+        fetch_all = fetch_all.strip().lower() == "true"
+    if fetch_all is None:
+        fetch_all = False
+    if not isinstance(fetch_all, bool):
+        raise ToolError(f"'_fetch_all' must be true or false, got {fetch_all!r}.", "validation")
+    if max_records is not None and not fetch_all:
+        raise ToolError("'_max_records' only applies together with '_fetch_all': true.", "validation")
+    return fetch_all, max_records
+
+def _pop_projection(arguments: Dict[str, Any]) -> Optional[Projection]:
+    """Remove `_fields` / `_filter` / `_limit` from the arguments and return their compiled projection."""
+    try:
+        return compile_projection(*(arguments.pop(option, None) for option in PROJECTION_OPTIONS))
+    except ProjectionError as e:
+        raise ToolError(str(e), "validation")
+
+def _apply_projection(projection: Optional[Projection], data: Any) -> Any:
+    if projection is None:
+        return data
+    try:
+        return projection.apply(data)
+    except ProjectionError as e:
+        raise ToolError(str(e), "validation")
+
+async def _fetch_all_pages(name: str, arguments: Dict[str, Any], max_records: Any, log_prefix: str) -> Dict[str, Any]:
+    """Walk all pages of a paginated operation; `_timeout` then applies to the whole walk."""
+    index = await get_schema_index()
+    spec = index.pagination(name) if index else None
+    if spec is None:
+        raise ToolError(f"Tool '{name}' does not support _fetch_all: no pagination parameters found.", "validation")
+    if max_records is not None:
+        try:
+            max_records = int(max_records)
+        except (TypeError, ValueError):
+            max_records = 0
+        if max_records <= 0:
+            raise ToolError("'_max_records' must be a positive integer.", "validation")
+    timeout = _call_timeout(name, arguments.pop("_timeout", None))
+    paginator = Paginator.from_env(spec, lambda page_arguments: _execute_operation(name, page_arguments, log_prefix), max_records)
+    try:
+        result = await run_with_deadline(timeout, lambda: paginator.run(arguments))
+    except CallTimeoutError as e:
+        if not paginator.pages:
+            raise ToolError(f"Call {e}. Retry later, or pass a larger '_timeout'.", "timeout")
+        paginator.error = f"Stopped after {paginator.pages} page(s): {e}"
+        result = paginator.result()
+    except ValueError as e:
+        raise ToolError(f"Cannot paginate '{name}': {e}", "validation")
+    logger.info("%s Fetched %s record(s) in %s page(s) (complete: %s).", log_prefix, result["count"], result["pages"], result["complete"])
+    return result
+
+async def _execute_operation(name: str, arguments: Dict[str, Any], log_prefix: str, use_cache: bool = True) -> Any:
+    """Dispatch one backend operation and return its parsed JSON result.
+
+    Shared by execute_tool_impl, the bridge meta-tools and the feed pollers
+    (which need fresh data, so they skip the response cache); raises ToolError on failure.
+    """
+    metrics = get_metrics()
+    call = metrics.start_call(name)
+    error = None
+    try:
+        timeout = _call_timeout(name, arguments.pop("_timeout", None))
+        try:
+            return await run_with_deadline(timeout, lambda: _dispatch_operation(name, arguments, log_prefix, call, use_cache))
+        except CallTimeoutError as e:
+            logger.warning("%s Call %s; upstream request cancelled.", log_prefix, e)
+            raise ToolError(f"Call {e}. Retry later, or pass a larger '_timeout'.", "timeout")
+    except ToolError as e:
+        error = e.reason
+        if e.reason == "unknown_tool":
+            call.operation_id = UNKNOWN_OPERATION # Keep arbitrary client-supplied names out of the metrics
+        raise
+    except asyncio.CancelledError:
+        error = "cancelled" # The client cancelled the request (or went away)
+        logger.info("%s Call cancelled; upstream request aborted.", log_prefix)
+        raise
+    finally:
+        metrics.finish_call(call, error)
+
+def _call_timeout(name: str, requested: Any) -> float:
+    """Seconds this call may take: the client's `_timeout` if valid, else the configured limit."""
+    if requested is not None:
+        if isinstance(requested, str):
+            try:
+                requested = float(requested)
+            except ValueError:
+                pass
+        if isinstance(requested, bool) or not isinstance(requested, (int, float)) or not requested > 0:
+            raise ToolError(f"'_timeout' must be a positive number of seconds, got {requested!r}.", "validation")
+    snapshot = _schema
+    plan = snapshot.index.routes.get(name) if snapshot else None
+    return get_timeout_policy().timeout_for(name, plan.tags if plan else (), requested)
+
+async def _dispatch_operation(name: str, arguments: Dict[str, Any], log_prefix: str, call: CallMetrics, use_cache: bool = True) -> Any:
+    api_key = current_api_key()
+    if not api_key or not ALARA_PROD_URL:
+        logger.error("%s API Key or URL not configured for tool execution.", log_prefix)
+        raise ToolError("Bridge not configured correctly (API Key/URL missing).", "not_configured")
+
+    index = await get_schema_index()
+    if index is None or not index.routes:
+        logger.error("%s Cannot execute tool: OpenAPI schema unavailable.", log_prefix)
+        raise ToolError("Cannot determine API endpoint. OpenAPI schema unavailable.", "schema_unavailable")
+
+    # Find the operation matching the tool name (operationId)
+    plan = index.routes.get(name)
+    if plan is None:
+        logger.error("Could not find API endpoint details for tool '%s' in schema.", name)
+        raise ToolError(f"Configuration error for tool '{name}'. Is the operationId correct in the schema and bridge filter?", "unknown_tool")
+    http_method = plan.method
+
+    # --- Check and coerce argument types locally before anything goes upstream ---
+    if VALIDATE_ARGUMENTS:
+        try:
+            arguments = index.argument_validator(name)(arguments)
+        except ArgumentValidationError as e:
+            logger.warning("%s %s", log_prefix, e)
+            raise ToolError(str(e), "validation")
+
+    # --- Bind arguments to path/query/body using the precompiled plan ---
+    try:
+        formatted_path, query_params, request_body = bind_arguments(plan, arguments)
+    except RouteBindingError as e:
+        logger.error("%s %s Args: %s", log_prefix, e, arguments)
+        raise ToolError(str(e), "binding")
+    logger.debug("%s Bound arguments for %s using path: %s -> %s", log_prefix, name, plan.path_template, formatted_path)
+
+    # --- Response cache for idempotent GETs ---
+    response_cache = get_response_cache()
+    cache_key = None
+    cache_ttl = 0.0
+    scope = exchange_scope(arguments)
+    generation = response_cache.generation(scope)
+    # Sessions with different API keys (daemon mode) never share cached or in-flight responses
+    identity = api_key_identity(api_key)
+    if use_cache and http_method == "GET" and response_cache.enabled:
+        cache_ttl = response_cache.ttl_for(name, plan.tags)
+        if cache_ttl > 0:
+            cache_key = response_cache.make_key(name, formatted_path, query_params, identity)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                if not cached.fresh and response_cache.begin_refresh(cache_key):
+                    # Serve the stale copy now and refresh it off the request path
+                    _background_tasks_add(asyncio.create_task(
+                        _refresh_cached_response(name, cache_key, cache_ttl, scope, generation, http_method, formatted_path, query_params, log_prefix)
+                    ))
+                logger.debug("%s Response cache %s for %s", log_prefix, 'hit' if cached.fresh else 'stale hit', cache_key)
+                call.cache_hit = True
+                return cached.data
+
+    # ---> ADD LOGGING FOR FINAL URL <---
+    logger.info("%s Attempting to call final URL: %s %s%s", log_prefix, http_method, ALARA_PROD_URL, formatted_path)
+    # ---> END LOGGING <---
+
+    upstream_started = time.perf_counter()
+    try:
+        if http_method == "GET":
+            # Identical GETs already in flight share one upstream call (not one started before a write to the same exchange)
+            flight_key = f"{cache_key or ResponseCache.make_key(name, formatted_path, query_params, identity)}@{generation}"
+            data = await _inflight_requests.do(
+                flight_key, lambda: _call_upstream(name, scope, http_method, formatted_path, query_params, None, log_prefix)
+            )
+        else:
+            data = await _call_upstream(name, scope, http_method, formatted_path, query_params, request_body, log_prefix)
+        call.upstream_seconds = time.perf_counter() - upstream_started
+        if cache_key:
+            response_cache.set(cache_key, data, cache_ttl, scope, generation)
+        return data
+    except httpx.HTTPStatusError as e:
+        logger.error("%s HTTP error calling API: %s - %s", log_prefix, e.response.status_code, e.response.text[:500], exc_info=True)
+        error_detail = e.response.text # Default to full text
+        try:
+            # Try to parse JSON error detail for cleaner output
+            error_json = e.response.json()
+            if isinstance(error_json, dict) and 'detail' in error_json:
+                error_detail = error_json['detail']
+        except Exception:
+            pass # Keep original text if JSON parsing fails
+        raise ToolError(f"API call failed ({e.response.status_code}): {error_detail}", f"http_{e.response.status_code}")
+    except httpx.RequestError as e:
+        logger.error("%s Request error calling API: %s", log_prefix, e, exc_info=True)
+        raise ToolError(f"Could not connect to API: {e}", "transport")
+    except CircuitOpenError as e:
+        logger.warning("%s %s", log_prefix, e)
+        raise ToolError(str(e), "circuit_open")
+    except ResponseTooLargeError as e:
+        logger.error("%s Backend response too large: %s", log_prefix, e)
+        raise ToolError(f"Backend {e}. Narrow the request (e.g. a smaller limit or time range).", "too_large")
+    except Exception as e:
+        logger.error("%s Unexpected error during tool execution: %s", log_prefix, e, exc_info=True)
+        raise ToolError(f"An unexpected error occurred in the bridge: {e}")
+    finally:
+        if not call.upstream_seconds:
+            call.upstream_seconds = time.perf_counter() - upstream_started # Failed calls waited too
+        if http_method != "GET" and response_cache.enabled:
+            # A write may have changed balances/orders: drop cached reads for the same exchange
+            removed = response_cache.invalidate_scope(scope)
+            if removed:
+                logger.debug("%s Invalidated %s cached response(s) for scope %s", log_prefix, removed, scope or '*')
+
+def _call_upstream(operation_id: str, scope: Optional[str], http_method: str, formatted_path: str,
+                   query_params: Dict[str, Any], request_body: Optional[Dict[str, Any]], log_prefix: str) -> Awaitable[Any]:
+    """_request_backend under the per-exchange rate limits, retry policy and circuit breaker."""
+    return get_resilience().run(
+        operation_id, scope, http_method,
+        lambda: _request_backend(operation_id, http_method, formatted_path, query_params, request_body, log_prefix),
+        log_prefix,
+    )
+
+async def _request_backend(operation_id: str, http_method: str, formatted_path: str, query_params: Dict[str, Any],
+                           request_body: Optional[Dict[str, Any]], log_prefix: str) -> Any:
+    """Send one request to the best backend endpoint (failing over if needed) and return the parsed JSON body."""
+    return await get_endpoint_pool().request(
+        http_method,
+        lambda endpoint: _request_endpoint(endpoint.url, operation_id, http_method, formatted_path, query_params, request_body, log_prefix),
+    )
+
+async def _request_endpoint(base_url: str, operation_id: str, http_method: str, formatted_path: str, query_params: Dict[str, Any],
+                            request_body: Optional[Dict[str, Any]], log_prefix: str) -> Any:
+    """Send one request to one backend endpoint and return the parsed JSON body (raises httpx errors)."""
+    # Construct the final URL using the formatted path
+    api_url = f"{base_url}{formatted_path}"
+
+    # *** Ensure the correct header name is used ***
+    # Common alternatives: "Authorization": f"Bearer {api_key}"
+    headers = {"X-API-Key": current_api_key()}
+
+    logger.debug("%s Making API call: %s %s | Query: %s | Body: %s | Headers: %s", log_prefix, http_method, api_url, query_params, request_body, list(headers.keys()))
+
+    client = get_http_client()
+    # Never wait longer than the call has left (its deadline also cancels the request outright)
+    timeout = client.timeout
+    remaining = time_left()
+    if remaining is not None:
+        remaining = max(0.001, remaining)
+        timeout = httpx.Timeout(remaining, connect=min(timeout.connect or remaining, remaining))
+    request = client.build_request(
+        method=http_method,
+        url=api_url,
+        headers=headers,
+        params=query_params if query_params else None,
+        json=request_body if request_body else None,
+        timeout=timeout
+    )
+    started = time.perf_counter()
+    status = None
+    body_size = None
+    try:
+        # Stream the body so it is buffered exactly once and size-checked as it arrives
+        response = await client.send(request, stream=True)
+        status = str(response.status_code)
+        try:
+            logger.debug("%s API Response Status: %s", log_prefix, response.status_code)
+            if response.is_error:
+                await response.aread() # Error bodies are small; load them for the error message
+                body_size = len(response.content)
+                response.raise_for_status()
+            body = await _read_body_bounded(response)
+            body_size = len(body)
+        finally:
+            await response.aclose()
+    except Exception as e:
+        if status is None:
+            status = type(e).__name__
+        raise
+    finally:
+        get_metrics().record_http(operation_id, status or "cancelled", time.perf_counter() - started, body_size)
+    data = json.loads(body) # Parse straight from the bytes, no intermediate str copy
+    del body
+    if logger.isEnabledFor(logging.DEBUG): # Avoid stringifying large payloads unless DEBUG is on
+        logger.debug("%s API Response Data (type %s): %s...", log_prefix, type(data), str(data)[:500])
+    return data
+
+class ResponseTooLargeError(Exception):
+    """The backend response body exceeded ALARA_MAX_RESPONSE_BYTES."""
+
+async def _read_body_bounded(response: httpx.Response) -> bytearray:
+    max_bytes = env_int("ALARA_MAX_RESPONSE_BYTES", 64 * 1024 * 1024)
+    declared_length = response.headers.get("Content-Length")
+    if max_bytes > 0 and declared_length and declared_length.isdigit() and int(declared_length) > max_bytes:
+        raise ResponseTooLargeError(f"response of {declared_length} bytes exceeds the {max_bytes} byte limit")
+    body = bytearray()
+    async for chunk in response.aiter_bytes():
+        body += chunk
+        if max_bytes > 0 and len(body) > max_bytes:
+            raise ResponseTooLargeError(f"response exceeds the {max_bytes} byte limit")
+    return body
+
+# --- Result Formatting --- #
+_continuation_store: Optional[ContinuationStore] = None
+
+def get_continuation_store() -> ContinuationStore:
+    global _continuation_store
+    if _continuation_store is None:
+        _continuation_store = ContinuationStore.from_env()
+    return _continuation_store
+
+def _success_result(data: Any, result_format: Optional[str] = None) -> List[types.TextContent]:
+    started = time.perf_counter()
+    text = encode_result(data, result_format)
+    get_metrics().encode.observe(time.perf_counter() - started)
+    return _bounded_text_result(text)
+
+def _bounded_text_result(text: str) -> List[types.TextContent]:
+    """Return text as-is, or its first chunk plus a continuation handle when it is over the output limit."""
+    store = get_continuation_store()
+    if not store.enabled or len(text) <= store.chunk_chars:
+        return [types.TextContent(type="text", text=text)]
+    handle = store.put(text, owner=api_key_identity(current_api_key()))
+    chunk = text[:store.chunk_chars]
+    logger.info("Result of %s characters truncated to %s; continuation handle issued.", len(text), len(chunk))
+    return [
+        types.TextContent(type="text", text=chunk),
+        types.TextContent(type="text", text=_continuation_note(handle, 0, len(chunk), len(text))),
+    ]
+
+def _continuation_note(handle: str, start: int, end: int, total: int) -> str:
+    return (f"[Truncated: returned characters {start}-{end} of {total}. Call {CONTINUATION_TOOL_NAME} "
+            f"with handle=\"{handle}\" and offset={end} for the next chunk.]")
+
+
+async def _refresh_cached_response(operation_id: str, cache_key: str, cache_ttl: float, scope: Optional[str], generation: int,
+                                   http_method: str, formatted_path: str, query_params: Dict[str, Any], log_prefix: str) -> None:
+    response_cache = get_response_cache()
+    try:
+        data = await _inflight_requests.do(
+            f"{cache_key}@{generation}", lambda: _call_upstream(operation_id, scope, http_method, formatted_path, query_params, None, log_prefix)
+        )
+        response_cache.set(cache_key, data, cache_ttl, scope, generation)
+        logger.debug("%s Refreshed stale cache entry %s", log_prefix, cache_key)
+    except Exception as e:
+        logger.warning("%s Background refresh of cached response failed: %s", log_prefix, e)
+    finally:
+        response_cache.end_refresh(cache_key)
+
+# --- Bridge Tools (answered locally, never forwarded to the backend) --- #
+CONTINUATION_TOOL_NAME = "alara_read_continuation"
+BATCH_TOOL_NAME = "alara_batch"
+METRICS_TOOL_NAME = "alara_metrics"
+
+_bridge_tool_list: Optional[List[types.Tool]] = None
+
+def _bridge_tools() -> List[types.Tool]:
+    global _bridge_tool_list
+    if _bridge_tool_list is None:
+        _bridge_tool_list = [
+            types.Tool(
+                name=CONTINUATION_TOOL_NAME,
+                description="Read the next chunk of a tool result that was truncated because it exceeded the bridge output limit.",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "handle": {"type": "string", "description": "Continuation handle from the truncated result."},
+                        "offset": {"type": "integer", "description": "Character offset to continue from (given in the truncated result)."},
+                    },
+                    "required": ["handle", "offset"],
+                },
+            ),
+            types.Tool(
+                name=BATCH_TOOL_NAME,
+                description=(
+                    "Run several Alara tools concurrently in one call, e.g. the same balance query on several exchanges. "
+                    "Returns one entry per item with its result or error and timing; a failing item does not fail the batch."
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "items": {
+                            "type": "array",
+                            "description": "Tool calls to run.",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "operationId": {"type": "string", "description": "Name of the Alara tool to call."},
+                                    "arguments": {"type": "object", "description": "Arguments for that tool."},
+                                },
+                                "required": ["operationId"],
+                            },
+                        },
+                        "max_concurrency": {"type": "integer", "minimum": 1, "description": "Maximum items run at the same time (capped by the bridge)."},
+                        **BRIDGE_OPTION_PROPERTIES,
+                    },
+                    "required": ["items"],
+                },
+            ),
+            types.Tool(
+                name=METRICS_TOOL_NAME,
+                description=(
+                    "Bridge diagnostics: per-tool call counts, errors and latency percentiles (split into backend wait and "
+                    "bridge overhead), backend status codes and response sizes, schema fetch timing, connection pool and cache stats."
+                ),
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "format": {"type": "string", "enum": ["json", "prometheus"], "description": "'json' (default) or Prometheus text format."},
+                    },
+                },
+            ),
+        ]
+    return _bridge_tool_list
+
+async def _read_continuation_tool(arguments: Dict[str, Any]) -> List[types.TextContent]:
+    handle = str(arguments.get("handle", ""))
+    try:
+        offset = int(arguments.get("offset", 0))
+    except (TypeError, ValueError):
+        return [types.TextContent(type="text", text="Error: 'offset' must be an integer.")]
+    result = get_continuation_store().read(handle, offset, owner=api_key_identity(current_api_key()))
+    if result is None:
+        return [types.TextContent(type="text", text=f"Error: Unknown or expired continuation handle '{handle}'.")]
+    chunk, next_offset, total = result
+    contents = [types.TextContent(type="text", text=chunk)]
+    if next_offset < total:
+        contents.append(types.TextContent(type="text", text=_continuation_note(handle, offset, next_offset, total)))
+    return contents
+
+async def _batch_tool(arguments: Dict[str, Any]) -> List[types.TextContent]:
+    items = arguments.get("items")
+    max_items = env_int("ALARA_BATCH_MAX_ITEMS", 50)
+    if not isinstance(items, list) or not items:
+        return [types.TextContent(type="text", text="Error: 'items' must be a non-empty list of {operationId, arguments} objects.")]
+    if len(items) > max_items:
+        return [types.TextContent(type="text", text=f"Error: A batch may contain at most {max_items} items (got {len(items)}).")]
+    result_format = arguments.get("_format")
+    if result_format is not None and result_format not in RESULT_FORMATS:
+        return [types.TextContent(type="text", text=f"Error: '_format' must be one of {list(RESULT_FORMATS)}.")]
+    try:
+        timeout = _call_timeout(BATCH_TOOL_NAME, arguments.get("_timeout"))
+    except ToolError as e:
+        return [types.TextContent(type="text", text=f"Error: {e}")]
+
+    concurrency = env_int("ALARA_BATCH_CONCURRENCY", 8)
+    try:
+        requested = int(arguments.get("max_concurrency") or concurrency)
+    except (TypeError, ValueError):
+        requested = concurrency
+    semaphore = asyncio.Semaphore(max(1, min(requested, concurrency)))
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+
+    async def store_item(index: int, item: Any) -> None:
+        results[index] = await run_item(index, item)
+
+    async def run_item(index: int, item: Any) -> Dict[str, Any]:
+        operation_id = item.get("operationId") if isinstance(item, dict) else None
+        entry: Dict[str, Any] = {"index": index, "operationId": operation_id}
+        item_arguments = item.get("arguments", {}) if isinstance(item, dict) else None
+        if not isinstance(operation_id, str) or not isinstance(item_arguments, dict):
+            entry.update(ok=False, elapsed_ms=0.0, error="Each item needs a string 'operationId' and an object 'arguments'.")
+            return entry
+        if operation_id in BRIDGE_TOOL_HANDLERS:
+            entry.update(ok=False, elapsed_ms=0.0, error=f"Bridge tool '{operation_id}' cannot be used inside a batch.")
+            return entry
+        # Encoding is decided once for the whole batch
+        item_arguments = {k: v for k, v in item_arguments.items() if k != "_format"}
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                data = await _run_tool(operation_id, item_arguments, f"[batch #{index} N:{operation_id}]")
+                entry.update(ok=True, result=data)
+            except ToolError as e:
+                entry.update(ok=False, error=str(e))
+            entry["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return entry
+
+    batch_started = time.perf_counter()
+    try:
+        # `_timeout` bounds the whole batch; items still running or queued when it passes are cancelled
+        await run_with_deadline(timeout, lambda: asyncio.gather(*(store_item(index, item) for index, item in enumerate(items))))
+    except CallTimeoutError as e:
+        logger.warning("Batch %s; unfinished items cancelled.", e)
+        for index, item in enumerate(items):
+            if results[index] is None:
+                operation_id = item.get("operationId") if isinstance(item, dict) else None
+                results[index] = {"index": index, "operationId": operation_id, "ok": False, "elapsed_ms": None,
+                                  "error": f"Batch {e} before this item finished."}
+    succeeded = sum(1 for entry in results if entry["ok"])
+    logger.info("Batch of %s item(s) finished: %s succeeded, %s failed.", len(results), succeeded, len(results) - succeeded)
+    return _success_result({
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "elapsed_ms": round((time.perf_counter() - batch_started) * 1000, 2),
+    }, result_format)
+
+async def _metrics_tool(arguments: Dict[str, Any]) -> List[types.TextContent]:
+    output_format = arguments.get("format") or "json"
+    if output_format == "prometheus":
+        return [types.TextContent(type="text", text=metrics_prometheus())]
+    if output_format != "json":
+        return [types.TextContent(type="text", text="Error: 'format' must be 'json' or 'prometheus'.")]
+    return [types.TextContent(type="text", text=json.dumps(metrics_snapshot(), indent=2))]
+
+BRIDGE_TOOL_HANDLERS = {
+    CONTINUATION_TOOL_NAME: _read_continuation_tool,
+    BATCH_TOOL_NAME: _batch_tool,
+    METRICS_TOOL_NAME: _metrics_tool,
+}
+
+# --- Market-Data Feeds (subscribable resources, see alara.feeds) --- #
+FEED_DESCRIPTIONS = {
+    "ticker": "Latest ticker for a symbol on an exchange. Subscribe to be notified when it changes.",
+    "orderbook": "Order book for a symbol on an exchange. Subscribe to be notified when it changes.",
+}
+
+_feed_manager: Optional[FeedManager] = None
+
+def get_feed_manager() -> FeedManager:
+    global _feed_manager
+    if _feed_manager is None:
+        _feed_manager = FeedManager.from_env(_fetch_feed, _notify_feed_updated)
+    return _feed_manager
+
+async def _feed_arguments(operation_id: str, exchange: str, symbol: str) -> Dict[str, Any]:
+    """Tool arguments for a feed, named after the exchange and symbol parameters the operation declares."""
+    index = await get_schema_index()
+    record = index.operations.get(operation_id) if index else None
+    if record is None:
+        raise ToolError(f"Feed operation '{operation_id}' is not available in the backend schema (see ALARA_FEED_OPERATIONS).", "unknown_tool")
+    names = {param.name for param in record.parameters}
+    exchange_param = next((name for name in EXCHANGE_ARGUMENT_NAMES if name in names), None)
+    symbol_param = next((name for name in SYMBOL_ARGUMENT_NAMES if name in names), None)
+    if exchange_param is None or symbol_param is None:
+        raise ToolError(
+            f"Operation '{operation_id}' cannot serve feeds: it needs an exchange parameter ({', '.join(EXCHANGE_ARGUMENT_NAMES)}) "
+            f"and a symbol parameter ({', '.join(SYMBOL_ARGUMENT_NAMES)}), but declares {', '.join(sorted(names)) or 'none'}.",
+            "validation",
+        )
+    return {exchange_param: exchange, symbol_param: symbol}
+
+async def _fetch_feed(feed: Feed) -> Any:
+    operation_id = get_feed_manager().operations[feed.kind]
+    arguments = await _feed_arguments(operation_id, feed.exchange, feed.symbol)
+    # Polls bypass the response cache, which would otherwise hide changes for its TTL
+    return await _execute_operation(operation_id, arguments, f"[feed {feed.uri}]", use_cache=False)
+
+async def _notify_feed_updated(session: ServerSession, feed: Feed) -> None:
+    meta: Dict[str, Any] = {"alara/version": feed.version}
+    if feed.delta is not None:
+        meta["alara/changes"] = feed.delta
+    await session.send_notification(types.ServerNotification(types.ResourceUpdatedNotification(
+        method="notifications/resources/updated",
+        params=types.ResourceUpdatedNotificationParams(uri=feed.uri, _meta=meta),
+    )))
+
+# --- Resources --- #
+async def list_resources_impl() -> List[types.Resource]:
+    resources = [types.Resource(
+        uri=METRICS_RESOURCE_URI,
+        name="metrics",
+        description="Bridge metrics (same data as the alara_metrics tool).",
+        mimeType="application/json",
+    )]
+    if _feed_manager is not None:
+        identity = api_key_identity(current_api_key())
+        resources += [
+            types.Resource(uri=feed.uri, name=f"{feed.kind} {feed.exchange} {feed.symbol}", mimeType="application/json")
+            for feed in _feed_manager.feeds(identity)
+        ]
+    return resources
+
+async def list_resource_templates_impl() -> List[types.ResourceTemplate]:
+    feeds = get_feed_manager()
+    if not feeds.enabled:
+        return []
+    return [
+        types.ResourceTemplate(
+            uriTemplate=f"alara://{kind}/{{exchange}}/{{symbol}}",
+            name=kind,
+            description=FEED_DESCRIPTIONS.get(kind, f"Result of {operation_id}. Subscribe to be notified when it changes."),
+            mimeType="application/json",
+        )
+        for kind, operation_id in feeds.operations.items()
+    ]
+
+async def read_resource_impl(uri: Any) -> List[ReadResourceContents]:
+    uri = str(uri)
+    if uri == METRICS_RESOURCE_URI:
+        return [ReadResourceContents(content=json.dumps(metrics_snapshot(), indent=2), mime_type="application/json")]
+    feeds = get_feed_manager()
+    feed = feeds.get(uri, api_key_identity(current_api_key()))
+    if feed is not None and feed.version:
+        payload = feed.payload()
+    else:
+        parsed = feeds.parse(uri)
+        if parsed is None:
+            raise ValueError(f"Unknown resource: {uri}")
+        kind, exchange, symbol = parsed
+        # Not subscribed (or no data yet): a one-off read, like the equivalent tool call
+        try:
+            arguments = await _feed_arguments(feeds.operations[kind], exchange, symbol)
+            data = await _execute_operation(feeds.operations[kind], arguments, f"[resource {uri}]")
+        except ToolError as e:
+            raise ValueError(str(e)) from None
+        payload = {"uri": uri, "exchange": exchange, "symbol": symbol, "version": 0, "data": data}
+    return [ReadResourceContents(content=encode_result(payload), mime_type="application/json")]
+
+async def subscribe_resource_impl(uri: Any) -> None:
+    feeds = get_feed_manager()
+    if not feeds.enabled:
+        raise ValueError("Resource subscriptions are disabled (ALARA_FEED_MAX=0).")
+    parsed = feeds.parse(str(uri))
+    if parsed is not None:
+        # Fail the subscription now rather than leave a poller that can never succeed
+        kind, exchange, symbol = parsed
+        try:
+            await _feed_arguments(feeds.operations[kind], exchange, symbol)
+        except ToolError as e:
+            raise ValueError(str(e)) from None
+    try:
+        feeds.subscribe(str(uri), api_key_identity(current_api_key()), request_ctx.get().session)
+    except FeedError as e:
+        raise ValueError(str(e)) from None
+
+async def unsubscribe_resource_impl(uri: Any) -> None:
+    if _feed_manager is not None:
+        _feed_manager.unsubscribe(str(uri), api_key_identity(current_api_key()), request_ctx.get().session)
+
+async def _prewarm_schema() -> None:
+    started = time.perf_counter()
+    try:
+        await _list_schema_tools()
+        logger.info("Schema prewarm finished in %.0f ms.", (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        logger.warning("Schema prewarm failed (will retry on first request): %s", e)
+
+def start_schema_prewarm() -> None:
+    """Load the schema while the client is still initializing instead of on its first tools/list."""
+    if _schema is None and env_bool("ALARA_PREWARM_SCHEMA", True):
+        _background_tasks_add(asyncio.create_task(_prewarm_schema()))
+
+def start_metrics_writer() -> None:
+    metrics_file = os.getenv("ALARA_METRICS_FILE")
+    if metrics_file:
+        interval = max(1.0, env_float("ALARA_METRICS_INTERVAL", 60.0))
+        _background_tasks_add(asyncio.create_task(_write_metrics_periodically(metrics_file, interval)))
+
+class BridgeServer(Server):
+    """Server that also advertises resource subscriptions (the lowlevel Server never does)."""
+
+    def get_capabilities(self, notification_options: NotificationOptions, experimental_capabilities: Dict[str, Dict[str, Any]]) -> types.ServerCapabilities:
+        capabilities = super().get_capabilities(notification_options, experimental_capabilities)
+        if capabilities.resources is not None and types.SubscribeRequest in self.request_handlers:
+            capabilities.resources.subscribe = True
+        return capabilities
+
+def create_server(subscriptions: bool = True) -> Server:
+    """The MCP server with the bridge's handlers attached (transport-independent).
+
+    Without `subscriptions` (stateless HTTP, where no session outlives its request to
+    receive updates) resources/subscribe is neither advertised nor accepted.
+    """
+    # Update version string if needed
+    server = BridgeServer(name="Alara", version="0.1.1")
+    server.list_tools()(list_available_tools_impl)
+    try:
+        # Arguments are validated (and coerced) by alara.validation instead of per-call jsonschema
+        call_tool = server.call_tool(validate_input=False)
+    except TypeError:
+        call_tool = server.call_tool() # Older mcp versions do not validate input
+    call_tool(execute_tool_impl)
+    server.list_resources()(list_resources_impl)
+    server.read_resource()(read_resource_impl)
+    server.list_resource_templates()(list_resource_templates_impl)
+    if subscriptions:
+        server.subscribe_resource()(subscribe_resource_impl)
+        server.unsubscribe_resource()(unsubscribe_resource_impl)
+    return server
+
+# --- Main Bridge Function (called by entry point) --- #
+async def run_bridge():
+    # --- Simplified Configuration Loading (Env Vars Only) --- #
+    global ALARA_API_KEY, ALARA_PROD_URL # Ensure we modify the globals
+    configure_logging() # No-op if main() already did it
+    logger.info("Loading configuration from environment...")
+
+    # --- CORRECTED ENVIRONMENT VARIABLE NAME --- #
+    ALARA_API_KEY = os.getenv("ALARA_API_KEY") 
+    if not ALARA_API_KEY:
+        logger.info("API Key from environment: Not Found")
+        logger.critical("CRITICAL ERROR: ALARA_API_KEY environment variable not set!") # Updated Error Message
+        logger.critical("This bridge expects the API key to be provided by the MCP client environment.")
+        return # Exit the async function
+    else:
+        logger.info("API Key from environment: Found (masked)")
+        logger.debug("API Key Loaded: %s...%s", ALARA_API_KEY[:4], ALARA_API_KEY[-4:])
+
+    ALARA_PROD_URL = os.getenv("ALARA_MCP_URL")
+    if not ALARA_PROD_URL:
+        logger.info("Backend URL from environment: Not Found")
+        ALARA_PROD_URL = DEFAULT_BACKEND_URL
+        logger.info("Using default Backend URL: %s", ALARA_PROD_URL)
+    else:
+         logger.info("Using Backend URL from environment: %s", ALARA_PROD_URL)
+    # --- End Configuration Loading --- #
+
+    # --- Original Initialization Logic --- #
+    logger.info("--- Alara StdIO Bridge Initializing ---")
+    logger.info("Python: %s", sys.executable)
+    logger.info("API Key Loaded: Yes")
+    logger.info("Target API URL: %s", ALARA_PROD_URL)
+
+    try:
+        server = create_server()
+        logger.info("MCP Server instance '%s' created.", server.name)
+
+        # Await stdio_server directly
+        logger.info("Creating InitializationOptions...")
+        init_options = server.create_initialization_options(NotificationOptions(tools_changed=True))
+        logger.info("InitializationOptions created.")
+        
+        logger.info("Starting stdio_server context manager...")
+        async with http_client_lifespan(), stdio_server() as (read_stream, write_stream):
+            logger.info("stdio_server streams obtained. Running server.run()...")
+            start_schema_prewarm()
+            start_metrics_writer()
+            await server.run(read_stream, write_stream, init_options)
+            logger.info("server.run() finished.") 
+
+    except ImportError as e:
+        logger.critical("CRITICAL IMPORT ERROR: %s", e, exc_info=True)
+        print(f"ImportError: {e}. Please ensure all dependencies are installed.", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        logger.critical("CRITICAL ERROR during bridge setup/run: %s", e, exc_info=True)
+        print(f"Critical runtime error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        logger.info("--- Alara StdIO Bridge Shutting Down --- ")
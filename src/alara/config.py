@@ -0,0 +1,41 @@
+"""Small helpers for reading bridge settings from the environment.
+
+Kept free of third-party imports so the config-printing path and module
+imports stay cheap.
+"""
+import logging
+import os
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+# Backend used when ALARA_MCP_URL is not set
+DEFAULT_BACKEND_URL = "https://alara-mcp.skolp.com"
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Invalid integer for %s: %r. Using default %s.", name, value, default)
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning("Invalid number for %s: %r. Using default %s.", name, value, default)
+        return default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,81 @@
+"""Bounded store for the remainder of tool results that exceed the output limit.
+
+When a result is larger than ALARA_MAX_OUTPUT_CHARS the client gets the first
+chunk plus a continuation handle, and reads the rest in further chunks through
+the `alara_read_continuation` tool.
+
+    ALARA_MAX_OUTPUT_CHARS        max characters returned per tool result (default 100000, 0 = unlimited)
+    ALARA_CONTINUATION_TTL        seconds a continuation handle stays readable (default 600)
+    ALARA_CONTINUATION_MAX_CHARS  total characters kept across all handles (default 20000000)
+"""
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from alara.config import env_float, env_int
+
+
+@dataclass
+class _Continuation:
+    text: str
+    created_at: float
+    owner: str
+
+
+class ContinuationStore:
+    def __init__(self, chunk_chars: int = 100_000, ttl: float = 600.0, max_total_chars: int = 20_000_000):
+        self.chunk_chars = chunk_chars
+        self.ttl = ttl
+        self.max_total_chars = max_total_chars
+        self._entries: "OrderedDict[str, _Continuation]" = OrderedDict()
+        self._total_chars = 0
+
+    @classmethod
+    def from_env(cls) -> "ContinuationStore":
+        return cls(
+            chunk_chars=env_int("ALARA_MAX_OUTPUT_CHARS", 100_000),
+            ttl=env_float("ALARA_CONTINUATION_TTL", 600.0),
+            max_total_chars=env_int("ALARA_CONTINUATION_MAX_CHARS", 20_000_000),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.chunk_chars > 0
+
+    def put(self, text: str, owner: str = "") -> str:
+        """Keep text readable under a new handle, evicting the oldest entries past the size cap.
+
+        Only reads passing the same `owner` (an API key fingerprint) can see it.
+        """
+        self._expire()
+        handle = secrets.token_urlsafe(12)
+        self._entries[handle] = _Continuation(text, time.monotonic(), owner)
+        self._total_chars += len(text)
+        while self._total_chars > self.max_total_chars and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._total_chars -= len(evicted.text)
+        return handle
+
+    def read(self, handle: str, offset: int, owner: str = "") -> Optional[Tuple[str, int, int]]:
+        """Return (chunk, next_offset, total_length) or None if the handle is unknown/expired."""
+        self._expire()
+        entry = self._entries.get(handle)
+        if entry is None or entry.owner != owner:
+            return None
+        offset = max(0, offset)
+        chunk = entry.text[offset:offset + self.chunk_chars]
+        return chunk, offset + len(chunk), len(entry.text)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "chars": self._total_chars, "max_chars": self.max_total_chars}
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._entries:
+            handle, entry = next(iter(self._entries.items()))
+            if entry.created_at >= cutoff:
+                break
+            del self._entries[handle]
+            self._total_chars -= len(entry.text)
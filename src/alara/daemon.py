@@ -0,0 +1,215 @@
+"""Shared bridge daemon: one long-lived process serving many MCP client sessions.
+
+Started with `python -m alara.main --daemon` (or on demand by alara.relay), it
+listens on a local Unix socket. Each connection begins with a one-line JSON
+handshake carrying that session's API key, followed by newline-delimited
+JSON-RPC exactly as on stdio. All sessions share the schema index, route
+table, argument validators, HTTP connection pool, response cache and metrics.
+Each session's backend calls use only its own API key, and cached responses
+and continuation handles are kept apart per key.
+
+    ALARA_DAEMON_SOCKET      socket path (see alara.relay)
+    ALARA_DAEMON_IDLE_EXIT   seconds without sessions before the daemon exits (default 900, 0 = never)
+    ALARA_DAEMON_MAX_LINE    largest JSON-RPC message accepted, in bytes (default 16 MiB)
+"""
+import asyncio
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import signal
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import anyio
+import anyio.lowlevel
+import mcp.types as types
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from mcp.server.lowlevel.server import NotificationOptions
+from mcp.shared.message import SessionMessage
+
+from alara import bridge
+from alara.config import DEFAULT_BACKEND_URL, env_float, env_int
+from alara.http_client import http_client_lifespan
+from alara.logging_setup import configure_logging
+from alara.relay import HANDSHAKE_TIMEOUT, RELAY_PROTOCOL_VERSION, DaemonUnavailable, check_private_dir, daemon_socket_path
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+
+@contextlib.asynccontextmanager
+async def socket_streams(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> AsyncIterator[
+        Tuple[MemoryObjectReceiveStream, MemoryObjectSendStream]]:
+    """MCP read/write streams over a newline-delimited JSON-RPC connection (like mcp's stdio_server)."""
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+
+    async def socket_reader():
+        try:
+            async with read_stream_writer:
+                while True:
+                    try:
+                        line = await reader.readline()
+                    except (ValueError, asyncio.LimitOverrunError) as e:
+                        logger.warning("Closing daemon session: message exceeds ALARA_DAEMON_MAX_LINE (%s).", e)
+                        break
+                    except ConnectionError:
+                        break
+                    if not line:
+                        break
+                    try:
+                        message = types.JSONRPCMessage.model_validate_json(line)
+                    except Exception as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+                    await read_stream_writer.send(SessionMessage(message))
+        except anyio.ClosedResourceError:
+            await anyio.lowlevel.checkpoint()
+
+    async def socket_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    data = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                    writer.write(data.encode("utf-8") + b"\n")
+                    await writer.drain()
+        except (anyio.ClosedResourceError, ConnectionError):
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(socket_reader)
+        tg.start_soon(socket_writer)
+        yield read_stream, write_stream
+
+
+class BridgeDaemon:
+    def __init__(self, socket_path: str, backend_url: str):
+        self.socket_path = socket_path
+        self.backend_url = backend_url
+        self.server = bridge.create_server()
+        self.init_options = self.server.create_initialization_options(NotificationOptions(tools_changed=True))
+        self.active_sessions = 0
+        self.sessions_served = 0
+        self.refused_sessions = 0
+        self._idle_since = time.monotonic()
+        self._stop = asyncio.Event()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active_sessions": self.active_sessions, "sessions_served": self.sessions_served, "refused_sessions": self.refused_sessions}
+
+    async def _read_handshake(self, reader: asyncio.StreamReader) -> Tuple[Optional[str], Optional[str]]:
+        """(api_key, None) for an acceptable hello, else (None, reason)."""
+        try:
+            hello = json.loads(await asyncio.wait_for(reader.readline(), HANDSHAKE_TIMEOUT))
+        except (asyncio.TimeoutError, ValueError, ConnectionError) as e:
+            return None, f"invalid handshake ({type(e).__name__})"
+        if not isinstance(hello, dict) or hello.get("alara_relay") != RELAY_PROTOCOL_VERSION:
+            return None, f"unsupported relay protocol (daemon speaks version {RELAY_PROTOCOL_VERSION})"
+        api_key = hello.get("api_key")
+        if not isinstance(api_key, str) or not api_key:
+            return None, "missing api_key"
+        backend_url = (hello.get("backend_url") or DEFAULT_BACKEND_URL).rstrip("/")
+        if backend_url != self.backend_url.rstrip("/"):
+            return None, f"daemon serves {self.backend_url}, not {backend_url}"
+        return api_key, None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        api_key, refusal = await self._read_handshake(reader)
+        try:
+            writer.write(json.dumps({"ok": refusal is None, "error": refusal}).encode("utf-8") + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            refusal = refusal or "client disconnected"
+        if refusal is not None:
+            self.refused_sessions += 1
+            logger.warning("Refused daemon session: %s", refusal)
+            writer.close()
+            return
+
+        self.active_sessions += 1
+        self.sessions_served += 1
+        session_number = self.sessions_served
+        logger.info("Daemon session #%s opened (key %s, %s active).", session_number, bridge.api_key_identity(api_key)[:8], self.active_sessions)
+        # Tasks spawned for this session inherit the context, so every backend call uses this key
+        bridge.session_api_key.set(api_key)
+        try:
+            bridge.start_schema_prewarm()
+            async with socket_streams(reader, writer) as (read_stream, write_stream):
+                await self.server.run(read_stream, write_stream, self.init_options)
+        except Exception as e:
+            logger.error("Daemon session #%s failed: %s", session_number, e, exc_info=True)
+        finally:
+            self.active_sessions -= 1
+            if not self.active_sessions:
+                self._idle_since = time.monotonic()
+            writer.close()
+            logger.info("Daemon session #%s closed (%s active).", session_number, self.active_sessions)
+
+    async def _exit_when_idle(self, idle_exit: float) -> None:
+        while not self._stop.is_set():
+            await asyncio.sleep(min(idle_exit, 30.0))
+            if not self.active_sessions and time.monotonic() - self._idle_since >= idle_exit:
+                logger.info("No daemon sessions for %.0fs; shutting down.", idle_exit)
+                self._stop.set()
+
+    async def serve(self) -> None:
+        unix_server = await asyncio.start_unix_server(
+            self.handle_connection, path=self.socket_path, limit=env_int("ALARA_DAEMON_MAX_LINE", 16 * 1024 * 1024),
+        )
+        os.chmod(self.socket_path, 0o600)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stop.set)
+        idle_exit = env_float("ALARA_DAEMON_IDLE_EXIT", 900.0)
+        if idle_exit > 0:
+            bridge._background_tasks_add(asyncio.create_task(self._exit_when_idle(idle_exit)))
+        logger.info("Bridge daemon listening on %s (backend %s).", self.socket_path, self.backend_url)
+        async with unix_server:
+            await self._stop.wait()
+        logger.info("Bridge daemon stopped after %s session(s).", self.sessions_served)
+
+
+def _lock_socket_path(socket_path: str) -> Optional[int]:
+    """Exclusive lock next to the socket so concurrently autostarted daemons do not fight over it."""
+    fd = os.open(socket_path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+async def run_daemon() -> None:
+    configure_logging("daemon", shared=False)
+    socket_path = daemon_socket_path()
+    socket_dir = os.path.dirname(socket_path) or "."
+    # Sessions bring their own keys; a key in the daemon's environment is never used for them
+    bridge.ALARA_API_KEY = None
+    bridge.ALARA_PROD_URL = os.getenv("ALARA_MCP_URL") or DEFAULT_BACKEND_URL
+    lock_fd = None
+    try:
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        check_private_dir(socket_dir)
+        lock_fd = _lock_socket_path(socket_path)
+        if lock_fd is None:
+            logger.info("Another bridge daemon already owns %s; exiting.", socket_path)
+            return
+        if os.path.exists(socket_path):
+            os.unlink(socket_path) # Left behind by a daemon that died; we hold the lock now
+        daemon = BridgeDaemon(socket_path, bridge.ALARA_PROD_URL)
+        bridge.register_component_stats("daemon", daemon.stats)
+        async with http_client_lifespan():
+            bridge.start_metrics_writer()
+            try:
+                await daemon.serve()
+            finally:
+                with contextlib.suppress(OSError):
+                    os.unlink(socket_path)
+    except (OSError, DaemonUnavailable) as e:
+        logger.critical("Bridge daemon could not start on %s: %s", socket_path, e)
+    finally:
+        if lock_fd is not None:
+            os.close(lock_fd)
+        logger.info("--- Alara Bridge Daemon Shutting Down ---")
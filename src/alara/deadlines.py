@@ -0,0 +1,110 @@
+"""Deadlines for tool calls: configurable per operation or tag, and tightened by the client.
+
+A call's deadline covers everything the bridge does for it (rate limit waits,
+retries, backoff and every backend request). The remaining time is available to
+nested code through time_left(), so a retry is not started when it could not
+finish anyway, and each backend request is sent with at most the remaining
+time as its timeout. When the deadline passes, the call is cancelled, which
+closes its backend connection instead of leaving it to finish unseen.
+
+    ALARA_TIMEOUT       default seconds a tool call may take (default 60)
+    ALARA_TIMEOUTS      per-operation / per-tag overrides, e.g. "fetch_ohlcv=120,tag:Exchanges=20"
+    ALARA_MAX_TIMEOUT   largest `_timeout` a client may ask for (default 300)
+"""
+import asyncio
+import logging
+import os
+import time
+from contextvars import Context, ContextVar, copy_context
+from typing import Any, Awaitable, Callable, Iterable, Optional, TypeVar
+
+from alara.config import env_float
+from alara.response_cache import parse_ttl_overrides
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+T = TypeVar("T")
+
+# asyncio.timeout (3.11+) cancels in place; older versions fall back to wait_for's extra task
+_asyncio_timeout: Any = getattr(asyncio, "timeout", None)
+
+# Monotonic time by which the current call must finish (None outside of a call)
+_deadline: ContextVar[Optional[float]] = ContextVar("alara_call_deadline", default=None)
+
+
+class CallTimeoutError(Exception):
+    """The call did not finish before its deadline."""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"timed out after {timeout:g}s")
+        self.timeout = timeout
+
+
+class TimeoutPolicy:
+    def __init__(self, default_timeout: float = 60.0, overrides: Optional[dict] = None, max_timeout: float = 300.0):
+        self.default_timeout = default_timeout
+        self.overrides = overrides or {}
+        self.max_timeout = max_timeout
+
+    @classmethod
+    def from_env(cls) -> "TimeoutPolicy":
+        return cls(
+            default_timeout=env_float("ALARA_TIMEOUT", 60.0),
+            overrides=parse_ttl_overrides(os.getenv("ALARA_TIMEOUTS")),
+            max_timeout=env_float("ALARA_MAX_TIMEOUT", 300.0),
+        )
+
+    def timeout_for(self, operation_id: str, tags: Iterable[str], requested: Optional[float] = None) -> float:
+        """The client's own limit (capped at max_timeout) if given, else the operation or tag override, else the default."""
+        if requested is not None:
+            return min(requested, self.max_timeout) if self.max_timeout > 0 else requested
+        if operation_id in self.overrides:
+            return self.overrides[operation_id]
+        for tag in tags:
+            tag_timeout = self.overrides.get(f"tag:{tag}")
+            if tag_timeout is not None:
+                return tag_timeout
+        return self.default_timeout
+
+
+def time_left() -> Optional[float]:
+    """Seconds until the current call's deadline, or None when there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def detached_context() -> Context:
+    """A copy of the current context without the call deadline, for work shared by several calls."""
+    context = copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+
+async def run_with_deadline(timeout: float, fn: Callable[[], Awaitable[T]]) -> T:
+    """Run fn() and cancel it after `timeout` seconds (or at an enclosing call's earlier deadline).
+
+    A timeout of 0 or less means no limit of its own.
+    """
+    outer = _deadline.get()
+    deadline = time.monotonic() + timeout if timeout > 0 else None
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    if deadline is None:
+        return await fn()
+    token = _deadline.set(deadline)
+    try:
+        seconds = max(0.0, deadline - time.monotonic())
+        try:
+            if _asyncio_timeout is not None:
+                async with _asyncio_timeout(seconds):
+                    return await fn()
+            return await asyncio.wait_for(fn(), seconds)
+        except asyncio.TimeoutError:
+            if time.monotonic() < deadline:
+                raise # Raised by the call itself, not by our deadline
+            raise CallTimeoutError(timeout if deadline != outer else seconds) from None
+    finally:
+        _deadline.reset(token)
+
@@ -0,0 +1,96 @@
+"""Serialization of tool results.
+
+Results are returned as compact JSON (orjson when installed, else the stdlib
+encoder). The optional "columnar" format turns homogeneous arrays of records
+such as trades into per-field arrays, e.g.
+
+    [{"id": 1, "price": 2.0}, {"id": 2, "price": 2.5}]
+    -> {"_columns": {"id": [1, 2], "price": [2.0, 2.5]}, "_rows": 2}
+
+Arrays of equal-length rows of scalars, such as OHLCV candles or order book
+levels, become positional columns:
+
+    [[1700000000000, 1.0, 2.0, 0.5, 1.5, 10.0], [1700000060000, 1.5, 1.8, 1.2, 1.6, 7.0]]
+    -> {"_columns": [[1700000000000, 1700000060000], [1.0, 1.5], ..., [10.0, 7.0]], "_rows": 2}
+
+The format is chosen per call with the `_format` tool argument or globally with
+ALARA_RESULT_FORMAT ("json" or "columnar").
+"""
+import json
+import os
+from typing import Any, List, Optional
+
+try:
+    import orjson
+except ImportError: # Optional speed-up: pip install orjson
+    orjson = None
+
+RESULT_FORMATS = ("json", "columnar")
+
+# Arrays shorter than this are left as records; the column header would not pay off
+MIN_COLUMNAR_ROWS = 2
+
+
+def default_result_format() -> str:
+    result_format = os.getenv("ALARA_RESULT_FORMAT", "json").strip().lower()
+    return result_format if result_format in RESULT_FORMATS else "json"
+
+
+def dumps(data: Any) -> str:
+    """Compact JSON text for data."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass # e.g. integers beyond 64 bits; fall back to the stdlib encoder
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _record_keys(items: List[Any]) -> Optional[List[str]]:
+    """Keys shared by every record if items is a homogeneous list of dicts, else None."""
+    if len(items) < MIN_COLUMNAR_ROWS or not isinstance(items[0], dict) or not items[0]:
+        return None
+    keys = list(items[0].keys())
+    key_set = set(keys)
+    for item in items:
+        if not isinstance(item, dict) or item.keys() != key_set:
+            return None
+    return keys
+
+
+def _row_width(items: List[Any]) -> Optional[int]:
+    """Length shared by every row if items is a list of equal-length scalar lists, else None."""
+    if len(items) < MIN_COLUMNAR_ROWS or not isinstance(items[0], list) or not items[0]:
+        return None
+    width = len(items[0])
+    for item in items:
+        if not isinstance(item, list) or len(item) != width:
+            return None
+        for value in item:
+            if isinstance(value, (dict, list)):
+                return None
+    return width
+
+
+def to_columnar(data: Any) -> Any:
+    """Recursively pack homogeneous record arrays into per-field arrays, and row arrays into positional ones."""
+    if isinstance(data, list):
+        keys = _record_keys(data)
+        if keys is not None:
+            return {
+                "_columns": {key: [to_columnar(item[key]) for item in data] for key in keys},
+                "_rows": len(data),
+            }
+        width = _row_width(data)
+        if width is not None:
+            return {"_columns": [list(column) for column in zip(*data)], "_rows": len(data)}
+        return [to_columnar(item) for item in data]
+    if isinstance(data, dict):
+        return {key: to_columnar(value) for key, value in data.items()}
+    return data
+
+
+def encode_result(data: Any, result_format: Optional[str] = None) -> str:
+    if (result_format or default_result_format()) == "columnar":
+        data = to_columnar(data)
+    return dumps(data)
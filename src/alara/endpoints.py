@@ -0,0 +1,264 @@
+"""Several backend endpoints behind one bridge: health probes, latency-aware selection and failover.
+
+ALARA_MCP_URL may list several Alara backends (e.g. one per region), separated
+by commas or whitespace:
+
+    ALARA_MCP_URL="https://eu.alara.example,https://us.alara.example"
+
+Each request goes to the healthy endpoint with the lowest latency. The latency
+is an EWMA of the round trip of a small background probe sent to every
+endpoint, so all endpoints are measured the same way whichever one carries the
+traffic (the EWMA of real request latency is reported next to it). Until the
+first probe completes, endpoints are preferred in the order listed.
+
+An endpoint is marked unhealthy after ALARA_ENDPOINT_FAILURES consecutive
+failures (connection errors, timeouts, 502/503/504) and healthy again after
+one successful probe or request (with probes disabled, a request retries it
+every 30 seconds). When every endpoint is unhealthy, the one
+with the fewest consecutive failures is still tried rather than failing outright.
+
+Failover: an idempotent request (GET, HEAD, OPTIONS) that fails this way is
+sent again to the next best endpoint right away. Other requests only fail over
+when the connection could not be opened, i.e. before anything was sent.
+
+    ALARA_ENDPOINT_PROBE_INTERVAL   seconds between health probes (default 10, 0 disables them)
+    ALARA_ENDPOINT_PROBE_PATH       path probed on each endpoint (default "/"; any answer below 500 is healthy)
+    ALARA_ENDPOINT_PROBE_TIMEOUT    seconds before a probe counts as failed (default 5)
+    ALARA_ENDPOINT_FAILURES         consecutive failures that mark an endpoint unhealthy (default 3)
+    ALARA_ENDPOINT_EWMA_ALPHA       weight of the newest latency sample (default 0.3)
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+import httpx
+
+from alara.config import env_float, env_int
+from alara.deadlines import time_left
+from alara.http_client import get_http_client
+from alara.resilience import IDEMPOTENT_METHODS
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+T = TypeVar("T")
+
+FAILOVER_STATUS_CODES = frozenset({502, 503, 504})
+# Without probes, an unhealthy endpoint gets a request again after this many seconds
+UNHEALTHY_RETRY_AFTER = 30.0
+
+
+def parse_endpoint_urls(value: Optional[str]) -> List[str]:
+    """Base URLs from a comma- or whitespace-separated list, without trailing slashes or duplicates."""
+    urls: List[str] = []
+    for url in re.split(r"[\s,]+", value or ""):
+        url = url.strip().rstrip("/")
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def _ewma(current: Optional[float], sample: float, alpha: float) -> float:
+    return sample if current is None else current + alpha * (sample - current)
+
+
+class Endpoint:
+    """One backend base URL and what has been observed about it."""
+
+    def __init__(self, url: str, position: int):
+        self.url = url
+        self.position = position # Order in ALARA_MCP_URL, the tie-breaker
+        self.healthy = True
+        self.down_since = 0.0
+        self.probe_latency: Optional[float] = None # EWMA seconds
+        self.request_latency: Optional[float] = None # EWMA seconds
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.failovers = 0 # Requests moved from this endpoint to another one
+        self.probes = 0
+        self.probe_failures = 0
+        self.last_error: Optional[str] = None
+
+    def score(self) -> float:
+        latency = self.probe_latency if self.probe_latency is not None else self.request_latency
+        return latency if latency is not None else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "latency_ms": round(self.probe_latency * 1000, 2) if self.probe_latency is not None else None,
+            "request_latency_ms": round(self.request_latency * 1000, 2) if self.request_latency is not None else None,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "failovers": self.failovers,
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "last_error": self.last_error,
+        }
+
+
+class EndpointPool:
+    def __init__(self, urls: Iterable[str], probe_interval: float = 10.0, probe_path: str = "/", probe_timeout: float = 5.0,
+                 failure_threshold: int = 3, alpha: float = 0.3):
+        self.endpoints = [Endpoint(url, position) for position, url in enumerate(urls)]
+        if not self.endpoints:
+            raise ValueError("no backend URL configured")
+        self.probe_interval = probe_interval
+        self.probe_path = "/" + probe_path.lstrip("/")
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self.alpha = min(1.0, max(0.01, alpha))
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, urls: Iterable[str]) -> "EndpointPool":
+        return cls(
+            urls,
+            probe_interval=env_float("ALARA_ENDPOINT_PROBE_INTERVAL", 10.0),
+            probe_path=os.getenv("ALARA_ENDPOINT_PROBE_PATH", "/"),
+            probe_timeout=env_float("ALARA_ENDPOINT_PROBE_TIMEOUT", 5.0),
+            failure_threshold=env_int("ALARA_ENDPOINT_FAILURES", 3),
+            alpha=env_float("ALARA_ENDPOINT_EWMA_ALPHA", 0.3),
+        )
+
+    @property
+    def primary(self) -> Endpoint:
+        return self.endpoints[0]
+
+    def select(self, exclude: Iterable[Endpoint] = ()) -> Optional[Endpoint]:
+        """The fastest healthy endpoint not in exclude (or the least failing one if none is healthy)."""
+        if len(self.endpoints) == 1:
+            return None if self.primary in exclude else self.primary
+        self.start_probes()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+        if not candidates:
+            return None
+        healthy = [endpoint for endpoint in candidates if endpoint.healthy or self._retry_due(endpoint)]
+        if healthy:
+            return min(healthy, key=lambda endpoint: (endpoint.score(), endpoint.in_flight, endpoint.position))
+        return min(candidates, key=lambda endpoint: (endpoint.consecutive_failures, endpoint.position))
+
+    def _retry_due(self, endpoint: Endpoint) -> bool:
+        """With probes off nothing else would bring an endpoint back, so requests retry it now and then."""
+        return self.probe_interval <= 0 and time.monotonic() - endpoint.down_since >= UNHEALTHY_RETRY_AFTER
+
+    def record_success(self, endpoint: Endpoint, seconds: float) -> None:
+        endpoint.request_latency = _ewma(endpoint.request_latency, seconds, self.alpha)
+        self._mark_up(endpoint)
+
+    def record_failure(self, endpoint: Endpoint, error: str) -> None:
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        endpoint.last_error = error
+        if not endpoint.healthy:
+            endpoint.down_since = time.monotonic() # Still failing: wait a full period before the next retry
+        elif endpoint.consecutive_failures >= self.failure_threshold and len(self.endpoints) > 1:
+            endpoint.healthy = False
+            endpoint.down_since = time.monotonic()
+            logger.warning("Backend endpoint %s marked unhealthy after %s failures: %s", endpoint.url, endpoint.consecutive_failures, error)
+
+    def _mark_up(self, endpoint: Endpoint) -> None:
+        endpoint.consecutive_failures = 0
+        if not endpoint.healthy:
+            endpoint.healthy = True
+            logger.info("Backend endpoint %s is healthy again.", endpoint.url)
+
+    async def request(self, http_method: str, send: Callable[[Endpoint], Awaitable[T]]) -> T:
+        """Call send(endpoint) on the best endpoint, failing over to the others when that is safe."""
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self.select(tried)
+            if endpoint is None:
+                raise RuntimeError("no backend endpoint left to try") # pragma: no cover - send() raised before
+            tried.append(endpoint)
+            endpoint.requests += 1
+            endpoint.in_flight += 1
+            started = time.perf_counter()
+            try:
+                result = await send(endpoint)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in FAILOVER_STATUS_CODES:
+                    self._mark_up(endpoint) # The endpoint answered; the request itself was refused
+                    raise
+                self.record_failure(endpoint, f"HTTP {e.response.status_code}")
+                if not self._can_fail_over(http_method, e, tried):
+                    raise
+            except httpx.TransportError as e:
+                self.record_failure(endpoint, f"{type(e).__name__}: {e}")
+                if not self._can_fail_over(http_method, e, tried):
+                    raise
+            else:
+                self.record_success(endpoint, time.perf_counter() - started)
+                return result
+            finally:
+                endpoint.in_flight -= 1
+            endpoint.failovers += 1
+            logger.warning("Backend endpoint %s failed (%s); failing over.", endpoint.url, endpoint.last_error)
+
+    def _can_fail_over(self, http_method: str, error: Exception, tried: List[Endpoint]) -> bool:
+        if len(tried) >= len(self.endpoints):
+            return False
+        remaining = time_left()
+        if remaining is not None and remaining <= 0:
+            return False
+        # A request that never left this host can be sent elsewhere whatever its method
+        return http_method in IDEMPOTENT_METHODS or isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+    # --- Health probes --- #
+    def start_probes(self) -> None:
+        """Start the background prober (once, and only when there is a choice to make)."""
+        if self._probe_task is not None or self.probe_interval <= 0 or len(self.endpoints) < 2:
+            return
+        try:
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_periodically())
+        except RuntimeError:
+            pass # No event loop yet; started on the first request
+
+    def stop_probes(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self._probe(endpoint) for endpoint in self.endpoints))
+
+    async def _probe(self, endpoint: Endpoint) -> None:
+        endpoint.probes += 1
+        started = time.perf_counter()
+        try:
+            response = await get_http_client().get(endpoint.url + self.probe_path, timeout=self.probe_timeout)
+            await response.aclose()
+        except (httpx.HTTPError, OSError) as e:
+            endpoint.probe_failures += 1
+            self.record_failure(endpoint, f"probe: {type(e).__name__}: {e}")
+            return
+        if response.status_code >= 500:
+            endpoint.probe_failures += 1
+            self.record_failure(endpoint, f"probe: HTTP {response.status_code}")
+            return
+        endpoint.probe_latency = _ewma(endpoint.probe_latency, time.perf_counter() - started, self.alpha)
+        self._mark_up(endpoint)
+
+    async def _probe_periodically(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e: # Keep probing whatever happened
+                logger.warning("Backend health probe failed: %s", e)
+            await asyncio.sleep(self.probe_interval * random.uniform(0.9, 1.1))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": sum(1 for endpoint in self.endpoints if endpoint.healthy),
+            "failovers": sum(endpoint.failovers for endpoint in self.endpoints),
+            "backends": {endpoint.url: endpoint.stats() for endpoint in self.endpoints},
+        }
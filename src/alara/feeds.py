@@ -0,0 +1,283 @@
+"""Shared market-data feeds behind subscribable MCP resources.
+
+Instead of calling a ticker or order book tool over and over, a client
+subscribes to a resource such as
+
+    alara://ticker/binance/BTC/USDT
+    alara://orderbook/binance/BTC/USDT
+
+and reads it again whenever it receives `notifications/resources/updated`. Each
+resource is polled upstream by exactly one task, however many sessions
+subscribe to it (feeds are kept apart per API key). A notification is only sent
+when the data actually changed. Its `_meta` carries the new version and, when
+small enough, the delta from the previous version, so clients that understand
+it can skip the read.
+
+Configuration (environment):
+
+    ALARA_FEED_INTERVAL     seconds between upstream polls of one feed (default 2)
+    ALARA_FEED_OPERATIONS   backend operation per feed kind
+                            (default "ticker=fetch_ticker,orderbook=fetch_order_book")
+    ALARA_FEED_MAX          feeds polled at the same time, 0 disables subscriptions (default 64)
+    ALARA_FEED_DELTA_MAX    largest delta (changed fields + book levels) sent inline (default 200)
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from alara.config import env_float, env_int
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+FEED_SCHEME = "alara://"
+DEFAULT_FEED_OPERATIONS = "ticker=fetch_ticker,orderbook=fetch_order_book"
+# Longest wait between polls while the backend keeps failing
+MAX_ERROR_BACKOFF = 60.0
+# Parameter names a feed operation may use for the symbol (exchange names: response_cache.EXCHANGE_ARGUMENT_NAMES)
+SYMBOL_ARGUMENT_NAMES = ("symbol", "pair", "market")
+
+
+class FeedError(Exception):
+    """The resource is not a valid feed, or no more feeds can be started."""
+
+
+def parse_feed_operations(spec: Optional[str]) -> Dict[str, str]:
+    """Parse "kind=operation_id,..." into a dict."""
+    operations: Dict[str, str] = {}
+    for item in (spec or "").split(","):
+        kind, sep, operation_id = item.strip().partition("=")
+        if sep and kind.strip() and operation_id.strip():
+            operations[kind.strip()] = operation_id.strip()
+        elif item.strip():
+            logger.warning("Ignoring invalid ALARA_FEED_OPERATIONS entry %r.", item)
+    return operations
+
+
+def parse_feed_uri(uri: str, kinds: Any) -> Optional[Tuple[str, str, str]]:
+    """(kind, exchange, symbol) for alara://<kind>/<exchange>/<symbol>, else None.
+
+    The symbol is everything after the exchange, so both BTC/USDT and BTC%2FUSDT work.
+    """
+    if not uri.startswith(FEED_SCHEME):
+        return None
+    kind, _, rest = uri[len(FEED_SCHEME):].partition("/")
+    exchange, _, symbol = rest.partition("/")
+    if kind not in kinds or not exchange or not symbol:
+        return None
+    return kind, unquote(exchange).lower(), unquote(symbol)
+
+
+def _is_book_side(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(level, list) and len(level) >= 2 for level in value)
+
+
+def _book_side_delta(old: List[List[Any]], new: List[List[Any]]) -> List[List[Any]]:
+    """Changed [price, amount] levels; removed levels are reported with amount 0."""
+    old_levels = {level[0]: level[1] for level in old}
+    new_levels = {level[0]: level[1] for level in new}
+    changes = [[price, amount] for price, amount in new_levels.items() if old_levels.get(price) != amount]
+    changes += [[price, 0] for price in old_levels if price not in new_levels]
+    return changes
+
+
+def compute_delta(old: Any, new: Any, max_items: int) -> Optional[Dict[str, Any]]:
+    """Top-level fields that changed between two JSON objects, or None if a delta does not fit.
+
+    Order book sides (lists of [price, amount] levels) are diffed per level.
+    None means "re-read the resource": the values are not objects, or the
+    delta has more than max_items entries.
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None
+    changed: Dict[str, Any] = {}
+    levels: Dict[str, List[List[Any]]] = {}
+    size = 0
+    for key, value in new.items():
+        previous = old.get(key)
+        if previous == value:
+            continue
+        if _is_book_side(previous) and _is_book_side(value):
+            levels[key] = _book_side_delta(previous, value)
+            size += len(levels[key])
+        else:
+            changed[key] = value
+            size += 1
+        if size > max_items:
+            return None
+    removed = [key for key in old if key not in new]
+    delta: Dict[str, Any] = {}
+    if changed:
+        delta["set"] = changed
+    if levels:
+        delta["levels"] = levels
+    if removed:
+        delta["removed"] = removed
+    return delta
+
+
+class Feed:
+    """One polled resource and the sessions subscribed to it."""
+
+    def __init__(self, uri: str, kind: str, exchange: str, symbol: str, identity: str):
+        self.uri = uri
+        self.kind = kind
+        self.exchange = exchange
+        self.symbol = symbol
+        self.identity = identity
+        self.subscribers: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self.data: Any = None
+        self.delta: Optional[Dict[str, Any]] = None
+        self.version = 0
+        self.updated_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def payload(self) -> Dict[str, Any]:
+        """What a resources/read of this feed returns."""
+        return {
+            "uri": self.uri,
+            "exchange": self.exchange,
+            "symbol": self.symbol,
+            "version": self.version,
+            "updated_at": self.updated_at,
+            "error": self.last_error,
+            "changes": self.delta,
+            "data": self.data,
+        }
+
+
+class FeedManager:
+    """Starts one poller per subscribed resource and fans its updates out to the subscribers.
+
+    `fetch(feed)` returns the current upstream data for a feed; `notify(session,
+    feed)` sends one session the resources/updated notification. Both are
+    supplied by the bridge, so this module stays transport-independent.
+    """
+
+    def __init__(self, fetch: Callable[[Feed], Awaitable[Any]], notify: Callable[[Any, Feed], Awaitable[None]],
+                 operations: Dict[str, str], interval: float = 2.0, max_feeds: int = 64, delta_max: int = 200):
+        self.fetch = fetch
+        self.notify = notify
+        self.operations = operations
+        self.interval = max(0.05, interval)
+        self.max_feeds = max_feeds
+        self.delta_max = delta_max
+        self._feeds: Dict[Tuple[str, str], Feed] = {}
+        self.polls = 0
+        self.updates = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.notifications = 0
+
+    @classmethod
+    def from_env(cls, fetch: Callable[[Feed], Awaitable[Any]], notify: Callable[[Any, Feed], Awaitable[None]]) -> "FeedManager":
+        return cls(
+            fetch, notify,
+            operations=parse_feed_operations(os.getenv("ALARA_FEED_OPERATIONS", DEFAULT_FEED_OPERATIONS)),
+            interval=env_float("ALARA_FEED_INTERVAL", 2.0),
+            max_feeds=env_int("ALARA_FEED_MAX", 64),
+            delta_max=env_int("ALARA_FEED_DELTA_MAX", 200),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_feeds > 0 and bool(self.operations)
+
+    def parse(self, uri: str) -> Optional[Tuple[str, str, str]]:
+        return parse_feed_uri(uri, self.operations)
+
+    def get(self, uri: str, identity: str) -> Optional[Feed]:
+        return self._feeds.get((identity, uri))
+
+    def feeds(self, identity: str) -> List[Feed]:
+        return [feed for (feed_identity, _), feed in self._feeds.items() if feed_identity == identity]
+
+    def subscribe(self, uri: str, identity: str, session: Any) -> Feed:
+        """Add a subscriber, starting the feed's poller if it is the first."""
+        feed = self._feeds.get((identity, uri))
+        if feed is None:
+            parsed = self.parse(uri)
+            if parsed is None:
+                raise FeedError(f"Not a subscribable resource: {uri}")
+            if len(self._feeds) >= self.max_feeds:
+                raise FeedError(f"Too many active feeds (ALARA_FEED_MAX={self.max_feeds}).")
+            feed = Feed(uri, *parsed, identity)
+            self._feeds[(identity, uri)] = feed
+            # The poller inherits the caller's context, so it polls with the subscribing session's API key
+            feed.task = asyncio.create_task(self._poll(feed))
+            logger.info("Started feed %s.", uri)
+        feed.subscribers.add(session)
+        return feed
+
+    def unsubscribe(self, uri: str, identity: str, session: Any) -> None:
+        feed = self._feeds.get((identity, uri))
+        if feed is None:
+            return
+        feed.subscribers.discard(session)
+        if not feed.subscribers:
+            self._stop(feed)
+
+    def _stop(self, feed: Feed) -> None:
+        if self._feeds.get((feed.identity, feed.uri)) is feed:
+            del self._feeds[(feed.identity, feed.uri)]
+        if feed.task and not feed.task.done() and feed.task is not asyncio.current_task():
+            feed.task.cancel()
+        logger.info("Stopped feed %s (no subscribers left).", feed.uri)
+
+    async def _poll(self, feed: Feed) -> None:
+        failures = 0
+        while feed.subscribers:
+            self.polls += 1
+            try:
+                data = await self.fetch(feed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                self.errors += 1
+                feed.last_error = str(e)
+                delay = min(MAX_ERROR_BACKOFF, self.interval * 2 ** min(failures, 10)) * random.uniform(0.8, 1.2)
+                logger.warning("Feed %s poll failed (%s in a row, next in %.1fs): %s", feed.uri, failures, delay, e)
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            feed.last_error = None
+            if feed.version and data == feed.data:
+                self.unchanged += 1
+            else:
+                feed.delta = compute_delta(feed.data, data, self.delta_max) if feed.version else None
+                feed.data = data
+                feed.version += 1
+                feed.updated_at = time.time()
+                self.updates += 1
+                await self._fan_out(feed)
+            await asyncio.sleep(self.interval)
+        self._stop(feed)
+
+    async def _fan_out(self, feed: Feed) -> None:
+        sessions = list(feed.subscribers)
+        # Concurrently, so one slow client does not hold up the others
+        results = await asyncio.gather(*(self.notify(session, feed) for session in sessions), return_exceptions=True)
+        for session, result in zip(sessions, results):
+            if isinstance(result, Exception):
+                # Usually a closed session; it will not read the update anyway
+                logger.info("Dropping subscriber of %s: %s", feed.uri, result)
+                feed.subscribers.discard(session)
+            else:
+                self.notifications += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "feeds": len(self._feeds),
+            "subscribers": sum(len(feed.subscribers) for feed in self._feeds.values()),
+            "polls": self.polls,
+            "updates": self.updates,
+            "unchanged": self.unchanged,
+            "errors": self.errors,
+            "notifications": self.notifications,
+        }
@@ -0,0 +1,132 @@
+"""Shared, pooled httpx client used for every call to the Alara backend.
+
+One long-lived AsyncClient keeps TCP/TLS connections alive between tool calls
+instead of paying a fresh handshake each time. Its lifecycle is tied to
+run_bridge via http_client_lifespan(); pool settings come from the environment:
+
+    ALARA_HTTP_MAX_CONNECTIONS      total connections in the pool (default 100)
+    ALARA_HTTP_MAX_KEEPALIVE        idle keep-alive connections kept open (default 20)
+    ALARA_HTTP_KEEPALIVE_EXPIRY     seconds an idle connection is kept (default 30)
+    ALARA_HTTP_CONNECT_TIMEOUT      connect timeout in seconds (default 10)
+    ALARA_HTTP2                     1 to enable HTTP/2 multiplexing (needs `pip install alara[http2]`)
+    ALARA_HTTP_COMPRESSION          0 to ask the backend for uncompressed responses (default 1)
+"""
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from alara.config import env_bool, env_float, env_int
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _accept_encoding() -> str:
+    """Advertise every content coding httpx can decode in this environment."""
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append("br")
+        except ImportError:
+            pass
+    try:
+        import zstandard  # noqa: F401
+        encodings.append("zstd")
+    except ImportError:
+        pass
+    return ", ".join(encodings)
+
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Build a pooled AsyncClient from the ALARA_HTTP_* settings.
+
+    `transport` lets callers (benchmarks, stub backends) swap the network layer.
+    """
+    limits = httpx.Limits(
+        max_connections=env_int("ALARA_HTTP_MAX_CONNECTIONS", 100),
+        max_keepalive_connections=env_int("ALARA_HTTP_MAX_KEEPALIVE", 20),
+        keepalive_expiry=env_float("ALARA_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    timeout = httpx.Timeout(60.0, connect=env_float("ALARA_HTTP_CONNECT_TIMEOUT", 10.0))
+
+    http2 = env_bool("ALARA_HTTP2", False)
+    if http2 and not _http2_available():
+        logger.warning("ALARA_HTTP2 is enabled but the 'h2' package is not installed (pip install alara[http2]). Falling back to HTTP/1.1.")
+        http2 = False
+
+    headers = {"Accept-Encoding": _accept_encoding() if env_bool("ALARA_HTTP_COMPRESSION", True) else "identity"}
+
+    logger.info(
+        "Creating shared HTTP client (max_connections=%s, max_keepalive=%s, keepalive_expiry=%ss, http2=%s, accept-encoding=%s)",
+        limits.max_connections, limits.max_keepalive_connections, limits.keepalive_expiry, http2, headers["Accept-Encoding"],
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, headers=headers, transport=transport)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+def set_http_client(client: Optional[httpx.AsyncClient]) -> None:
+    """Install a specific client as the shared one (e.g. one backed by a mock transport)."""
+    global _client
+    _client = client
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Connection counts of the shared client's pool (empty if unavailable).
+
+    Reads httpcore's pool through private attributes, so this is best effort.
+    """
+    if _client is None or _client.is_closed:
+        return {}
+    try:
+        pool = _client._transport._pool
+        connections = list(pool.connections)
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "connections": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "queued_requests": sum(1 for request in getattr(pool, "_requests", ()) if request.is_queued()),
+            "max_connections": pool._max_connections,
+        }
+    except Exception:
+        return {}
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.aclose()
+        logger.info("Shared HTTP client closed.")
+
+
+@asynccontextmanager
+async def http_client_lifespan() -> AsyncIterator[httpx.AsyncClient]:
+    """Open the shared client for the lifetime of the bridge and close its pool on exit."""
+    client = get_http_client()
+    try:
+        yield client
+    finally:
+        await close_http_client()
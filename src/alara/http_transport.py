@@ -0,0 +1,279 @@
+"""Streamable HTTP transport: one bridge process serving many MCP clients over HTTP.
+
+Started with `python -m alara.main --http`, the bridge serves the MCP
+streamable HTTP protocol (JSON responses or SSE streams, as negotiated by the
+client) at `http://<host>:<port>/mcp` using uvicorn. Sessions run
+concurrently in one event loop and share the schema index, HTTP pool, caches
+and metrics. `/healthz` answers liveness probes and `/metrics` serves the
+Prometheus metrics.
+
+Each client passes its own key in an `X-API-Key` (or `Authorization: Bearer`)
+header. It is used for all backend calls of that session, and a session only
+accepts requests carrying the key that created it: a session id the bridge did
+not issue, or one whose session has ended, is answered with 404 whatever the
+key. Requests without a key use ALARA_API_KEY from the server environment if
+set, and are rejected otherwise.
+
+    ALARA_SERVE_HOST            interface to bind (default 127.0.0.1)
+    ALARA_SERVE_PORT            port (default 8765)
+    ALARA_SERVE_WORKERS         worker processes (default 1; more than one implies stateless mode)
+    ALARA_SERVE_STATELESS       1 to handle every request without session state (default 0)
+    ALARA_SERVE_JSON_RESPONSE   1 to answer with plain JSON instead of SSE streams (default 0)
+    ALARA_SERVE_MAX_SESSIONS    concurrent MCP sessions per worker (default 1000)
+    ALARA_SERVE_SESSION_IDLE    seconds before an idle session is closed (default 1800)
+    ALARA_SERVE_MAX_INFLIGHT    concurrent POST requests (tool calls etc.) per worker (default 256)
+    ALARA_SERVE_QUEUE_TIMEOUT   seconds a request waits for an in-flight slot before a 503 (default 10)
+    ALARA_SERVE_MAX_BODY        largest request body in bytes (default 4 MiB)
+
+Needs mcp>=1.8 (`pip install "alara[http]"`).
+"""
+import asyncio
+import contextlib
+import inspect
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+from alara import bridge
+from alara.config import DEFAULT_BACKEND_URL, env_bool, env_float, env_int
+from alara.http_client import http_client_lifespan
+from alara.logging_setup import configure_logging
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+MCP_PATH = "/mcp"
+SESSION_ID_HEADER = b"mcp-session-id"
+# Bindings of ended sessions are swept once the table reaches this size (then twice its live size)
+SESSION_PRUNE_MIN = 64
+
+
+async def _plain_response(send: Any, status: int, body: str, headers: Optional[Dict[str, str]] = None) -> None:
+    raw_headers = [(b"content-type", b"text/plain; charset=utf-8")]
+    raw_headers += [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body.encode("utf-8")})
+
+
+def _request_api_key(headers: Dict[bytes, bytes]) -> Optional[str]:
+    api_key = headers.get(b"x-api-key")
+    if not api_key:
+        authorization = headers.get(b"authorization", b"")
+        if authorization[:7].lower() == b"bearer ":
+            api_key = authorization[7:].strip()
+    if api_key:
+        return api_key.decode("latin-1")
+    return bridge.ALARA_API_KEY
+
+
+class MCPEndpoint:
+    """ASGI app in front of the session manager: per-request API key, session binding and limits."""
+
+    def __init__(self, session_manager: Any, max_inflight: int, queue_timeout: float, max_body: int, stateless: bool = False):
+        self.session_manager = session_manager
+        self.queue_timeout = queue_timeout
+        self.max_body = max_body
+        self.stateless = stateless
+        self._slots = asyncio.Semaphore(max_inflight) if max_inflight > 0 else None
+        # Session id -> fingerprint of the key that opened it; kept until the session ends
+        self._session_keys: Dict[str, str] = {}
+        self._prune_at = SESSION_PRUNE_MIN
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected_busy = 0
+        self.rejected_auth = 0
+        self.rejected_size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(getattr(self.session_manager, "_server_instances", self._session_keys)),
+            "in_flight_requests": self.in_flight,
+            "queued_requests": self.queued,
+            "rejected_busy": self.rejected_busy,
+            "rejected_auth": self.rejected_auth,
+            "rejected_too_large": self.rejected_size,
+        }
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        headers = dict(scope.get("headers") or ())
+        api_key = _request_api_key(headers)
+        if not api_key:
+            self.rejected_auth += 1
+            await _plain_response(send, 401, "Missing X-API-Key header.", {"WWW-Authenticate": "Bearer"})
+            return
+        content_length = headers.get(b"content-length", b"")
+        if self.max_body > 0 and content_length.isdigit() and int(content_length) > self.max_body:
+            self.rejected_size += 1
+            await _plain_response(send, 413, f"Request body exceeds {self.max_body} bytes.")
+            return
+
+        identity = bridge.api_key_identity(api_key)
+        session_id = headers.get(SESSION_ID_HEADER, b"").decode("latin-1") or None
+        if self.stateless:
+            session_id = None # No session state: the id (if any) is ignored by the session manager
+        elif session_id is not None:
+            owner = self._session_keys.get(session_id)
+            if owner is not None and not self._session_alive(session_id):
+                del self._session_keys[session_id] # Ended (idle timeout, crash) since its last request
+                owner = None
+            if owner != identity:
+                # Same answer for unknown, ended and foreign sessions, so ids cannot be probed with other keys
+                if owner is not None:
+                    logger.warning("Rejecting request for MCP session %s: API key differs from the one that opened it.", session_id[:16])
+                self.rejected_auth += 1
+                await _plain_response(send, 404, "Session not found.")
+                return
+        elif scope.get("method") == "POST":
+            send = self._track_new_session(send, identity)
+        # Sessions opened by this request run with its key (their tasks inherit this context)
+        token = bridge.session_api_key.set(api_key)
+        try:
+            if scope.get("method") != "POST" or self._slots is None:
+                await self.session_manager.handle_request(scope, receive, send)
+            else:
+                await self._handle_limited(scope, receive, send)
+        finally:
+            bridge.session_api_key.reset(token)
+            if session_id is not None and (scope.get("method") == "DELETE" or not self._session_alive(session_id)):
+                self._session_keys.pop(session_id, None)
+
+    async def _handle_limited(self, scope: Any, receive: Any, send: Any) -> None:
+        """Run a POST once an in-flight slot is free; 503 when none frees up in time."""
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_busy += 1
+            logger.warning("Rejecting MCP request: %s requests in flight for %.1fs.", self.in_flight, self.queue_timeout)
+            await _plain_response(send, 503, "Bridge is busy, retry shortly.", {"Retry-After": "1"})
+            return
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        try:
+            await self.session_manager.handle_request(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def _session_alive(self, session_id: str) -> bool:
+        live = getattr(self.session_manager, "_server_instances", None)
+        return live is None or session_id in live
+
+    def _track_new_session(self, send: Any, identity: str) -> Any:
+        async def tracking_send(message: Dict[str, Any]) -> None:
+            if message.get("type") == "http.response.start":
+                for name, value in message.get("headers") or ():
+                    if name.lower() == SESSION_ID_HEADER:
+                        self._session_keys[value.decode("latin-1")] = identity
+                        if len(self._session_keys) >= self._prune_at:
+                            self._forget_ended_sessions()
+                        break
+            await send(message)
+        return tracking_send
+
+    def _forget_ended_sessions(self) -> None:
+        """Drop the bindings of sessions the session manager has closed (idle timeout) without a DELETE."""
+        for session_id in [session_id for session_id in self._session_keys if not self._session_alive(session_id)]:
+            del self._session_keys[session_id]
+        # Amortized: the next sweep waits until the table has doubled again
+        self._prune_at = max(SESSION_PRUNE_MIN, 2 * len(self._session_keys))
+
+    def clear_sessions(self) -> None:
+        """The session manager stopped: every session has ended."""
+        self._session_keys.clear()
+
+
+def _session_manager_options(stateless: bool) -> Dict[str, Any]:
+    """StreamableHTTPSessionManager arguments, limited to those this mcp version supports."""
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    options: Dict[str, Any] = {
+        "stateless": stateless,
+        "json_response": env_bool("ALARA_SERVE_JSON_RESPONSE", False),
+        "max_sessions": env_int("ALARA_SERVE_MAX_SESSIONS", 1000) or None, # 0 = unlimited
+        "session_idle_timeout": env_float("ALARA_SERVE_SESSION_IDLE", 1800.0) or None,
+    }
+    max_body = env_int("ALARA_SERVE_MAX_BODY", 4 * 1024 * 1024)
+    if max_body > 0:
+        options["max_request_body_size"] = max_body
+    supported = inspect.signature(StreamableHTTPSessionManager.__init__).parameters
+    for name in ("max_sessions", "session_idle_timeout", "max_request_body_size"):
+        if name in options and name not in supported:
+            logger.warning("This mcp version does not support %s; upgrade mcp to enforce it.", name)
+            del options[name]
+    return options
+
+
+def create_app(stateless: Optional[bool] = None) -> Any:
+    """The Starlette app serving the bridge (also the uvicorn factory for worker processes)."""
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, PlainTextResponse
+    from starlette.routing import Route
+
+    configure_logging("http", shared=env_int("ALARA_SERVE_WORKERS", 1) > 1) # No-op if main() already did it
+    bridge.ALARA_API_KEY = os.getenv("ALARA_API_KEY") or None
+    bridge.ALARA_PROD_URL = os.getenv("ALARA_MCP_URL") or DEFAULT_BACKEND_URL
+    if stateless is None:
+        stateless = env_bool("ALARA_SERVE_STATELESS", False) or env_int("ALARA_SERVE_WORKERS", 1) > 1
+
+    server = bridge.create_server(subscriptions=not stateless)
+    session_manager = StreamableHTTPSessionManager(app=server, **_session_manager_options(stateless))
+    endpoint = MCPEndpoint(
+        session_manager,
+        max_inflight=env_int("ALARA_SERVE_MAX_INFLIGHT", 256),
+        queue_timeout=env_float("ALARA_SERVE_QUEUE_TIMEOUT", 10.0),
+        max_body=env_int("ALARA_SERVE_MAX_BODY", 4 * 1024 * 1024),
+        stateless=stateless,
+    )
+    bridge.register_component_stats("http_server", endpoint.stats)
+
+    async def healthz(request: Any) -> Any:
+        return JSONResponse({"status": "ok", "schema_loaded": bridge._schema is not None})
+
+    async def metrics(request: Any) -> Any:
+        return PlainTextResponse(bridge.metrics_prometheus(), media_type="text/plain; version=0.0.4")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Any) -> AsyncIterator[None]:
+        async with http_client_lifespan(), session_manager.run():
+            if bridge.current_api_key():
+                bridge.start_schema_prewarm() # Otherwise the first session's key loads it
+            bridge.start_metrics_writer()
+            logger.info("Streamable HTTP transport ready at %s (stateless=%s).", MCP_PATH, stateless)
+            yield
+        endpoint.clear_sessions()
+        logger.info("Streamable HTTP transport stopped.")
+
+    return Starlette(
+        routes=[
+            Route(MCP_PATH, endpoint=endpoint, methods=["GET", "POST", "DELETE"]),
+            Route("/healthz", endpoint=healthz),
+            Route("/metrics", endpoint=metrics),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def run_http_bridge(host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None) -> None:
+    """Serve the bridge over streamable HTTP until interrupted."""
+    try:
+        import uvicorn
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager  # noqa: F401
+    except ImportError as e:
+        raise SystemExit(f'The HTTP transport needs mcp>=1.8 and uvicorn: pip install "alara[http]" ({e})')
+
+    host = host or os.getenv("ALARA_SERVE_HOST") or "127.0.0.1"
+    port = port or env_int("ALARA_SERVE_PORT", 8765)
+    workers = max(1, workers or env_int("ALARA_SERVE_WORKERS", 1))
+    if not os.getenv("ALARA_API_KEY"):
+        logger.info("No ALARA_API_KEY in the environment: every client must send its own X-API-Key.")
+    log_level = os.getenv("LOG_LEVEL", "INFO").lower()
+    if workers > 1:
+        # Workers share no session state, so each request must stand on its own
+        os.environ["ALARA_SERVE_WORKERS"] = str(workers)
+        logger.info("Starting %s HTTP workers on %s:%s (stateless mode).", workers, host, port)
+        uvicorn.run("alara.http_transport:create_app", factory=True, host=host, port=port, workers=workers,
+                    log_level=log_level, log_config=None)
+    else:
+        logger.info("Starting HTTP transport on %s:%s.", host, port)
+        uvicorn.run(create_app(), host=host, port=port, log_level=log_level, log_config=None)
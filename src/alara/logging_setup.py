@@ -0,0 +1,190 @@
+"""Non-blocking logging pipeline for the bridge.
+
+Log records are handed to a queue on the asyncio thread and written to the
+log file and stderr by a QueueListener thread, so slow disk or pipe writes
+never stall the event loop. Messages use %-style arguments and are only
+formatted (on the listener thread) when the level is enabled.
+
+Each role logs to its own file by default: alara.log for the stdio bridge,
+alara-daemon.log and alara-http.log for the daemon and the HTTP server.
+Several processes may write the same file (every MCP client starts its own
+stdio bridge; HTTP workers). Such a shared file is still rotated at
+ALARA_LOG_MAX_BYTES: writers serialize on an flock of "<file>.lock", so one
+process at a time checks the size and rotates, and the others reopen the new
+file before their next write. Where flock is unavailable (Windows) each
+process gets its own file, named with its pid. A "{pid}" in ALARA_LOG_FILE
+also gives each process its own file.
+
+    LOG_LEVEL               DEBUG/INFO/WARNING/... (default INFO)
+    ALARA_LOG_FILE          log file path (default <project root>/alara.log, alara-daemon.log, alara-http.log)
+    ALARA_LOG_MAX_BYTES     rotate the log file at this size (default 10 MiB, 0 = never)
+    ALARA_LOG_BACKUP_COUNT  rotated files to keep (default 3)
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+LOGGER_NAME = "AlaraStdioBridge"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class _DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler.prepare() formats every record on the calling
+    thread; here only the traceback (which references live frames) is rendered
+    eagerly.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SharedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler for a file that several processes append to.
+
+    Every write holds an exclusive flock on "<file>.lock", and a process whose
+    file was rotated by another one reopens the current file before writing.
+    """
+
+    def __init__(self, filename: str, maxBytes: int, backupCount: int):
+        super().__init__(filename, mode="a", maxBytes=maxBytes, backupCount=backupCount, delay=True)
+        self._lock_file = open(self.baseFilename + ".lock", "a")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        except (OSError, ValueError):
+            self.handleError(record)
+            return
+        try:
+            self._reopen_if_rotated()
+            super().emit(record) # Checks the size (of the file, not of our writes) and rotates under the lock
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = self._open()
+
+    def close(self) -> None:
+        super().close()
+        self._lock_file.close()
+
+
+def default_log_file_path(role: str = "bridge") -> str:
+    # Calculate path relative to this file: go up two levels (src/alara -> project root)
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(script_dir))
+    return os.path.join(project_root, "alara.log" if role == "bridge" else f"alara-{role}.log")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def configure_logging(role: str = "bridge", shared: Optional[bool] = None) -> logging.Logger:
+    """Set up the bridge logger once and start the background writer thread.
+
+    `role` ("bridge", "daemon" or "http") picks the default log file; `shared`
+    says whether other processes write the same file (default: only the stdio bridge's is).
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
+        return logger
+
+    # Determine log level from environment variable, default to INFO
+    log_level_name = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_level = getattr(logging, log_level_name, logging.INFO)
+
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    stderr_handler.setFormatter(formatter)
+    handlers = [stderr_handler] # Keep stderr for immediate feedback if needed
+
+    log_file_path = os.getenv("ALARA_LOG_FILE") or default_log_file_path(role)
+    if shared is None:
+        shared = role == "bridge" # One stdio bridge process per MCP client
+    if shared and fcntl is None and "{pid}" not in log_file_path:
+        root, extension = os.path.splitext(log_file_path)
+        log_file_path = f"{root}-{{pid}}{extension}" # No flock to coordinate rotation: one file per process
+    if "{pid}" in log_file_path:
+        log_file_path = log_file_path.replace("{pid}", str(os.getpid()))
+        shared = False
+    max_bytes = _env_int("ALARA_LOG_MAX_BYTES", 10 * 1024 * 1024)
+    backup_count = _env_int("ALARA_LOG_BACKUP_COUNT", 3)
+    file_handler: logging.Handler
+    try:
+        os.makedirs(os.path.dirname(log_file_path) or ".", exist_ok=True)
+        if shared:
+            file_handler = SharedRotatingFileHandler(log_file_path, maxBytes=max_bytes, backupCount=backup_count)
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file_path,
+                mode="a", # Append mode
+                maxBytes=max_bytes,
+                backupCount=backup_count,
+                delay=True, # Open the file on the first write, on the listener thread
+            )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except OSError as e:
+        print(f"Alara: could not set up log file {log_file_path}: {e}", file=sys.stderr)
+
+    # Remove handlers left over on the root logger and from a previous run (important!)
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger.setLevel(log_level)
+    logger.addHandler(_DeferredFormatQueueHandler(log_queue))
+    logger.propagate = False # Prevent messages from propagating to the root logger
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    # Prevent libraries (like httpx) from spamming debug logs unless explicitly desired
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+    logger.info("--- Alara StdIO Bridge Initializing --- Logging configured. Level: %s. File: %s ---", log_level_name, log_file_path)
+    return logger
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
@@ -0,0 +1,289 @@
+"""In-process metrics for tool calls, upstream requests and schema loading.
+
+Per operationId the bridge counts calls, cache hits and errors by reason, and
+keeps latency histograms split into time spent waiting on the backend
+(including retries and rate limiting) and bridge overhead (routing,
+validation, caching). Each HTTP response is also counted by status code, with
+its pure request time and body size.
+
+The numbers are served by the `alara://metrics` resource and the
+`alara_metrics` tool, and can be written periodically in Prometheus text
+format to a local file:
+
+    ALARA_METRICS_FILE      path of the Prometheus snapshot file (default: off)
+    ALARA_METRICS_INTERVAL  seconds between snapshots (default 60)
+"""
+import bisect
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds (seconds / bytes) of the histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+_METRIC_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self, scale: float = 1.0, digits: int = 2) -> Dict[str, Any]:
+        def scaled(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * scale, digits)
+        return {
+            "count": self.count,
+            "mean": scaled(self.sum / self.count) if self.count else None,
+            "p50": scaled(self.quantile(0.5)),
+            "p90": scaled(self.quantile(0.9)),
+            "p99": scaled(self.quantile(0.99)),
+            "max": scaled(self.max) if self.count else None,
+        }
+
+
+class OperationStats:
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors: Dict[str, int] = {}
+        self.total = Histogram()
+        self.upstream = Histogram()
+        self.overhead = Histogram()
+        self.http_status: Dict[str, int] = {}
+        self.http_time = Histogram()
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+
+
+class CallMetrics:
+    """Timing of one tool call, filled in by the dispatcher."""
+    __slots__ = ("operation_id", "started", "upstream_seconds", "cache_hit")
+
+    def __init__(self, operation_id: str):
+        self.operation_id = operation_id
+        self.started = time.perf_counter()
+        self.upstream_seconds = 0.0
+        self.cache_hit = False
+
+
+class Metrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self.operations: Dict[str, OperationStats] = {}
+        self.in_flight = 0
+        self.encode = Histogram()
+        self.schema_fetch = Histogram()
+        self.schema_fetch_outcomes: Dict[str, int] = {}
+        self.schema_build = Histogram()
+        self.schema_operations = 0
+
+    def _operation(self, operation_id: str) -> OperationStats:
+        stats = self.operations.get(operation_id)
+        if stats is None:
+            stats = self.operations[operation_id] = OperationStats()
+        return stats
+
+    def start_call(self, operation_id: str) -> CallMetrics:
+        self.in_flight += 1
+        return CallMetrics(operation_id)
+
+    def finish_call(self, call: CallMetrics, error: Optional[str] = None) -> None:
+        self.in_flight -= 1
+        total = time.perf_counter() - call.started
+        stats = self._operation(call.operation_id)
+        stats.calls += 1
+        stats.total.observe(total)
+        stats.overhead.observe(max(0.0, total - call.upstream_seconds))
+        if call.upstream_seconds:
+            stats.upstream.observe(call.upstream_seconds)
+        if call.cache_hit:
+            stats.cache_hits += 1
+        if error:
+            stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def record_http(self, operation_id: str, status: str, seconds: float, response_bytes: Optional[int]) -> None:
+        """One HTTP exchange with the backend; status is the code or an error class name."""
+        stats = self._operation(operation_id)
+        stats.http_status[status] = stats.http_status.get(status, 0) + 1
+        stats.http_time.observe(seconds)
+        if response_bytes is not None:
+            stats.response_bytes.observe(response_bytes)
+
+    def record_schema_fetch(self, seconds: float, outcome: str) -> None:
+        self.schema_fetch.observe(seconds)
+        self.schema_fetch_outcomes[outcome] = self.schema_fetch_outcomes.get(outcome, 0) + 1
+
+    def record_schema_build(self, seconds: float, operations: int) -> None:
+        self.schema_build.observe(seconds)
+        self.schema_operations = operations
+
+    def snapshot(self, components: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """JSON-friendly view; latencies in milliseconds."""
+        operations = {}
+        for operation_id, stats in sorted(self.operations.items()):
+            operations[operation_id] = {
+                "calls": stats.calls,
+                "errors": dict(stats.errors),
+                "cache_hits": stats.cache_hits,
+                "latency_ms": stats.total.summary(1000),
+                "upstream_ms": stats.upstream.summary(1000),
+                "overhead_ms": stats.overhead.summary(1000),
+                "http_status": dict(stats.http_status),
+                "http_ms": stats.http_time.summary(1000),
+                "response_bytes": stats.response_bytes.summary(digits=0),
+            }
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "in_flight_calls": self.in_flight,
+            "operations": operations,
+            "result_encode_ms": self.encode.summary(1000, 3),
+            "schema": {
+                "operations": self.schema_operations,
+                "fetch_ms": self.schema_fetch.summary(1000),
+                "fetch_outcomes": dict(self.schema_fetch_outcomes),
+                "index_build_ms": self.schema_build.summary(1000),
+            },
+            **(components or {}),
+        }
+
+    def render_prometheus(self, components: Optional[Dict[str, Any]] = None) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines: List[str] = []
+        ops = sorted(self.operations.items())
+
+        def counter(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], float]], kind: str = "counter") -> None:
+            samples = list(samples)
+            if not samples:
+                return
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        def histogram(name: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], Histogram]]) -> None:
+            samples = [(labels, h) for labels, h in samples if h.count]
+            if not samples:
+                return
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in samples:
+                cumulative = 0
+                for bound, bucket_count in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(h.sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {h.count}")
+
+        counter("alara_tool_calls_total", "Tool calls per operation.",
+                (({"operation": op}, s.calls) for op, s in ops))
+        counter("alara_tool_cache_hits_total", "Tool calls answered from the response cache.",
+                (({"operation": op}, s.cache_hits) for op, s in ops))
+        counter("alara_tool_errors_total", "Failed tool calls by reason.",
+                (({"operation": op, "reason": reason}, n) for op, s in ops for reason, n in sorted(s.errors.items())))
+        histogram("alara_tool_duration_seconds", "Tool call latency as seen by the client.",
+                  (({"operation": op}, s.total) for op, s in ops))
+        histogram("alara_tool_upstream_seconds", "Time a tool call waited on the backend (incl. retries and rate limiting).",
+                  (({"operation": op}, s.upstream) for op, s in ops))
+        histogram("alara_tool_overhead_seconds", "Bridge time per tool call outside the backend wait.",
+                  (({"operation": op}, s.overhead) for op, s in ops))
+        counter("alara_upstream_responses_total", "Backend HTTP responses by status (or error class).",
+                (({"operation": op, "status": status}, n) for op, s in ops for status, n in sorted(s.http_status.items())))
+        histogram("alara_upstream_request_seconds", "Duration of single backend HTTP requests.",
+                  (({"operation": op}, s.http_time) for op, s in ops))
+        histogram("alara_upstream_response_bytes", "Backend response body sizes.",
+                  (({"operation": op}, s.response_bytes) for op, s in ops))
+        histogram("alara_result_encode_seconds", "Time to encode tool results.", [({}, self.encode)])
+        histogram("alara_schema_fetch_seconds", "Duration of OpenAPI schema fetches.", [({}, self.schema_fetch)])
+        counter("alara_schema_fetches_total", "OpenAPI schema fetches by outcome.",
+                (({"outcome": outcome}, n) for outcome, n in sorted(self.schema_fetch_outcomes.items())))
+        histogram("alara_schema_index_seconds", "Time to index the OpenAPI schema.", [({}, self.schema_build)])
+        counter("alara_schema_operations", "Operations in the current schema index.", [({}, self.schema_operations)], "gauge")
+        counter("alara_in_flight_calls", "Tool calls currently executing.", [({}, self.in_flight)], "gauge")
+        counter("alara_uptime_seconds", "Seconds since the bridge started.", [({}, round(time.time() - self.started_at, 1))], "gauge")
+
+        # Component stats (pool, caches, ...) as untyped gauges named after their path
+        flat: List[Tuple[str, Dict[str, str], float]] = []
+        _flatten_numeric(["alara"], components or {}, {}, 0, flat)
+        for name, labels, value in sorted(flat, key=lambda sample: (sample[0], sorted(sample[1].items()))):
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _flatten_numeric(parts: List[str], value: Any, labels: Dict[str, str], depth: int,
+                     out: List[Tuple[str, Dict[str, str], float]]) -> None:
+    """Numeric leaves of {component: {stat: value | {key: value | {stat: value}}}}.
+
+    The component and stat names form the metric name; keys one level further
+    down (exchange names, upstreams, ...) become a `key` label.
+    """
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, (int, float)):
+        out.append(("_".join(parts), labels, value))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if depth == 2:
+                _flatten_numeric(parts, item, {**labels, "key": str(key)}, depth + 1, out)
+            else:
+                _flatten_numeric(parts + [_METRIC_NAME_RE.sub("_", str(key)).lower()], item, labels, depth + 1, out)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def write_metrics_file(path: str, text: str) -> None:
+    """Replace path with text via a temp file + rename, so scrapers never read a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path), suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(tmp_path, 0o644) # mkstemp creates owner-only files; collectors may run as another user
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
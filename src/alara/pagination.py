@@ -0,0 +1,372 @@
+"""Automatic pagination for list-style operations (trades, orders, OHLCV, ...).
+
+Operations whose query parameters include a page position are detected when
+the schema is indexed:
+
+* offset - `offset`/`skip` plus a page size; pages are computed ahead and
+  fetched concurrently,
+* page   - a `page` number plus a page size; also fetched concurrently,
+* since  - a CCXT-style `since` timestamp. With a `timeframe` parameter
+  (OHLCV) the time windows up to `until` (or now) are computed ahead and
+  fetched concurrently, and a window with few or no candles (a trading halt,
+  an exchange outage) does not end the walk; otherwise each page starts after
+  the newest record of the previous one,
+* cursor - a `cursor`/`after` token; each page names the next one.
+
+The tool then accepts `_fetch_all` / `_max_records`. The bridge walks the pages
+and returns one merged, de-duplicated list. At most `concurrency` pages are in
+flight and at most `max_records` records are kept, so memory stays bounded
+however long the range is.
+
+    ALARA_PAGINATION_MAX_RECORDS   most records one `_fetch_all` call returns (default 10000)
+    ALARA_PAGINATION_MAX_PAGES     most pages one call fetches (default 100)
+    ALARA_PAGINATION_CONCURRENCY   pages fetched at the same time when they can be computed ahead (default 4)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from alara.config import env_int
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+OFFSET_PARAMS = ("offset", "skip")
+PAGE_PARAMS = ("page", "page_number", "pageNumber")
+SINCE_PARAMS = ("since", "start_time", "startTime", "from_timestamp")
+CURSOR_PARAMS = ("cursor", "after", "page_token", "pageToken")
+LIMIT_PARAMS = ("limit", "page_size", "pageSize", "per_page", "count")
+UNTIL_PARAMS = ("until", "end_time", "endTime", "to_timestamp")
+TIMEFRAME_PARAMS = ("timeframe", "interval")
+# Where records and the next cursor are found when a page is an object rather than a list
+RECORD_KEYS = ("data", "items", "results", "records", "trades", "orders", "ohlcv")
+CURSOR_KEYS = ("next_cursor", "nextCursor", "cursor", "next", "next_page_token", "nextPageToken")
+DEFAULT_PAGE_SIZE = 100
+
+_TIMEFRAME_UNITS_MS = {"s": 1000, "m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000, "M": 2_592_000_000, "y": 31_536_000_000}
+
+
+@dataclass(frozen=True)
+class PaginationSpec:
+    mode: str  # "offset", "page", "since" or "cursor"
+    param: str  # Query parameter holding the page position
+    limit_param: Optional[str]
+    max_limit: Optional[int]  # The limit parameter's schema maximum, if declared
+    until_param: Optional[str] = None
+    timeframe_param: Optional[str] = None
+
+
+def detect_pagination(method: str, parameters: Iterable[Tuple[str, str, Any]]) -> Optional[PaginationSpec]:
+    """PaginationSpec for a GET operation with (name, location, resolved schema) parameters, else None."""
+    if method != "GET":
+        return None
+    query = {name: schema if isinstance(schema, dict) else {} for name, location, schema in parameters if location == "query"}
+
+    def first(names: Tuple[str, ...]) -> Optional[str]:
+        return next((name for name in names if name in query), None)
+
+    limit_param = first(LIMIT_PARAMS)
+    max_limit = query[limit_param].get("maximum") if limit_param else None
+    max_limit = int(max_limit) if isinstance(max_limit, (int, float)) and not isinstance(max_limit, bool) else None
+    cursor_param = first(CURSOR_PARAMS)
+    if cursor_param:
+        return PaginationSpec("cursor", cursor_param, limit_param, max_limit)
+    if limit_param is None:
+        return None # Without a page size, short pages cannot be told from the last page
+    for mode, names in (("offset", OFFSET_PARAMS), ("page", PAGE_PARAMS)):
+        param = first(names)
+        if param:
+            return PaginationSpec(mode, param, limit_param, max_limit)
+    since_param = first(SINCE_PARAMS)
+    if since_param:
+        return PaginationSpec("since", since_param, limit_param, max_limit, first(UNTIL_PARAMS), first(TIMEFRAME_PARAMS))
+    return None
+
+
+def timeframe_ms(timeframe: Any) -> Optional[int]:
+    """Milliseconds in a CCXT timeframe such as "1m", "4h" or "1d"."""
+    match = re.fullmatch(r"(\d+)([smhdwMy])", str(timeframe or ""))
+    if not match:
+        return None
+    return int(match.group(1)) * _TIMEFRAME_UNITS_MS[match.group(2)]
+
+
+def page_records(page: Any) -> Tuple[Optional[List[Any]], Any]:
+    """(records, next cursor) of one page; records is None when the page holds no list."""
+    if isinstance(page, list):
+        return page, None
+    if not isinstance(page, dict):
+        return None, None
+    records = next((page[key] for key in RECORD_KEYS if isinstance(page.get(key), list)), None)
+    cursor = next((page[key] for key in CURSOR_KEYS if isinstance(page.get(key), (str, int)) and page.get(key) != ""), None)
+    return records, cursor
+
+
+def record_timestamp(record: Any) -> Optional[float]:
+    value = record.get("timestamp") if isinstance(record, dict) else (record[0] if isinstance(record, list) and record else None)
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _as_timestamp(value: str) -> Any:
+    try:
+        return int(float(value))
+    except ValueError:
+        return value # Left for argument validation to report
+
+
+class RecordCollector:
+    """Merged records in page order, without duplicates, up to max_records."""
+
+    def __init__(self, max_records: int):
+        self.max_records = max_records
+        self.records: List[Any] = []
+        self.duplicates = 0
+        # Set when a page did not fit completely, so continuing must start within that page
+        self.truncated = False
+        self._seen: Set[Any] = set()
+
+    @property
+    def full(self) -> bool:
+        return len(self.records) >= self.max_records
+
+    def add(self, records: List[Any]) -> int:
+        """Add a page's records; returns how many were new."""
+        added = 0
+        for record in records:
+            if self.full:
+                self.truncated = True
+                break
+            key = self._key(record)
+            if key in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen.add(key)
+            self.records.append(record)
+            added += 1
+        return added
+
+    @staticmethod
+    def _key(record: Any) -> Any:
+        if isinstance(record, dict) and record.get("id") not in (None, ""):
+            return ("id", str(record["id"]))
+        if isinstance(record, list) and record and isinstance(record[0], (int, float, str)):
+            return ("row", record[0]) # OHLCV candles are keyed by their open time
+        # Other records: a digest of their content, so keys stay small
+        return hashlib.blake2b(json.dumps(record, sort_keys=True, default=str).encode("utf-8"), digest_size=16).digest()
+
+
+class Paginator:
+    """Walks the pages of one operation call and merges their records."""
+
+    def __init__(self, spec: PaginationSpec, fetch_page: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 max_records: int, max_pages: int, concurrency: int):
+        self.spec = spec
+        self.fetch_page = fetch_page
+        self.collector = RecordCollector(max_records)
+        self.max_pages = max(1, max_pages)
+        self.concurrency = max(1, concurrency)
+        self.pages = 0
+        self.complete = False
+        self.next_arguments: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    @classmethod
+    def from_env(cls, spec: PaginationSpec, fetch_page: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 max_records: Optional[int] = None) -> "Paginator":
+        limit = env_int("ALARA_PAGINATION_MAX_RECORDS", 10000)
+        return cls(
+            spec, fetch_page,
+            max_records=min(max_records, limit) if max_records else limit,
+            max_pages=env_int("ALARA_PAGINATION_MAX_PAGES", 100),
+            concurrency=env_int("ALARA_PAGINATION_CONCURRENCY", 4),
+        )
+
+    def _page_size(self, arguments: Dict[str, Any]) -> Optional[int]:
+        if not self.spec.limit_param:
+            return None
+        try:
+            size = int(arguments.get(self.spec.limit_param) or 0)
+        except (TypeError, ValueError):
+            size = 0
+        size = size or self.spec.max_limit or DEFAULT_PAGE_SIZE
+        return min(size, self.spec.max_limit) if self.spec.max_limit else size
+
+    async def run(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        arguments = dict(arguments)
+        for name in (self.spec.param, self.spec.until_param):
+            if self.spec.mode == "since" and name and isinstance(arguments.get(name), str):
+                arguments[name] = _as_timestamp(arguments[name])
+        page_size = self._page_size(arguments)
+        if page_size:
+            arguments[self.spec.limit_param] = page_size
+        mode = self.spec.mode
+        if mode in ("offset", "page"):
+            await self._run_numbered(arguments, page_size)
+        elif mode == "since" and arguments.get(self.spec.param) is not None:
+            step = timeframe_ms(arguments.get(self.spec.timeframe_param)) if self.spec.timeframe_param else None
+            if step:
+                await self._run_windows(arguments, page_size, step)
+            else:
+                await self._run_sequential(arguments, page_size)
+        elif mode == "cursor":
+            await self._run_sequential(arguments, page_size)
+        else:
+            # A CCXT 'since' range needs a start; without one the backend returns only the latest page
+            await self._run_sequential(arguments, page_size, single=True)
+        return self.result()
+
+    def result(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "records": self.collector.records,
+            "count": len(self.collector.records),
+            "pages": self.pages,
+            "complete": self.complete,
+            "duplicates_removed": self.collector.duplicates,
+        }
+        if not self.complete and self.next_arguments is not None:
+            result["next"] = self.next_arguments # Arguments that continue where this call stopped
+        if self.error:
+            result["error"] = self.error
+        return result
+
+    def _accept(self, page: Any, page_size: Optional[int]) -> Tuple[bool, Optional[List[Any]], Any]:
+        """Merge one page; (last page reached, its records, its next cursor)."""
+        self.pages += 1
+        records, cursor = page_records(page)
+        if records is None:
+            raise ValueError("the operation did not return a list of records")
+        self.collector.add(records)
+        last = not records or (page_size is not None and len(records) < page_size)
+        return last, records, cursor
+
+    async def _fetch(self, arguments: Dict[str, Any], first: bool) -> Any:
+        try:
+            return await self.fetch_page(arguments)
+        except Exception as e:
+            if first:
+                raise # Nothing collected yet: report the error as the call's own
+            self._stop(arguments, e)
+            return None
+
+    def _stop(self, arguments: Dict[str, Any], error: Exception) -> None:
+        """A later page failed: keep what was collected and report where to continue."""
+        self.error = f"Stopped after {self.pages} page(s): {error}"
+        self.next_arguments = arguments
+
+    async def _run_prefetched(self, page_arguments: Callable[[int], Optional[Dict[str, Any]]], page_size: Optional[int],
+                              short_page_ends: bool = True) -> None:
+        """Fetch pages 0, 1, 2, ... with up to `concurrency` in flight, merging them in order.
+
+        Without short_page_ends only page_arguments() running out ends the walk.
+        """
+        in_flight: Deque[Tuple[int, Dict[str, Any], "asyncio.Task[Any]"]] = deque()
+        next_page = 0
+        try:
+            while True:
+                while len(in_flight) < self.concurrency and next_page < self.max_pages:
+                    arguments = page_arguments(next_page)
+                    if arguments is None:
+                        break
+                    in_flight.append((next_page, arguments, asyncio.ensure_future(self.fetch_page(arguments))))
+                    next_page += 1
+                if not in_flight:
+                    # Past the end of the range, or out of page budget (then report where to continue)
+                    self.next_arguments = page_arguments(next_page) if next_page >= self.max_pages else None
+                    self.complete = self.next_arguments is None
+                    return
+                index, current, task = in_flight.popleft()
+                try:
+                    page = await task
+                except Exception as e:
+                    # Pages finish out of order, so whether one is the first is decided by its index, not by self.pages
+                    if index == 0:
+                        raise
+                    self._stop(current, e)
+                    return
+                last, _, _ = self._accept(page, page_size)
+                if last and short_page_ends:
+                    self.complete = True
+                    return
+                if self.collector.full:
+                    if self.collector.truncated:
+                        self.next_arguments = current
+                    else:
+                        self.next_arguments = in_flight[0][1] if in_flight else page_arguments(next_page)
+                    return
+        finally:
+            for _, _, task in in_flight:
+                if not task.done():
+                    task.cancel() # Pages past the end or the record limit are not needed
+                elif not task.cancelled():
+                    task.exception() # Failed after an earlier stop; nobody will await it
+
+    async def _run_numbered(self, arguments: Dict[str, Any], page_size: Optional[int]) -> None:
+        param = self.spec.param
+        default_start = 0 if self.spec.mode == "offset" else 1
+        try:
+            start = int(arguments.get(param) if arguments.get(param) is not None else default_start)
+        except (TypeError, ValueError):
+            start = default_start
+        step = page_size if self.spec.mode == "offset" else 1
+
+        def page_arguments(index: int) -> Dict[str, Any]:
+            return {**arguments, param: start + index * step}
+        await self._run_prefetched(page_arguments, page_size)
+
+    async def _run_windows(self, arguments: Dict[str, Any], page_size: Optional[int], step_ms: int) -> None:
+        """OHLCV: each page covers page_size candles, so every window's start is known ahead.
+
+        A short window only means the market had gaps there; the walk goes on to the end of the range.
+        """
+        param = self.spec.param
+        start = int(arguments[param])
+        until = arguments.get(self.spec.until_param) if self.spec.until_param else None
+        end = int(until) if isinstance(until, (int, float)) else int(time.time() * 1000)
+        window = (page_size or DEFAULT_PAGE_SIZE) * step_ms
+
+        def page_arguments(index: int) -> Optional[Dict[str, Any]]:
+            since = start + index * window
+            return {**arguments, param: since} if since <= end else None
+        await self._run_prefetched(page_arguments, page_size, short_page_ends=False)
+
+    async def _run_sequential(self, arguments: Dict[str, Any], page_size: Optional[int], single: bool = False) -> None:
+        """Pages that depend on the previous one: the next `since` or cursor comes from its records."""
+        param = self.spec.param
+        until = arguments.get(self.spec.until_param) if self.spec.until_param else None
+        while self.pages < self.max_pages:
+            page = await self._fetch(arguments, first=not self.pages)
+            if page is None:
+                return
+            last, records, cursor = self._accept(page, page_size)
+            if single:
+                self.complete = last
+                return
+            if self.spec.mode == "cursor":
+                if cursor is None or cursor == arguments.get(param):
+                    self.complete = True
+                    return
+                next_arguments = {**arguments, param: cursor}
+            else:
+                timestamps = [ts for ts in map(record_timestamp, records or ()) if ts is not None]
+                newest = max(timestamps) if timestamps else None
+                if last or newest is None or newest < arguments[param] or (isinstance(until, (int, float)) and newest >= until):
+                    self.complete = True
+                    return
+                next_arguments = {**arguments, param: int(newest) + 1}
+            if self.collector.full:
+                self.next_arguments = self._resume_arguments(arguments) if self.collector.truncated else next_arguments
+                return
+            arguments = next_arguments
+        self.next_arguments = arguments
+
+    def _resume_arguments(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Where to continue after a page that was cut off by max_records."""
+        newest = record_timestamp(self.collector.records[-1]) if self.collector.records else None
+        if self.spec.mode == "since" and newest is not None:
+            return {**arguments, self.spec.param: int(newest) + 1}
+        return arguments # Re-fetch the page; its records before the cut repeat
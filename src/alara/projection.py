@@ -0,0 +1,308 @@
+"""Field projection and filtering of tool results, applied before they are serialized.
+
+Agents often need a few fields of a large payload (the free USDT balance, the
+best bid and ask). Every generated tool accepts three optional arguments:
+
+* `_fields` - field paths to keep, e.g. ["free.USDT", "total.USDT"] or
+  ["bids.0", "asks.0"]. Segments are separated by dots; a number picks a list
+  element (negative counts from the end) and `*` matches every key or element.
+* `_filter` - a condition records must meet, e.g.
+  `side == "buy" and price >= 100` or `status != "closed"`. Comparisons
+  (==, !=, <, <=, >, >=) of a field path with a string, number, true, false
+  or null, combined with `and` / `or` (`and` binds tighter).
+* `_limit`  - keep at most this many records.
+
+`_filter` and `_limit` apply to the result's record list: the result itself
+when it is a list, else the list under a key such as "records", "data" or
+"trades". `_fields` then applies to each record, or to the whole result when
+it has no record list. Missing fields are left out rather than reported.
+
+Projections are compiled once per distinct (_fields, _filter, _limit) and the
+compiled form is reused across calls.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from alara.pagination import RECORD_KEYS
+
+PROJECTION_OPTIONS = ("_fields", "_filter", "_limit")
+
+# Distinct projections kept compiled
+COMPILED_PROJECTIONS = 256
+# Longest accepted _filter expression and _fields list
+MAX_FILTER_CHARS = 1000
+MAX_FIELDS = 100
+
+_MISSING = object()
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.]))
+      | (?P<op>==|!=|<=|>=|<|>)
+      | (?P<word>[A-Za-z_$*][\w$*-]*(?:\.[\w$*-]+)*)
+    )""", re.VERBOSE)
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+_LITERALS = {"true": True, "false": False, "null": None}
+
+
+class ProjectionError(ValueError):
+    """The projection arguments are malformed."""
+
+
+# --- Field paths --- #
+def _split_path(path: str) -> Tuple[str, ...]:
+    segments = tuple(segment.strip() for segment in path.split("."))
+    if not path.strip() or any(not segment for segment in segments):
+        raise ProjectionError(f"Invalid field path {path!r}.")
+    return segments
+
+
+def _build_trie(paths: Sequence[Tuple[str, ...]]) -> Dict[str, Any]:
+    """Merge paths into a tree of segments; None marks "keep everything below"."""
+    trie: Dict[str, Any] = {}
+    for segments in paths:
+        node = trie
+        for position, segment in enumerate(segments):
+            last = position == len(segments) - 1
+            if last:
+                node[segment] = None
+            elif node.get(segment, _MISSING) is None:
+                break # A shorter path already keeps this whole subtree
+            else:
+                node = node.setdefault(segment, {})
+    return trie
+
+
+def _is_index(segment: str) -> bool:
+    return segment.lstrip("-").isdigit()
+
+
+def _list_index(segment: str, length: int) -> Optional[int]:
+    if not _is_index(segment):
+        return None
+    index = int(segment)
+    return index + length if index < 0 else index
+
+
+def _compile_projector(trie: Optional[Dict[str, Any]]) -> Callable[[Any], Any]:
+    """Turn a trie into a function from a value to its projection (_MISSING if nothing matched)."""
+    if trie is None:
+        return lambda node: node
+    children = {segment: _compile_projector(subtrie) for segment, subtrie in trie.items()}
+    wildcard = children.pop("*", None)
+    names = list(children.items())
+    indexes = [(int(segment), child) for segment, child in names if _is_index(segment)]
+    # The common case, a few top-level fields of each record, skips the per-field calls
+    flat_names = list(children) if wildcard is None and all(subtrie is None for subtrie in trie.values()) else None
+
+    def project(node: Any) -> Any:
+        if isinstance(node, dict):
+            if flat_names is not None:
+                projected = {name: node[name] for name in flat_names if name in node}
+                return projected if projected else _MISSING
+            projected = {}
+            if wildcard is not None:
+                for key, value in node.items():
+                    value = wildcard(value)
+                    if value is not _MISSING:
+                        projected[key] = value
+            for name, child in names:
+                if name in node:
+                    value = child(node[name])
+                    if value is not _MISSING:
+                        projected[name] = value
+            return projected if projected else _MISSING
+        if isinstance(node, list):
+            if wildcard is not None:
+                values = [wildcard(item) for item in node]
+            elif indexes:
+                size = len(node)
+                values = [child(node[index]) for index, child in indexes if -size <= index < size]
+            else:
+                values = [project(item) for item in node] # Names on a list select from each of its elements
+            return [value for value in values if value is not _MISSING]
+        return _MISSING # The path continues below a scalar
+    return project
+
+
+def _lookup(record: Any, segments: Tuple[str, ...]) -> Any:
+    for segment in segments:
+        if isinstance(record, dict):
+            record = record.get(segment, _MISSING)
+        elif isinstance(record, list):
+            index = _list_index(segment, len(record))
+            record = record[index] if index is not None and 0 <= index < len(record) else _MISSING
+        else:
+            return _MISSING
+        if record is _MISSING:
+            return _MISSING
+    return record
+
+
+# --- Filter expressions --- #
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens: List[Tuple[str, str]] = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise ProjectionError(f"Cannot parse _filter at {expression[position:position + 20]!r}.")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def _literal(kind: str, text: str) -> Any:
+    if kind == "string":
+        return re.sub(r"\\(.)", r"\1", text[1:-1])
+    if kind == "number":
+        return float(text) if any(c in text for c in ".eE") else int(text)
+    if kind == "word" and text in _LITERALS:
+        return _LITERALS[text]
+    raise ProjectionError(f"Expected a string, number, true, false or null in _filter, got {text!r}.")
+
+
+def _comparable(value: Any, literal: Any) -> Any:
+    """Numeric strings (as some exchanges send prices) compare as numbers."""
+    if isinstance(literal, (int, float)) and not isinstance(literal, bool) and isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _comparison(field: str, op: str, literal: Any) -> Callable[[Any], bool]:
+    segments = _split_path(field)
+    compare = _COMPARISONS[op]
+    numeric = isinstance(literal, (int, float)) and not isinstance(literal, bool)
+
+    def check(record: Any) -> bool:
+        if len(segments) == 1 and isinstance(record, dict):
+            value = record.get(segments[0], _MISSING)
+        else:
+            value = _lookup(record, segments)
+        if value is _MISSING:
+            return op == "!=" # A missing field differs from every value
+        if numeric and isinstance(value, str):
+            value = _comparable(value, literal)
+        try:
+            return compare(value, literal)
+        except TypeError:
+            return False # e.g. None < 1: not a match rather than an error
+    return check
+
+
+def compile_filter(expression: str) -> Callable[[Any], bool]:
+    """Compile `a op b [and|or ...]` into a predicate over one record."""
+    if len(expression) > MAX_FILTER_CHARS:
+        raise ProjectionError(f"_filter may be at most {MAX_FILTER_CHARS} characters.")
+    tokens = _tokenize(expression)
+    alternatives: List[List[Callable[[Any], bool]]] = [[]]
+    position = 0
+    while True:
+        if position + 3 > len(tokens):
+            raise ProjectionError("_filter must be comparisons like `price > 100`, joined by 'and' / 'or'.")
+        (field_kind, field), (op_kind, op), literal = tokens[position:position + 3]
+        if field_kind != "word" or op_kind != "op":
+            raise ProjectionError(f"Expected `<field> <operator> <value>` in _filter near {field!r}.")
+        alternatives[-1].append(_comparison(field, op, _literal(*literal)))
+        position += 3
+        if position == len(tokens):
+            break
+        kind, word = tokens[position]
+        if kind != "word" or word.lower() not in ("and", "or"):
+            raise ProjectionError(f"Expected 'and' or 'or' in _filter, got {word!r}.")
+        if word.lower() == "or":
+            alternatives.append([])
+        position += 1
+
+    if len(alternatives) == 1 and len(alternatives[0]) == 1:
+        return alternatives[0][0]
+    return lambda record: any(all(check(record) for check in conditions) for conditions in alternatives)
+
+
+# --- Compiled projections --- #
+class Projection:
+    """A compiled (_fields, _filter, _limit) combination."""
+
+    def __init__(self, fields: Optional[Tuple[str, ...]], filter_expression: Optional[str], limit: Optional[int]):
+        self.project = _compile_projector(_build_trie([_split_path(path) for path in fields])) if fields else None
+        self.predicate = compile_filter(filter_expression) if filter_expression else None
+        self.limit = limit
+
+    def apply(self, data: Any) -> Any:
+        """A projected copy of data; data itself (which may be a shared cache entry) is not modified."""
+        records, key = _record_list(data)
+        if records is None:
+            if self.predicate is not None or self.limit is not None:
+                raise ProjectionError("_filter and _limit need a result that contains a list of records.")
+            projected = self.project(data) if self.project else data
+            return {} if projected is _MISSING else projected
+        if self.predicate is not None:
+            records = [record for record in records if self.predicate(record)]
+        if self.limit is not None:
+            records = records[:self.limit]
+        if self.project is not None:
+            # Records without any of the fields stay as {}, so positions and counts still line up
+            records = [{} if value is _MISSING else value for value in map(self.project, records)]
+        if key is None:
+            return records
+        projected = {**data, key: records}
+        if isinstance(data.get("count"), int):
+            projected["count"] = len(records) # e.g. a _fetch_all result
+        return projected
+
+
+def _record_list(data: Any) -> Tuple[Optional[List[Any]], Optional[str]]:
+    """(records, key holding them) - key None when data is the list itself."""
+    if isinstance(data, list):
+        return data, None
+    if isinstance(data, dict):
+        for key in RECORD_KEYS:
+            if isinstance(data.get(key), list):
+                return data[key], key
+    return None, None
+
+
+@lru_cache(maxsize=COMPILED_PROJECTIONS)
+def _compile(fields: Optional[Tuple[str, ...]], filter_expression: Optional[str], limit: Optional[int]) -> Projection:
+    return Projection(fields, filter_expression, limit)
+
+
+def compile_projection(fields: Any = None, filter_expression: Any = None, limit: Any = None) -> Optional[Projection]:
+    """The compiled projection for these tool arguments (None when none is requested)."""
+    if fields is None and filter_expression is None and limit is None:
+        return None
+    if isinstance(fields, str):
+        fields = [path for path in fields.split(",") if path.strip()] # "a.b,c" is accepted too
+    if fields is not None:
+        if not isinstance(fields, list) or not all(isinstance(path, str) for path in fields):
+            raise ProjectionError("_fields must be a list of field paths such as [\"free.USDT\", \"bids.0\"].")
+        if len(fields) > MAX_FIELDS:
+            raise ProjectionError(f"_fields may list at most {MAX_FIELDS} paths.")
+    if filter_expression is not None and not isinstance(filter_expression, str):
+        raise ProjectionError("_filter must be a string such as 'side == \"buy\" and price > 100'.")
+    if limit is not None:
+        if isinstance(limit, str) and limit.isdigit():
+            limit = int(limit)
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit < 0:
+            raise ProjectionError("_limit must be a non-negative integer.")
+    return _compile(tuple(fields) if fields else None, filter_expression.strip() if filter_expression else None, limit)
+
+
+def projection_cache_stats() -> Dict[str, Any]:
+    info = _compile.cache_info()
+    return {"compiled": info.currsize, "hits": info.hits, "misses": info.misses}
@@ -0,0 +1,192 @@
+"""Thin stdio relay to a shared bridge daemon (see alara.daemon).
+
+With ALARA_DAEMON=1 the `python -m alara.main` process no longer runs the MCP
+server itself. It connects to one long-lived daemon on a local Unix socket,
+sends a one-line handshake with the session's API key and backend URL, and
+then copies bytes between stdin/stdout and the socket. The daemon is started
+on demand. If it cannot be reached, or serves a different backend, the caller
+falls back to the in-process bridge.
+
+    ALARA_DAEMON                 1 to relay to the shared daemon (default 0)
+    ALARA_DAEMON_SOCKET          socket path (default $XDG_RUNTIME_DIR/alara/bridge.sock,
+                                 or /tmp/alara-<uid>/bridge.sock)
+    ALARA_DAEMON_AUTOSTART       start the daemon if it is not running (default 1)
+    ALARA_DAEMON_START_TIMEOUT   seconds to wait for a started daemon (default 15)
+
+Only the standard library is imported here, so relaying costs no mcp/httpx
+import time.
+"""
+import json
+import logging
+import os
+import socket
+import stat
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from alara.config import env_bool, env_float
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+# Bumped when the handshake changes; the daemon rejects other versions
+RELAY_PROTOCOL_VERSION = 1
+HANDSHAKE_TIMEOUT = 5.0
+_COPY_CHUNK = 65536
+
+
+class DaemonUnavailable(Exception):
+    """No usable daemon; the caller should run the bridge in-process."""
+
+
+def daemon_enabled() -> bool:
+    return env_bool("ALARA_DAEMON", False) and hasattr(socket, "AF_UNIX")
+
+
+def daemon_socket_path() -> str:
+    configured = os.getenv("ALARA_DAEMON_SOCKET")
+    if configured:
+        return configured
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "alara", "bridge.sock")
+    return os.path.join("/tmp", f"alara-{os.getuid()}", "bridge.sock")
+
+
+def check_private_dir(path: str) -> None:
+    """Refuse socket directories another user could have created or can write to.
+
+    The handshake carries the API key, so it must only ever reach our own daemon.
+    """
+    info = os.stat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise DaemonUnavailable(f"socket directory {path} must be owned by this user with mode 0700")
+
+
+def _connect(path: str) -> socket.socket:
+    check_private_dir(os.path.dirname(path) or ".")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _handshake(sock: socket.socket, api_key: str, backend_url: Optional[str]) -> None:
+    hello = {"alara_relay": RELAY_PROTOCOL_VERSION, "api_key": api_key, "backend_url": backend_url, "pid": os.getpid()}
+    sock.settimeout(HANDSHAKE_TIMEOUT)
+    sock.sendall(json.dumps(hello).encode("utf-8") + b"\n")
+    reply = b""
+    while not reply.endswith(b"\n"):
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise DaemonUnavailable("daemon closed the connection during the handshake")
+        reply += chunk
+        if len(reply) > 65536:
+            raise DaemonUnavailable("oversized handshake reply")
+    try:
+        answer: Dict[str, Any] = json.loads(reply)
+    except ValueError:
+        raise DaemonUnavailable("malformed handshake reply") from None
+    if not answer.get("ok"):
+        raise DaemonUnavailable(f"daemon refused the session: {answer.get('error', 'unknown reason')}")
+    sock.settimeout(None)
+
+
+def _start_daemon() -> None:
+    """Launch `python -m alara.main --daemon` detached from this session."""
+    env = dict(os.environ)
+    # The daemon serves many sessions; each brings its own key in the handshake
+    env.pop("ALARA_API_KEY", None)
+    env.pop("ALARA_DAEMON", None)
+    logger.info("Starting bridge daemon: %s -m alara.main --daemon", sys.executable)
+    subprocess.Popen(
+        [sys.executable, "-m", "alara.main", "--daemon"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=env, start_new_session=True, close_fds=True,
+    )
+
+
+def connect_to_daemon(api_key: str, backend_url: Optional[str]) -> socket.socket:
+    """Connected, handshaken socket to the daemon, starting it if needed."""
+    path = daemon_socket_path()
+    try:
+        sock = _connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not env_bool("ALARA_DAEMON_AUTOSTART", True):
+            raise DaemonUnavailable(f"no daemon listening on {path}") from None
+        _start_daemon()
+        deadline = time.monotonic() + env_float("ALARA_DAEMON_START_TIMEOUT", 15.0)
+        while True:
+            time.sleep(0.05)
+            try:
+                sock = _connect(path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise DaemonUnavailable(f"daemon did not start listening on {path}") from None
+    except OSError as e:
+        raise DaemonUnavailable(f"cannot connect to {path}: {e}") from None
+    try:
+        _handshake(sock, api_key, backend_url)
+    except OSError as e:
+        sock.close()
+        raise DaemonUnavailable(f"handshake failed: {e}") from None
+    except DaemonUnavailable:
+        sock.close()
+        raise
+    return sock
+
+
+def _copy_stdin_to_socket(sock: socket.socket) -> None:
+    stdin_fd = sys.stdin.fileno()
+    try:
+        while True:
+            data = os.read(stdin_fd, _COPY_CHUNK)
+            if not data:
+                break
+            sock.sendall(data)
+    except OSError as e:
+        logger.warning("Relay stopped reading stdin: %s", e)
+    finally:
+        try:
+            sock.shutdown(socket.SHUT_WR) # Client went away: let the daemon end the session
+        except OSError:
+            pass
+
+
+def relay_stdio(sock: socket.socket) -> None:
+    """Copy stdin to the daemon and the daemon's replies to stdout until either side closes."""
+    threading.Thread(target=_copy_stdin_to_socket, args=(sock,), name="alara-relay-stdin", daemon=True).start()
+    stdout = sys.stdout.buffer
+    try:
+        while True:
+            data = sock.recv(_COPY_CHUNK)
+            if not data:
+                break
+            stdout.write(data)
+            stdout.flush()
+    except OSError as e:
+        logger.warning("Relay connection to the daemon failed: %s", e)
+    finally:
+        sock.close()
+
+
+def run_relay() -> bool:
+    """Serve this stdio session through the daemon; False if the bridge must run in-process."""
+    api_key = os.getenv("ALARA_API_KEY")
+    if not api_key:
+        return False # The in-process bridge reports the missing key
+    try:
+        sock = connect_to_daemon(api_key, os.getenv("ALARA_MCP_URL"))
+    except DaemonUnavailable as e:
+        logger.warning("Bridge daemon unavailable (%s); running the bridge in-process.", e)
+        return False
+    logger.info("Relaying stdio session to the bridge daemon at %s.", daemon_socket_path())
+    relay_stdio(sock)
+    logger.info("Bridge daemon session ended.")
+    return True
@@ -0,0 +1,268 @@
+"""Client-side protection for upstream exchanges: rate limits, retries and circuit breakers.
+
+Every backend call goes through Resilience.run(), which
+
+* waits on an adaptive token bucket per exchange and/or per operation when a
+  rate is configured (both are off by default); a 429 halves the bucket's rate
+  and pauses it for Retry-After, successes slowly restore it,
+* retries idempotent requests on 429/502/503/504 and transport errors with
+  jittered exponential backoff, honouring Retry-After,
+* does not retry when the backoff would run past the call's deadline,
+* fails fast with CircuitOpenError while an exchange keeps failing, instead of
+  tying up connections until the request timeout.
+
+Calls that do not target an exchange (no exchange argument) are tracked per
+operation instead, so one failing endpoint does not open the circuit for all of them.
+
+    ALARA_RATE_LIMIT_EXCHANGE_RPS    requests/second per exchange (default 0 = unlimited)
+    ALARA_RATE_LIMIT_EXCHANGE_BURST  bucket size per exchange (default 20)
+    ALARA_RATE_LIMIT_OPERATION_RPS   requests/second per operation (default 0 = unlimited)
+    ALARA_RATE_LIMIT_OPERATION_BURST bucket size per operation (default 10)
+    ALARA_RETRY_ATTEMPTS             total attempts for idempotent requests (default 3)
+    ALARA_RETRY_BACKOFF_BASE         first backoff in seconds (default 0.25)
+    ALARA_RETRY_BACKOFF_MAX          largest backoff / Retry-After honoured, seconds (default 10)
+    ALARA_CIRCUIT_FAILURES           consecutive failures that open a circuit (default 5)
+    ALARA_CIRCUIT_RESET              seconds a circuit stays open before a probe (default 30)
+"""
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from alara.config import env_float, env_int
+from alara.deadlines import time_left
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"Upstream '{upstream}' is failing; requests are paused for {retry_in:.1f}s (circuit open).")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttled(self, retry_after: Optional[float]) -> None:
+        """Upstream answered 429: back off multiplicatively and pause."""
+        self.rate = max(self.base_rate / 16, self.rate / 2)
+        self.tokens = 0.0
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self) -> None:
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * 0.05)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self, upstream: str) -> None:
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(upstream, self.reset_timeout - (time.monotonic() - self.opened_at))
+        if state == "half_open":
+            if self.probe_in_flight:
+                raise CircuitOpenError(upstream, 0)
+            self.probe_in_flight = True # Let exactly one probe through
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Call ended without a verdict (e.g. a 4xx or cancellation)."""
+        self.probe_in_flight = False
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _can_wait(delay: float) -> bool:
+    """False when waiting `delay` seconds would leave the current call no time for another attempt."""
+    remaining = time_left()
+    return remaining is None or delay < remaining
+
+
+class Resilience:
+    def __init__(self):
+        self.exchange_rps = env_float("ALARA_RATE_LIMIT_EXCHANGE_RPS", 0.0)
+        self.exchange_burst = env_float("ALARA_RATE_LIMIT_EXCHANGE_BURST", 20.0)
+        self.operation_rps = env_float("ALARA_RATE_LIMIT_OPERATION_RPS", 0.0)
+        self.operation_burst = env_float("ALARA_RATE_LIMIT_OPERATION_BURST", 10.0)
+        self.max_attempts = max(1, env_int("ALARA_RETRY_ATTEMPTS", 3))
+        self.backoff_base = env_float("ALARA_RETRY_BACKOFF_BASE", 0.25)
+        self.backoff_max = env_float("ALARA_RETRY_BACKOFF_MAX", 10.0)
+        self.circuit_failures = max(1, env_int("ALARA_CIRCUIT_FAILURES", 5))
+        self.circuit_reset = env_float("ALARA_CIRCUIT_RESET", 30.0)
+        self._exchange_buckets: Dict[str, TokenBucket] = {}
+        self._operation_buckets: Dict[str, TokenBucket] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+
+    def _bucket(self, buckets: Dict[str, TokenBucket], key: str, rate: float, burst: float) -> Optional[TokenBucket]:
+        if rate <= 0:
+            return None
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def breaker(self, upstream: str) -> CircuitBreaker:
+        breaker = self._breakers.get(upstream)
+        if breaker is None:
+            breaker = self._breakers[upstream] = CircuitBreaker(self.circuit_failures, self.circuit_reset)
+        return breaker
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter: uniform in [0, base * 2^attempt], never below Retry-After
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def run(self, operation_id: str, scope: Optional[str], http_method: str,
+                  send: Callable[[], Awaitable[Any]], log_prefix: str = "") -> Any:
+        """Call send() under the rate limits, retry policy and circuit breaker for this upstream."""
+        upstream = scope or f"operation:{operation_id}"
+        exchange_bucket = self._bucket(self._exchange_buckets, scope, self.exchange_rps, self.exchange_burst) if scope else None
+        operation_bucket = self._bucket(self._operation_buckets, operation_id, self.operation_rps, self.operation_burst)
+        breaker = self.breaker(upstream)
+        attempts = self.max_attempts if http_method in IDEMPOTENT_METHODS else 1
+
+        for attempt in range(attempts):
+            try:
+                breaker.before_call(upstream)
+            except CircuitOpenError:
+                self.rejected += 1
+                raise
+            verdict = None
+            try:
+                if exchange_bucket:
+                    await exchange_bucket.acquire()
+                if operation_bucket:
+                    await operation_bucket.acquire()
+                result = await send()
+                verdict = "success"
+                if exchange_bucket:
+                    exchange_bucket.succeeded()
+                return result
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                if status == 429:
+                    self.throttled += 1
+                    for bucket in (exchange_bucket, operation_bucket):
+                        if bucket:
+                            bucket.throttled(retry_after)
+                elif status >= 500:
+                    verdict = "failure"
+                if status not in RETRYABLE_STATUS_CODES or attempt + 1 >= attempts:
+                    raise
+                if retry_after is not None and retry_after > self.backoff_max:
+                    logger.warning("%s Upstream asked to retry after %.0fs (over the %.0fs limit); giving up.", log_prefix, retry_after, self.backoff_max)
+                    raise
+                delay = self._backoff(attempt, retry_after)
+                if not _can_wait(delay):
+                    raise
+                logger.warning("%s HTTP %s from upstream '%s'; retry %s/%s in %.2fs", log_prefix, status, upstream, attempt + 1, attempts - 1, delay)
+            except httpx.TransportError as e:
+                verdict = "failure"
+                if attempt + 1 >= attempts:
+                    raise
+                delay = self._backoff(attempt, None)
+                if not _can_wait(delay):
+                    raise
+                logger.warning("%s %s talking to upstream '%s'; retry %s/%s in %.2fs", log_prefix, type(e).__name__, upstream, attempt + 1, attempts - 1, delay)
+            finally:
+                if verdict == "success":
+                    breaker.record_success()
+                elif verdict == "failure":
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+        raise RuntimeError("unreachable") # pragma: no cover
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "rejected_by_circuit": self.rejected,
+            "circuits": {
+                upstream: {"state": breaker.state, "consecutive_failures": breaker.failures}
+                for upstream, breaker in self._breakers.items()
+            },
+            "exchange_rates": {
+                upstream: round(bucket.rate, 3) for upstream, bucket in self._exchange_buckets.items()
+            },
+        }
@@ -0,0 +1,214 @@
+"""In-memory TTL/LRU cache for responses of idempotent (GET) tool calls.
+
+Configuration (environment):
+
+    ALARA_RESPONSE_CACHE_SIZE    max cached responses, 0 disables the cache (default 512)
+    ALARA_RESPONSE_CACHE_TTL     default time-to-live in seconds (default 5)
+    ALARA_RESPONSE_CACHE_STALE   extra seconds an expired entry may be served while it is
+                                 refreshed in the background (stale-while-revalidate, default 0)
+    ALARA_RESPONSE_CACHE_TTLS    per-operation / per-tag overrides, e.g.
+                                 "fetch_markets=3600,tag:Exchanges=60,fetch_balance=0"
+                                 (a TTL of 0 disables caching for that operation)
+
+Account state (balances, positions, open orders, own trades) changes with every
+fill, so those operations default to a TTL of 0 (see ACCOUNT_STATE_TTLS); an
+ALARA_RESPONSE_CACHE_TTLS entry for one of them turns its caching back on.
+
+A write (any non-GET call) drops the cached reads of its exchange. A read that
+was already in flight when that happened would store the old state again, so
+each read takes the scope's generation() when it starts and set() skips the
+entry when the scope has been invalidated since.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Set
+
+from alara.config import env_float, env_int
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+# Argument names that identify the exchange a call is scoped to; used to find
+# the cached reads a write (e.g. create_order on bybit) may have made stale.
+EXCHANGE_ARGUMENT_NAMES = ("exchange_name", "exchange", "exchange_id")
+
+# Operations returning account state, not cached unless ALARA_RESPONSE_CACHE_TTLS says otherwise
+ACCOUNT_STATE_TTLS: Dict[str, float] = {
+    operation_id: 0.0 for operation_id in (
+        "fetch_balance", "fetch_positions", "fetch_position", "fetch_open_orders", "fetch_orders",
+        "fetch_order", "fetch_closed_orders", "fetch_canceled_orders", "fetch_my_trades",
+        "fetch_ledger", "fetch_deposits", "fetch_withdrawals",
+    )
+}
+
+
+@dataclass
+class CacheEntry:
+    data: Any
+    stored_at: float
+    ttl: float
+    scope: Optional[str]
+
+
+@dataclass
+class CacheLookup:
+    data: Any
+    fresh: bool
+
+
+def exchange_scope(arguments: Dict[str, Any]) -> Optional[str]:
+    for arg_name in EXCHANGE_ARGUMENT_NAMES:
+        value = arguments.get(arg_name)
+        if value not in (None, ""):
+            return str(value).lower()
+    return None
+
+
+def parse_ttl_overrides(spec: Optional[str]) -> Dict[str, float]:
+    """Parse "name=seconds,tag:Tag=seconds" into a dict."""
+    overrides: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, seconds = item.rpartition("=")
+        try:
+            if not sep or not name.strip():
+                raise ValueError(item)
+            overrides[name.strip()] = float(seconds)
+        except ValueError:
+            logger.warning("Ignoring invalid TTL override %r; expected name=seconds.", item)
+    return overrides
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512, default_ttl: float = 5.0, stale_ttl: float = 0.0,
+                 ttl_overrides: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.ttl_overrides = ttl_overrides or {}
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        # Invalidation counter, and its value at the last invalidation of each scope (None: everything)
+        self._generation = 0
+        self._invalidated_at: Dict[Optional[str], int] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.discarded = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            max_entries=env_int("ALARA_RESPONSE_CACHE_SIZE", 512),
+            default_ttl=env_float("ALARA_RESPONSE_CACHE_TTL", 5.0),
+            stale_ttl=env_float("ALARA_RESPONSE_CACHE_STALE", 0.0),
+            ttl_overrides={**ACCOUNT_STATE_TTLS, **parse_ttl_overrides(os.getenv("ALARA_RESPONSE_CACHE_TTLS"))},
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def ttl_for(self, operation_id: str, tags: Iterable[str]) -> float:
+        """Operation override first, then the first matching tag override, then the default."""
+        if operation_id in self.ttl_overrides:
+            return self.ttl_overrides[operation_id]
+        for tag in tags:
+            tag_ttl = self.ttl_overrides.get(f"tag:{tag}")
+            if tag_ttl is not None:
+                return tag_ttl
+        return self.default_ttl
+
+    @staticmethod
+    def make_key(operation_id: str, path: str, query_params: Dict[str, Any], identity: str = "") -> str:
+        """operationId + formatted path + query parameters in a canonical order.
+
+        `identity` (an API key fingerprint) keeps responses fetched with different keys apart.
+        """
+        normalized_query = json.dumps(query_params, sort_keys=True, separators=(",", ":"), default=str)
+        key = f"{operation_id}|{path}|{normalized_query}"
+        return f"{identity}|{key}" if identity else key
+
+    def get(self, key: str) -> Optional[CacheLookup]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        age = time.monotonic() - entry.stored_at
+        if age <= entry.ttl:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return CacheLookup(entry.data, fresh=True)
+        if age <= entry.ttl + self.stale_ttl:
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return CacheLookup(entry.data, fresh=False)
+        del self._entries[key]
+        self.misses += 1
+        return None
+
+    def generation(self, scope: Optional[str]) -> int:
+        """Changes whenever cached reads for scope are invalidated; taken when a read starts."""
+        if scope is None:
+            return self._generation # Scope-less entries are dropped by every invalidation
+        return max(self._invalidated_at.get(scope, 0), self._invalidated_at.get(None, 0))
+
+    def set(self, key: str, data: Any, ttl: float, scope: Optional[str] = None, generation: Optional[int] = None) -> None:
+        """Store data, unless scope was invalidated after `generation` was taken (the data may predate a write)."""
+        if not self.enabled or ttl <= 0:
+            return
+        if generation is not None and generation != self.generation(scope):
+            self.discarded += 1
+            return
+        self._entries[key] = CacheEntry(data, time.monotonic(), ttl, scope)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_scope(self, scope: Optional[str]) -> int:
+        """Drop entries for the given exchange scope (everything when scope is None)."""
+        self._generation += 1
+        self._invalidated_at[scope] = self._generation
+        if scope is None:
+            removed = len(self._entries)
+            self._entries.clear()
+        else:
+            stale_keys = [key for key, entry in self._entries.items() if entry.scope in (scope, None)]
+            for key in stale_keys:
+                del self._entries[key]
+            removed = len(stale_keys)
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def begin_refresh(self, key: str) -> bool:
+        """Claim the background refresh of key; False if one is already running."""
+        if key in self._refreshing:
+            return False
+        self._refreshing.add(key)
+        return True
+
+    def end_refresh(self, key: str) -> None:
+        self._refreshing.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "discarded": self.discarded,
+        }
@@ -0,0 +1,128 @@
+"""Precompiled operationId -> route plan used for tool dispatch.
+
+Plans are compiled once per schema version (see alara.schema_index) so that
+executing a tool is a dict lookup plus argument binding instead of a walk over
+every path in the schema.
+"""
+import logging
+import string
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from alara.schema_index import ParameterSpec
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+HTTP_METHODS = ("get", "post", "put", "delete", "patch")
+
+
+class RouteBindingError(Exception):
+    """Raised when tool arguments cannot be bound to a route (the message is shown to the client)."""
+
+
+@dataclass(frozen=True)
+class RoutePlan:
+    operation_id: str
+    method: str  # Upper-case HTTP method, e.g. "GET"
+    path_template: str
+    tags: Tuple[str, ...]
+    path_params: FrozenSet[str]
+    query_params: FrozenSet[str]
+    # Every parameter name declared by the operation (any location); never sent as body
+    declared_params: FrozenSet[str]
+    # (name, location) of required parameters, in schema order
+    required_params: Tuple[Tuple[str, str], ...]
+    expects_body: bool
+    # Literal/field segments of the path template, precompiled from string.Formatter
+    _path_segments: Tuple[Tuple[str, Optional[str]], ...] = field(repr=False, default=())
+
+    @property
+    def needs_path_params(self) -> bool:
+        return any(field_name is not None for _, field_name in self._path_segments)
+
+    def format_path(self, path_params: Dict[str, Any]) -> str:
+        """Equivalent to path_template.format(**path_params) without reparsing the template."""
+        parts: List[str] = []
+        for literal, field_name in self._path_segments:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(str(path_params[field_name]))
+        return "".join(parts)
+
+
+def _compile_path(path_template: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    return tuple(
+        (literal, field_name)
+        for literal, field_name, _, _ in string.Formatter().parse(path_template)
+    )
+
+
+def compile_route(path: str, method: str, operation_id: str, tags: Iterable[str],
+                  parameters: Iterable["ParameterSpec"], expects_body: bool) -> RoutePlan:
+    path_params = set()
+    query_params = set()
+    declared_params = set()
+    required_params = []
+    for param in parameters:
+        declared_params.add(param.name)
+        if param.location == "path":
+            path_params.add(param.name)
+        elif param.location == "query":
+            query_params.add(param.name)
+        # Handle other locations like 'header', 'cookie' if necessary
+        if param.required:
+            required_params.append((param.name, param.location))
+
+    return RoutePlan(
+        operation_id=operation_id,
+        method=method.upper(),
+        path_template=path,
+        tags=tuple(tags),
+        path_params=frozenset(path_params),
+        query_params=frozenset(query_params),
+        declared_params=frozenset(declared_params),
+        required_params=tuple(required_params),
+        expects_body=expects_body,
+        _path_segments=_compile_path(path),
+    )
+
+
+def bind_arguments(plan: RoutePlan, arguments: Dict[str, Any]) -> Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Split tool arguments into (formatted_path, query_params, request_body) for plan.
+
+    Raises RouteBindingError if a required parameter is missing.
+    """
+    for param_name, param_location in plan.required_params:
+        if param_name not in arguments:
+            logger.error("Missing required parameter '%s' (in: %s) for tool '%s'", param_name, param_location, plan.operation_id)
+            raise RouteBindingError(f"Missing required parameter '{param_name}' for tool '{plan.operation_id}'.")
+
+    path_params: Dict[str, Any] = {}
+    query_params: Dict[str, Any] = {}
+    body_args: Dict[str, Any] = {}
+    for arg_name, value in arguments.items():
+        if arg_name in plan.path_params:
+            path_params[arg_name] = value
+        elif arg_name in plan.query_params:
+            query_params[arg_name] = value
+        elif arg_name not in plan.declared_params:
+            body_args[arg_name] = value
+
+    request_body = None
+    if plan.expects_body and body_args:
+        request_body = body_args
+    elif body_args:
+        logger.warning("Arguments %s were provided to '%s' but not defined as path/query params and no requestBody is specified in schema.", list(body_args.keys()), plan.operation_id)
+
+    if plan.needs_path_params:
+        if not path_params:
+            raise RouteBindingError(f"Path '{plan.path_template}' requires parameters, but none were provided in arguments.")
+        try:
+            formatted_path = plan.format_path(path_params)
+        except KeyError as e:
+            raise RouteBindingError(f"Missing required path parameter value for '{e.args[0]}' in tool '{plan.operation_id}'.")
+    else:
+        formatted_path = plan.path_template
+
+    return formatted_path, query_params, request_body
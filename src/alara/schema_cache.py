@@ -0,0 +1,130 @@
+"""On-disk cache for the backend OpenAPI schema and the tool table derived from it.
+
+Bridge processes are respawned often by MCP clients, so the last known schema is
+kept on disk and served immediately on startup while the bridge revalidates it
+against the backend in the background (ETag / content hash).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+# Bump whenever the layout of the cache files changes; old files are ignored.
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_enabled() -> bool:
+    """The cache is on by default; ALARA_SCHEMA_CACHE=0 turns it off."""
+    return os.getenv("ALARA_SCHEMA_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def get_cache_dir() -> Path:
+    """Resolve the cache directory (ALARA_CACHE_DIR, then XDG_CACHE_HOME, then ~/.cache)."""
+    configured = os.getenv("ALARA_CACHE_DIR")
+    if configured:
+        return Path(configured).expanduser()
+    xdg_cache = os.getenv("XDG_CACHE_HOME")
+    base = Path(xdg_cache).expanduser() if xdg_cache else Path.home() / ".cache"
+    return base / "alara"
+
+
+def content_hash(raw: bytes) -> str:
+    """Hash of the raw schema document, used to detect real changes."""
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _url_key(base_url: str) -> str:
+    return hashlib.sha256(base_url.encode("utf-8")).hexdigest()[:16]
+
+
+def _schema_file(base_url: str) -> Path:
+    return get_cache_dir() / f"schema-v{CACHE_FORMAT_VERSION}-{_url_key(base_url)}.json"
+
+
+def _tools_file(base_url: str) -> Path:
+    return get_cache_dir() / f"tools-v{CACHE_FORMAT_VERSION}-{_url_key(base_url)}.json"
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable cache file %s: %s", path, e)
+        return None
+    if not isinstance(data, dict) or data.get("version") != CACHE_FORMAT_VERSION:
+        logger.info("Ignoring cache file %s written by a different cache version.", path)
+        return None
+    return data
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    """Write via a temp file + rename so concurrent bridges never see a partial file."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=path.name, suffix=".tmp", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    except OSError as e:
+        logger.warning("Could not write cache file %s: %s", path, e)
+
+
+def load_cached_schema(base_url: str) -> Optional[Dict[str, Any]]:
+    """Return the cached entry for base_url ({schema, etag, content_hash, fetched_at}) or None."""
+    if not cache_enabled():
+        return None
+    entry = _read_json(_schema_file(base_url))
+    if not entry or entry.get("url") != base_url or not isinstance(entry.get("schema"), dict):
+        return None
+    return entry
+
+
+def save_cached_schema(base_url: str, schema_data: Dict[str, Any], etag: Optional[str], schema_hash: str) -> None:
+    if not cache_enabled():
+        return
+    _write_json_atomic(_schema_file(base_url), {
+        "version": CACHE_FORMAT_VERSION,
+        "url": base_url,
+        "etag": etag,
+        "content_hash": schema_hash,
+        "fetched_at": time.time(),
+        "schema": schema_data,
+    })
+
+
+def load_tool_table(base_url: str, tools_key: str) -> Optional[List[Dict[str, Any]]]:
+    """Return the cached tool definitions if they were built from the same schema + tag filter."""
+    if not cache_enabled():
+        return None
+    entry = _read_json(_tools_file(base_url))
+    if not entry or entry.get("url") != base_url or entry.get("key") != tools_key:
+        return None
+    tools = entry.get("tools")
+    return tools if isinstance(tools, list) else None
+
+
+def save_tool_table(base_url: str, tools_key: str, tools: List[Dict[str, Any]]) -> None:
+    if not cache_enabled():
+        return
+    _write_json_atomic(_tools_file(base_url), {
+        "version": CACHE_FORMAT_VERSION,
+        "url": base_url,
+        "key": tools_key,
+        "tools": tools,
+    })
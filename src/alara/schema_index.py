@@ -0,0 +1,240 @@
+"""Lightweight index of the backend operations exposed as tools.
+
+Instead of validating the whole OpenAPI document into pydantic models, the raw
+JSON is scanned once and only operations carrying an allowed tag are kept, as
+compact OperationRecords. Each record carries its compiled RoutePlan for
+dispatch plus the parameter and request body schemas needed to build the tool
+definition and its argument validator (compiled on first call). `$ref`s are resolved on first use and memoized per reference, so
+components that no exposed operation points at are never touched.
+
+    ALARA_SCHEMA_VALIDATE  also validate the full document with openapi_pydantic
+                           and reject it if invalid (debug aid, default 0)
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from alara.config import env_bool
+from alara.pagination import PaginationSpec, detect_pagination
+from alara.routes import HTTP_METHODS, RoutePlan, compile_route
+from alara.validation import ArgumentValidator, SchemaCompiler, compile_argument_validator
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+# Substituted for a schema that (indirectly) refers to itself
+RECURSIVE_SCHEMA: Dict[str, Any] = {"type": "object"}
+
+
+class SchemaIndexError(Exception):
+    """The document is not usable as an OpenAPI schema."""
+
+
+class RefResolver:
+    """Resolves local `#/...` references in a raw OpenAPI document, memoizing the results."""
+
+    def __init__(self, document: Dict[str, Any]):
+        self._document = document
+        self._targets: Dict[str, Any] = {}
+        self._inlined: Dict[str, Any] = {}
+        self._inlining: Set[str] = set()
+
+    def _lookup(self, ref: str) -> Any:
+        target = self._targets.get(ref)
+        if target is None:
+            if not ref.startswith("#/"):
+                raise SchemaIndexError(f"Only local references are supported, got '{ref}'.")
+            target = self._document
+            for part in ref[2:].split("/"):
+                part = part.replace("~1", "/").replace("~0", "~")
+                if not isinstance(target, dict) or part not in target:
+                    raise SchemaIndexError(f"Unresolvable reference '{ref}'.")
+                target = target[part]
+            self._targets[ref] = target
+        return target
+
+    def resolve(self, node: Any) -> Any:
+        """Follow a chain of $refs to the referenced object (one level, nested refs untouched)."""
+        seen = set()
+        while isinstance(node, dict) and "$ref" in node:
+            ref = node["$ref"]
+            if ref in seen:
+                raise SchemaIndexError(f"Circular reference '{ref}'.")
+            seen.add(ref)
+            node = self._lookup(ref)
+        return node
+
+    def inline(self, node: Any) -> Any:
+        """Return node with every nested $ref replaced by its target.
+
+        Results for referenced schemas are shared between callers and must not
+        be mutated. Recursive schemas are cut off with RECURSIVE_SCHEMA.
+        """
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str):
+                inlined = self._inlined.get(ref)
+                if inlined is not None:
+                    return inlined
+                if ref in self._inlining:
+                    return RECURSIVE_SCHEMA
+                self._inlining.add(ref)
+                try:
+                    inlined = self.inline(self._lookup(ref))
+                finally:
+                    self._inlining.discard(ref)
+                self._inlined[ref] = inlined
+                return inlined
+            return {key: self.inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [self.inline(item) for item in node]
+        return node
+
+
+@dataclass(frozen=True)
+class ParameterSpec:
+    name: str
+    location: str  # "path", "query", "header" or "cookie"
+    required: bool
+    description: Optional[str]
+    schema: Any  # Raw schema node; may still contain $refs
+
+
+@dataclass(frozen=True)
+class OperationRecord:
+    operation_id: str
+    method: str  # Upper-case HTTP method, e.g. "GET"
+    path: str
+    tags: Tuple[str, ...]
+    summary: Optional[str]
+    parameters: Tuple[ParameterSpec, ...]
+    # Raw application/json request body schema (may contain $refs), if any
+    body_schema: Any
+    plan: RoutePlan = field(repr=False)
+
+
+class SchemaIndex:
+    def __init__(self, openapi_version: str, operations: Dict[str, OperationRecord], resolver: RefResolver):
+        self.openapi = openapi_version
+        self.operations = operations
+        self.routes: Dict[str, RoutePlan] = {op_id: record.plan for op_id, record in operations.items()}
+        self._resolver = resolver
+        self._compiler = SchemaCompiler()
+        self._validators: Dict[str, ArgumentValidator] = {}
+        self._pagination: Dict[str, Optional[PaginationSpec]] = {}
+
+    def resolve_schema(self, node: Any) -> Any:
+        """Schema node with all $refs inlined (memoized per reference)."""
+        return self._resolver.inline(node)
+
+    def argument_validator(self, operation_id: str) -> Optional[ArgumentValidator]:
+        """Compiled argument validator for an operation, built on first use."""
+        validator = self._validators.get(operation_id)
+        if validator is None:
+            record = self.operations.get(operation_id)
+            if record is None:
+                return None
+            validator = self._validators[operation_id] = compile_argument_validator(
+                self._compiler,
+                operation_id,
+                ((param.name, param.required, self.resolve_schema(param.schema)) for param in record.parameters),
+                self.resolve_schema(record.body_schema),
+            )
+        return validator
+
+    def pagination(self, operation_id: str) -> Optional[PaginationSpec]:
+        """How an operation's results are paged (None if they are not), detected on first use."""
+        if operation_id not in self._pagination:
+            record = self.operations.get(operation_id)
+            self._pagination[operation_id] = detect_pagination(
+                record.method, ((param.name, param.location, self.resolve_schema(param.schema)) for param in record.parameters)
+            ) if record else None
+        return self._pagination[operation_id]
+
+
+def _merged_parameters(resolver: RefResolver, path_level: Iterable[Any], operation_level: Iterable[Any],
+                       operation_id: str) -> Tuple[ParameterSpec, ...]:
+    """Path-item parameters overridden by operation parameters with the same name and location."""
+    merged: Dict[Tuple[str, str], ParameterSpec] = {}
+    for raw_param in list(path_level) + list(operation_level):
+        try:
+            param = resolver.resolve(raw_param)
+        except SchemaIndexError as e:
+            logger.warning("Skipping parameter of operation '%s': %s", operation_id, e)
+            continue
+        if not isinstance(param, dict) or not param.get("name"):
+            logger.warning("Skipping malformed parameter in operation '%s'.", operation_id)
+            continue
+        location = param.get("in", "unknown")
+        merged[(param["name"], location)] = ParameterSpec(
+            name=param["name"],
+            location=location,
+            required=bool(param.get("required", location == "path")),
+            description=param.get("description"),
+            schema=param.get("schema"),
+        )
+    return tuple(merged.values())
+
+
+def _json_body_schema(resolver: RefResolver, request_body: Any, operation_id: str) -> Any:
+    try:
+        request_body = resolver.resolve(request_body)
+        content = request_body.get("content") or {}
+        return (content.get("application/json") or {}).get("schema")
+    except (AttributeError, SchemaIndexError) as e:
+        logger.warning("Ignoring request body schema of operation '%s': %s", operation_id, e)
+        return None
+
+
+def validate_document(document: Dict[str, Any]) -> None:
+    """Full openapi_pydantic validation of the document; raises on an invalid schema."""
+    try:
+        from openapi_pydantic import OpenAPI # Slow to import; only needed in this debug mode
+    except ImportError:
+        raise SchemaIndexError('ALARA_SCHEMA_VALIDATE needs openapi-pydantic: pip install "alara[validate]"') from None
+    OpenAPI.model_validate(document)
+
+
+def build_schema_index(document: Dict[str, Any], allowed_tags: FrozenSet[str]) -> SchemaIndex:
+    """Index the operations of document that carry one of allowed_tags."""
+    if not isinstance(document, dict) or not isinstance(document.get("paths"), dict):
+        raise SchemaIndexError("Document has no 'paths' object.")
+    if env_bool("ALARA_SCHEMA_VALIDATE", False):
+        validate_document(document)
+        logger.info("OpenAPI document passed full validation.")
+
+    # Only non-path sections (components etc.) are kept for lazy $ref resolution
+    resolver = RefResolver({key: value for key, value in document.items() if key != "paths"})
+    operations: Dict[str, OperationRecord] = {}
+    skipped = 0
+    for path, path_item in document["paths"].items():
+        if not isinstance(path_item, dict):
+            continue
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if not isinstance(operation, dict):
+                continue
+            tags = operation.get("tags") or ()
+            operation_id = operation.get("operationId")
+            if not operation_id or not allowed_tags.intersection(tags):
+                skipped += 1
+                continue
+            if operation_id in operations:
+                # Keep the first match, as the old linear scan did
+                logger.warning("Duplicate operationId '%s' at %s %s; ignoring.", operation_id, method.upper(), path)
+                continue
+            parameters = _merged_parameters(resolver, path_item.get("parameters") or (), operation.get("parameters") or (), operation_id)
+            request_body = operation.get("requestBody")
+            operations[operation_id] = OperationRecord(
+                operation_id=operation_id,
+                method=method.upper(),
+                path=path,
+                tags=tuple(tags),
+                summary=operation.get("summary"),
+                parameters=parameters,
+                body_schema=_json_body_schema(resolver, request_body, operation_id) if request_body is not None else None,
+                plan=compile_route(path, method, operation_id, tags, parameters, request_body is not None),
+            )
+
+    logger.debug("Indexed %s operations (%s skipped by tag filter or missing operationId).", len(operations), skipped)
+    return SchemaIndex(str(document.get("openapi", "unknown")), operations, resolver)
+
@@ -0,0 +1,73 @@
+"""Single-flight coalescing of identical in-flight backend requests.
+
+Concurrent callers asking for the same key share one upstream call and all get
+its result (or its exception). Cancelling one waiter never cancels the shared
+call for the others; the upstream call is only cancelled once every waiter has
+gone away.
+
+The shared call runs without the deadline of the caller that started it: each
+waiter stops waiting at its own deadline instead, so a caller with a short
+`_timeout` neither cuts the call short for the others nor is held past its own.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from alara.deadlines import detached_context, time_left
+
+logger = logging.getLogger("AlaraStdioBridge")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() once for all concurrent callers using the same key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            # The task copies the context it is created in: give it one without this caller's deadline
+            flight = _Flight(detached_context().run(asyncio.ensure_future, fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task, k=key, f=flight: self._forget(k, f))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.debug("Coalescing request with in-flight call for %s", key)
+
+        flight.waiters += 1
+        try:
+            # shield(): our own cancellation (or deadline) must not propagate into the shared task
+            remaining = time_left()
+            if remaining is None:
+                return await asyncio.shield(flight.task)
+            return await asyncio.wait_for(asyncio.shield(flight.task), max(0.0, remaining))
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Last interested caller left (cancelled); abort the upstream call
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            # Mark the exception as retrieved even if every waiter was cancelled
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
@@ -0,0 +1,381 @@
+"""Local validation and coercion of tool arguments.
+
+Each operation's parameter and JSON request body schemas (with $refs already
+inlined by alara.schema_index) are compiled once into plain Python closures.
+Calls are checked before anything is sent upstream, so a wrong type or enum
+value is reported immediately with the offending argument's path instead of
+after a backend round trip. Values that are unambiguous in another
+representation are coerced: numeric strings to numbers, "true"/"false" to
+booleans, numbers to strings, and JSON text to arrays/objects.
+
+    ALARA_VALIDATE_ARGUMENTS  set to 0 to forward arguments unchecked (default 1)
+"""
+import json
+import math
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# validator(value, path, errors) -> coerced value; problems are appended to errors
+Validator = Callable[[Any, str, List[str]], Any]
+
+_INTEGER_RE = re.compile(r"^[+-]?\d+$")
+
+# Shown in "expected X, got Y" messages
+_TYPE_NAMES = {bool: "boolean", int: "integer", float: "number", str: "string", list: "array", dict: "object", type(None): "null"}
+
+# Errors reported per call before the rest are summarized
+MAX_REPORTED_ERRORS = 10
+
+
+class ArgumentValidationError(Exception):
+    """Tool arguments do not match the operation's schema (the message is shown to the client)."""
+
+    def __init__(self, operation_id: str, errors: List[str]):
+        shown = errors[:MAX_REPORTED_ERRORS]
+        if len(errors) > len(shown):
+            shown.append(f"... and {len(errors) - len(shown)} more")
+        super().__init__(f"Invalid arguments for tool '{operation_id}': " + "; ".join(shown))
+        self.operation_id = operation_id
+        self.errors = errors
+
+
+def _type_name(value: Any) -> str:
+    return _TYPE_NAMES.get(type(value), type(value).__name__)
+
+
+def _join(path: str, key: Any) -> str:
+    return f"{path}[{key}]" if isinstance(key, int) else (f"{path}.{key}" if path else str(key))
+
+
+_NO_MATCH = object()
+
+
+def _coerce(value: Any, schema_type: str, exact: bool) -> Any:
+    """value as schema_type, or _NO_MATCH. exact=True only accepts values already of that type."""
+    value_type = type(value)
+    if schema_type == "string":
+        if value_type is str:
+            return value
+        if not exact and value_type in (int, float):
+            return str(value)
+    elif schema_type == "integer":
+        if value_type is int:
+            return value
+        if not exact:
+            if value_type is float and value.is_integer():
+                return int(value)
+            if value_type is str and _INTEGER_RE.match(value.strip()):
+                return int(value.strip())
+    elif schema_type == "number":
+        if value_type in (int, float):
+            return value
+        if not exact and value_type is str:
+            text = value.strip()
+            if _INTEGER_RE.match(text):
+                return int(text)
+            try:
+                number = float(text)
+            except ValueError:
+                return _NO_MATCH
+            return number if math.isfinite(number) else _NO_MATCH
+    elif schema_type == "boolean":
+        if value_type is bool:
+            return value
+        if not exact and value_type is str and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+    elif schema_type in ("array", "object"):
+        container = list if schema_type == "array" else dict
+        if value_type is container:
+            return value
+        if not exact and value_type is str and value.strip()[:1] in ("[", "{"):
+            try:
+                decoded = json.loads(value)
+            except ValueError:
+                return _NO_MATCH
+            return decoded if type(decoded) is container else _NO_MATCH
+    elif schema_type == "null":
+        if value is None:
+            return None
+    return _NO_MATCH
+
+
+def _schema_types(schema: Dict[str, Any]) -> Tuple[str, ...]:
+    schema_type = schema.get("type")
+    if isinstance(schema_type, str):
+        types = [schema_type]
+    elif isinstance(schema_type, list):
+        types = [t for t in schema_type if isinstance(t, str)]
+    elif "properties" in schema:
+        types = ["object"]
+    elif "items" in schema:
+        types = ["array"]
+    else:
+        return ()
+    if schema.get("nullable") and "null" not in types: # OpenAPI 3.0 style
+        types.append("null")
+    return tuple(types)
+
+
+class SchemaCompiler:
+    """Compiles JSON schemas into validators, reusing the result for schemas seen before.
+
+    Schemas are keyed by identity: inlined $ref targets are shared objects, so a
+    component used by many operations is compiled once.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[int, Tuple[Any, Validator]] = {}
+
+    def compile(self, schema: Any) -> Optional[Validator]:
+        """Validator for schema, or None if the schema places no constraints."""
+        if not isinstance(schema, dict) or not schema:
+            return None
+        cached = self._compiled.get(id(schema))
+        if cached is not None:
+            return cached[1]
+        validator = self._compile(schema)
+        self._compiled[id(schema)] = (schema, validator) # Keep schema alive so its id stays unique
+        return validator
+
+    def _compile(self, schema: Dict[str, Any]) -> Optional[Validator]:
+        checks: List[Validator] = []
+
+        types = _schema_types(schema)
+        if types:
+            checks.append(self._type_check(types))
+
+        for combinator in ("anyOf", "oneOf"):
+            if isinstance(schema.get(combinator), list):
+                checks.append(self._any_of_check(schema[combinator]))
+        for sub_schema in schema.get("allOf") or ():
+            sub_validator = self.compile(sub_schema)
+            if sub_validator:
+                checks.append(sub_validator)
+
+        if "enum" in schema and isinstance(schema["enum"], list):
+            checks.append(_enum_check(schema["enum"]))
+        if "const" in schema:
+            checks.append(_enum_check([schema["const"]]))
+        checks.extend(_string_checks(schema))
+        checks.extend(_number_checks(schema))
+        if "array" in types or "items" in schema:
+            checks.extend(self._array_checks(schema))
+        if "object" in types:
+            checks.extend(self._object_checks(schema))
+
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+
+        def validate(value: Any, path: str, errors: List[str]) -> Any:
+            for check in checks:
+                before = len(errors)
+                value = check(value, path, errors)
+                if len(errors) > before:
+                    break # Later checks would only repeat the problem
+            return value
+        return validate
+
+    def _type_check(self, types: Tuple[str, ...]) -> Validator:
+        expected = " or ".join(types)
+
+        def check_type(value: Any, path: str, errors: List[str]) -> Any:
+            for exact in (True, False):
+                for schema_type in types:
+                    coerced = _coerce(value, schema_type, exact)
+                    if coerced is not _NO_MATCH:
+                        return coerced
+            errors.append(f"{path or 'value'}: expected {expected}, got {_type_name(value)}")
+            return value
+        return check_type
+
+    def _any_of_check(self, alternatives: List[Any]) -> Validator:
+        validators = [self.compile(alternative) for alternative in alternatives]
+        if any(v is None for v in validators):
+            return lambda value, path, errors: value # One alternative accepts anything
+
+        def check_any_of(value: Any, path: str, errors: List[str]) -> Any:
+            first_errors: Optional[List[str]] = None
+            for validator in validators:
+                attempt: List[str] = []
+                coerced = validator(value, path, attempt)
+                if not attempt:
+                    return coerced
+                if first_errors is None:
+                    first_errors = attempt
+            errors.append(f"{path or 'value'}: does not match any allowed schema ({first_errors[0]})")
+            return value
+        return check_any_of
+
+    def _array_checks(self, schema: Dict[str, Any]) -> List[Validator]:
+        checks: List[Validator] = []
+        item_validator = self.compile(schema.get("items"))
+        if item_validator:
+            def check_items(value: Any, path: str, errors: List[str]) -> Any:
+                if type(value) is not list:
+                    return value
+                return [item_validator(item, _join(path, i), errors) for i, item in enumerate(value)]
+            checks.append(check_items)
+        min_items, max_items = schema.get("minItems"), schema.get("maxItems")
+        if min_items is not None or max_items is not None:
+            def check_length(value: Any, path: str, errors: List[str]) -> Any:
+                if type(value) is list:
+                    if min_items is not None and len(value) < min_items:
+                        errors.append(f"{path}: expected at least {min_items} items, got {len(value)}")
+                    elif max_items is not None and len(value) > max_items:
+                        errors.append(f"{path}: expected at most {max_items} items, got {len(value)}")
+                return value
+            checks.append(check_length)
+        return checks
+
+    def _object_checks(self, schema: Dict[str, Any]) -> List[Validator]:
+        properties = schema.get("properties") if isinstance(schema.get("properties"), dict) else {}
+        property_validators = {name: self.compile(prop) for name, prop in properties.items()}
+        property_validators = {name: v for name, v in property_validators.items() if v is not None}
+        required = tuple(r for r in schema.get("required") or () if isinstance(r, str))
+        additional = schema.get("additionalProperties", True)
+        reject_additional = additional is False
+        additional_validator = self.compile(additional) if isinstance(additional, dict) else None
+        if not (property_validators or required or reject_additional or additional_validator):
+            return []
+
+        def check_object(value: Any, path: str, errors: List[str]) -> Any:
+            if type(value) is not dict:
+                return value
+            for name in required:
+                if name not in value:
+                    errors.append(f"{_join(path, name)}: required property is missing")
+            result = {}
+            for name, item in value.items():
+                validator = property_validators.get(name)
+                if validator is None and name not in properties:
+                    if reject_additional:
+                        errors.append(f"{_join(path, name)}: unexpected property")
+                        continue
+                    validator = additional_validator
+                result[name] = validator(item, _join(path, name), errors) if validator else item
+            return result
+        return [check_object]
+
+
+def _enum_check(allowed: List[Any]) -> Validator:
+    allowed_set = None
+    try:
+        allowed_set = frozenset(allowed)
+    except TypeError:
+        pass # Unhashable members (objects/arrays); fall back to a linear scan
+
+    def check_enum(value: Any, path: str, errors: List[str]) -> Any:
+        try:
+            found = value in allowed_set if allowed_set is not None else value in allowed
+        except TypeError:
+            found = value in allowed
+        if not found:
+            errors.append(f"{path or 'value'}: must be one of {allowed}, got {value!r}")
+        return value
+    return check_enum
+
+
+def _string_checks(schema: Dict[str, Any]) -> List[Validator]:
+    min_length, max_length, pattern = schema.get("minLength"), schema.get("maxLength"), schema.get("pattern")
+    if min_length is None and max_length is None and not pattern:
+        return []
+    try:
+        regex = re.compile(pattern) if pattern else None
+    except re.error:
+        regex = None # ECMA-only syntax; not worth rejecting calls over
+
+    def check_string(value: Any, path: str, errors: List[str]) -> Any:
+        if type(value) is str:
+            if min_length is not None and len(value) < min_length:
+                errors.append(f"{path}: expected at least {min_length} characters")
+            elif max_length is not None and len(value) > max_length:
+                errors.append(f"{path}: expected at most {max_length} characters")
+            elif regex is not None and not regex.search(value):
+                errors.append(f"{path}: does not match pattern {pattern!r}")
+        return value
+    return [check_string]
+
+
+def _number_checks(schema: Dict[str, Any]) -> List[Validator]:
+    bounds = []
+    minimum, maximum = schema.get("minimum"), schema.get("maximum")
+    exclusive_min, exclusive_max = schema.get("exclusiveMinimum"), schema.get("exclusiveMaximum")
+    # OpenAPI 3.0 uses booleans that modify minimum/maximum; 3.1 uses the bound itself
+    if exclusive_min is True:
+        exclusive_min, minimum = minimum, None
+    if exclusive_max is True:
+        exclusive_max, maximum = maximum, None
+    if isinstance(minimum, (int, float)) and not isinstance(minimum, bool):
+        bounds.append((lambda v, b=minimum: v >= b, f">= {minimum}"))
+    if isinstance(maximum, (int, float)) and not isinstance(maximum, bool):
+        bounds.append((lambda v, b=maximum: v <= b, f"<= {maximum}"))
+    if isinstance(exclusive_min, (int, float)) and not isinstance(exclusive_min, bool):
+        bounds.append((lambda v, b=exclusive_min: v > b, f"> {exclusive_min}"))
+    if isinstance(exclusive_max, (int, float)) and not isinstance(exclusive_max, bool):
+        bounds.append((lambda v, b=exclusive_max: v < b, f"< {exclusive_max}"))
+    if not bounds:
+        return []
+
+    def check_bounds(value: Any, path: str, errors: List[str]) -> Any:
+        if type(value) in (int, float):
+            for within, description in bounds:
+                if not within(value):
+                    errors.append(f"{path}: must be {description}, got {value}")
+                    break
+        return value
+    return [check_bounds]
+
+
+class ArgumentValidator:
+    """Checks and coerces the flat tool arguments of one operation."""
+
+    def __init__(self, operation_id: str, fields: Dict[str, Validator], required: Tuple[str, ...]):
+        self.operation_id = operation_id
+        self.fields = fields
+        self.required = required
+
+    def __call__(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        errors: List[str] = []
+        for name in self.required:
+            if arguments.get(name) is None:
+                errors.append(f"{name}: required argument is missing")
+        result = {}
+        for name, value in arguments.items():
+            if value is None and name not in self.required:
+                continue # Agents often send null for "not set"; treat it as omitted
+            validator = self.fields.get(name)
+            result[name] = validator(value, name, errors) if validator else value
+        if errors:
+            raise ArgumentValidationError(self.operation_id, errors)
+        return result
+
+
+def compile_argument_validator(compiler: SchemaCompiler, operation_id: str,
+                               parameters: Iterable[Tuple[str, bool, Any]], body_schema: Any) -> ArgumentValidator:
+    """Build the validator for one operation.
+
+    parameters are (name, required, inlined schema) tuples. Tool arguments are
+    flat: body properties sit next to the parameters, mirroring the generated
+    tool input schema.
+    """
+    fields: Dict[str, Validator] = {}
+    required: List[str] = []
+    declared = set()
+    for name, is_required, schema in parameters:
+        declared.add(name)
+        validator = compiler.compile(schema)
+        if validator:
+            fields[name] = validator
+        if is_required:
+            required.append(name)
+    if isinstance(body_schema, dict) and isinstance(body_schema.get("properties"), dict):
+        for name, schema in body_schema["properties"].items():
+            if name in declared:
+                continue # Parameters take precedence, as in bind_arguments()
+            validator = compiler.compile(schema)
+            if validator:
+                fields[name] = validator
+        required.extend(r for r in body_schema.get("required") or () if r not in declared and r not in required)
+    return ArgumentValidator(operation_id, fields, tuple(required))
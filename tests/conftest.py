@@ -0,0 +1,72 @@
+import asyncio
+import json
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import pytest
+
+import alara.bridge as bridge
+from alara.http_client import create_http_client, set_http_client
+
+BACKEND_URL = "http://backend.test"
+
+
+def operation(operation_id: str, *parameters: Dict[str, Any], method: str = "get") -> Dict[str, Any]:
+    """OpenAPI path item for one operation, e.g. operation("fetch_trades", query("symbol", required=True))."""
+    return {method: {"operationId": operation_id, "tags": ["CCXT"], "parameters": list(parameters),
+                     "responses": {"200": {"description": "ok"}}}}
+
+
+def query(name: str, schema_type: str = "string", required: bool = False) -> Dict[str, Any]:
+    return {"name": name, "in": "query", "required": required, "schema": {"type": schema_type}}
+
+
+class FakeBackend:
+    """The Alara backend behind an httpx.MockTransport: a schema and one handler per path."""
+
+    def __init__(self):
+        self.paths: Dict[str, Any] = {}
+        self.handlers: Dict[str, Callable[[httpx.Request], Any]] = {}
+        self.requests = []
+
+    def route(self, path: str, path_item: Dict[str, Any], handler: Callable[[httpx.Request], Any]) -> None:
+        self.paths[path] = path_item
+        self.handlers[path] = handler
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.path == "/openapi.json":
+            return httpx.Response(200, json={"openapi": "3.1.0", "info": {"title": "test", "version": "1"}, "paths": self.paths})
+        handler = self.handlers.get(request.url.path)
+        if handler is None:
+            return httpx.Response(404, json={"detail": "not found"})
+        result = handler(request)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result if isinstance(result, httpx.Response) else httpx.Response(200, content=json.dumps(result))
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    """A fresh bridge (no schema, caches or pools from earlier tests) talking to a FakeBackend."""
+    monkeypatch.setenv("ALARA_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("ALARA_SCHEMA_CACHE", "0")
+    monkeypatch.setattr(bridge, "ALARA_API_KEY", "test-key")
+    monkeypatch.setattr(bridge, "ALARA_PROD_URL", BACKEND_URL)
+    monkeypatch.setattr(bridge, "SCHEMA_REFRESH_INTERVAL", 0.0)
+    for name in ("_schema", "_schema_refresh_task", "_endpoint_pool", "_endpoint_pool_spec", "_response_cache",
+                 "_resilience", "_continuation_store", "_bridge_tool_list", "_feed_manager"):
+        monkeypatch.setattr(bridge, name, None)
+    monkeypatch.setattr(bridge, "_schema_lock", asyncio.Lock())
+    monkeypatch.setattr(bridge, "_inflight_requests", bridge.SingleFlight())
+    fake = FakeBackend()
+    set_http_client(create_http_client(transport=httpx.MockTransport(fake.handle)))
+    yield fake
+    set_http_client(None)
+
+
+def call_tool(name: str, arguments: Dict[str, Any]) -> Any:
+    """Run one tool call through the bridge; the parsed JSON result, or the error text."""
+    result = asyncio.run(bridge.execute_tool_impl(name, arguments))
+    text: Optional[str] = result[0].text
+    return text if text.startswith("Error:") else json.loads(text)
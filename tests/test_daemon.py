@@ -0,0 +1,138 @@
+import asyncio
+import json
+import re
+import socket
+
+import pytest
+
+import alara.bridge as bridge
+from alara import relay
+from alara.daemon import BridgeDaemon
+from alara.relay import RELAY_PROTOCOL_VERSION, DaemonUnavailable
+from conftest import BACKEND_URL, operation, query
+
+
+def _hello(**fields):
+    return {"alara_relay": RELAY_PROTOCOL_VERSION, "api_key": "key-a", "backend_url": BACKEND_URL, **fields}
+
+
+@pytest.fixture
+def daemon(backend, monkeypatch):
+    """A daemon (never listening itself) in front of a backend that echoes the key each call was made with."""
+    monkeypatch.setattr(bridge, "ALARA_API_KEY", None)  # As in run_daemon(): sessions bring their own keys
+    monkeypatch.setenv("ALARA_MAX_OUTPUT_CHARS", "200")
+    backend.route("/api/ticker", operation("fetch_ticker", query("symbol", required=True)),
+                  lambda request: {"key": request.headers["X-API-Key"], "symbol": request.url.params["symbol"]})
+    backend.route("/api/trades", operation("fetch_trades", query("symbol", required=True)),
+                  lambda request: [{"id": i, "key": request.headers["X-API-Key"]} for i in range(20)])
+    return BridgeDaemon("unused.sock", BACKEND_URL)
+
+
+class Client:
+    """One relay connection to the daemon over a socketpair: the handshake, then JSON-RPC lines."""
+
+    def __init__(self, daemon):
+        self.daemon = daemon
+        self._next_id = 0
+
+    async def connect(self, hello):
+        client_sock, daemon_sock = socket.socketpair()
+        daemon_reader, daemon_writer = await asyncio.open_unix_connection(sock=daemon_sock)
+        self.task = asyncio.create_task(self.daemon.handle_connection(daemon_reader, daemon_writer))
+        self.reader, self.writer = await asyncio.open_unix_connection(sock=client_sock)
+        line = hello if isinstance(hello, bytes) else json.dumps(hello).encode("utf-8") + b"\n"
+        self.writer.write(line)
+        return json.loads(await self.reader.readline())
+
+    async def request(self, method, params):
+        self._next_id += 1
+        await self._send({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+        while True:
+            message = json.loads(await self.reader.readline())
+            if message.get("id") == self._next_id:
+                return message
+
+    async def initialize(self):
+        await self.request("initialize", {"protocolVersion": "2025-06-18", "capabilities": {},
+                                          "clientInfo": {"name": "test", "version": "1"}})
+        await self._send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def call_tool(self, name, arguments):
+        reply = await self.request("tools/call", {"name": name, "arguments": arguments})
+        return [content["text"] for content in reply["result"]["content"]]
+
+    async def close(self):
+        self.writer.close()
+        await asyncio.wait_for(self.task, 5)
+
+    async def _send(self, message):
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        await self.writer.drain()
+
+
+@pytest.mark.parametrize("hello, error", [
+    (_hello(alara_relay=RELAY_PROTOCOL_VERSION + 1), "unsupported relay protocol (daemon speaks version 1)"),
+    ({"alara_relay": RELAY_PROTOCOL_VERSION, "backend_url": BACKEND_URL}, "missing api_key"),
+    (_hello(api_key=""), "missing api_key"),
+    (_hello(backend_url="http://other.test"), "daemon serves http://backend.test, not http://other.test"),
+    (b"not json\n", "invalid handshake (JSONDecodeError)"),
+])
+def test_bad_handshakes_are_refused(daemon, backend, hello, error):
+    async def main():
+        client = Client(daemon)
+        assert await client.connect(hello) == {"ok": False, "error": error}
+        assert await client.reader.read() == b""  # The daemon hung up
+        await asyncio.wait_for(client.task, 5)
+
+    asyncio.run(main())
+    assert daemon.stats() == {"active_sessions": 0, "sessions_served": 0, "refused_sessions": 1}
+    assert backend.requests == []
+
+
+def test_sessions_keep_their_own_key_cache_and_continuations(daemon, backend):
+    async def main():
+        alice, bob = Client(daemon), Client(daemon)
+        assert await alice.connect(_hello(backend_url=BACKEND_URL + "/")) == {"ok": True, "error": None}
+        assert await bob.connect(_hello(api_key="key-b")) == {"ok": True, "error": None}
+        await alice.initialize()
+        await bob.initialize()
+        assert daemon.stats()["active_sessions"] == 2
+
+        ticker = {"symbol": "BTC/USDT"}
+        assert json.loads((await alice.call_tool("fetch_ticker", ticker))[0])["key"] == "key-a"
+        assert json.loads((await bob.call_tool("fetch_ticker", ticker))[0])["key"] == "key-b"  # Not alice's cached copy
+        assert json.loads((await alice.call_tool("fetch_ticker", ticker))[0])["key"] == "key-a"
+        upstream = [request.headers["X-API-Key"] for request in backend.requests if request.url.path == "/api/ticker"]
+        assert upstream == ["key-a", "key-b"]  # alice's second call was a cache hit
+
+        chunk, note = await alice.call_tool("fetch_trades", ticker)
+        assert '"key-a"' in chunk
+        handle, offset = re.search(r'handle="([^"]+)" and offset=(\d+)', note).groups()
+        arguments = {"handle": handle, "offset": int(offset)}
+        assert (await bob.call_tool(bridge.CONTINUATION_TOOL_NAME, arguments))[0].startswith("Error: Unknown or expired continuation handle")
+        assert not (await alice.call_tool(bridge.CONTINUATION_TOOL_NAME, arguments))[0].startswith("Error:")
+
+        await alice.close()
+        await bob.close()
+
+    asyncio.run(main())
+    assert daemon.stats() == {"active_sessions": 0, "sessions_served": 2, "refused_sessions": 0}
+
+
+def test_relay_reports_a_refused_session(daemon, tmp_path, monkeypatch):
+    socket_dir = tmp_path / "run"
+    socket_dir.mkdir(mode=0o700)
+    socket_path = str(socket_dir / "bridge.sock")
+    monkeypatch.setenv("ALARA_DAEMON_SOCKET", socket_path)
+    monkeypatch.setenv("ALARA_DAEMON_AUTOSTART", "0")
+
+    async def main():
+        server = await asyncio.start_unix_server(daemon.handle_connection, path=socket_path)
+        async with server:
+            with pytest.raises(DaemonUnavailable, match="daemon refused the session: daemon serves http://backend.test, not http://other.test"):
+                await asyncio.to_thread(relay.connect_to_daemon, "key-a", "http://other.test")
+            sock = await asyncio.to_thread(relay.connect_to_daemon, "key-a", BACKEND_URL)
+            sock.close()
+
+    asyncio.run(main())
+    assert daemon.refused_sessions == 1
@@ -0,0 +1,47 @@
+import json
+
+from alara.encoding import encode_result, to_columnar
+
+
+def test_records_become_named_columns():
+    trades = [{"id": 1, "price": 2.0}, {"id": 2, "price": 2.5}]
+    assert to_columnar(trades) == {"_columns": {"id": [1, 2], "price": [2.0, 2.5]}, "_rows": 2}
+
+
+def test_ohlcv_candles_become_positional_columns():
+    candles = [
+        [1700000000000, 64000.0, 64100.0, 63900.0, 64050.0, 12.5],
+        [1700000060000, 64050.0, 64200.0, 64000.0, 64150.0, 8.25],
+        [1700000120000, 64150.0, 64160.0, 63950.0, 64000.0, 10.0],
+    ]
+    packed = to_columnar(candles)
+    assert packed["_rows"] == 3
+    assert packed["_columns"][0] == [1700000000000, 1700000060000, 1700000120000]
+    assert packed["_columns"][5] == [12.5, 8.25, 10.0]
+    assert [list(row) for row in zip(*packed["_columns"])] == candles
+
+
+def test_order_book_sides_are_packed_inside_the_book():
+    book = {
+        "symbol": "BTC/USDT",
+        "bids": [[64250.0, 1.5], [64249.5, 0.2]],
+        "asks": [[64251.0, 0.7], [64252.0, 3.0]],
+        "timestamp": 1700000000000,
+    }
+    packed = json.loads(encode_result(book, "columnar"))
+    assert packed["bids"] == {"_columns": [[64250.0, 64249.5], [1.5, 0.2]], "_rows": 2}
+    assert packed["asks"] == {"_columns": [[64251.0, 64252.0], [0.7, 3.0]], "_rows": 2}
+    assert packed["symbol"] == "BTC/USDT"
+
+
+def test_ragged_or_nested_rows_are_left_alone():
+    ragged = [[1, 2], [3]]
+    nested = [[1, [2]], [3, [4]]]
+    assert to_columnar(ragged) == ragged
+    assert to_columnar(nested) == nested
+    assert to_columnar([[1, 2]]) == [[1, 2]] # A single row is not worth a header
+
+
+def test_json_format_is_unchanged():
+    candles = [[1, 2.0], [2, 3.0]]
+    assert json.loads(encode_result(candles, "json")) == candles
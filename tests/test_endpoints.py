@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+
+from alara import endpoints as module
+from alara.endpoints import EndpointPool, parse_endpoint_urls
+from alara.http_client import create_http_client, get_http_client, set_http_client
+
+EU, US = "http://eu.alara.test", "http://us.alara.test"
+
+
+class Backends:
+    """Backends behind one MockTransport, routed by host; `down` makes one refuse connections or answer with a status."""
+
+    def __init__(self):
+        self.down = {}
+        self.delay = {}
+        self.requests = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.requests.append((host, request.url.path))
+        await asyncio.sleep(self.delay.get(host, 0))
+        failure = self.down.get(host)
+        if failure == "connect":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(failure or 200, json={"host": host})
+
+    def hits(self, host: str, path: str = "/api/ticker") -> int:
+        return self.requests.count((host, path))
+
+
+@pytest.fixture
+def backends():
+    routes = Backends()
+    set_http_client(create_http_client(transport=httpx.MockTransport(routes.handle)))
+    yield routes
+    set_http_client(None)
+
+
+async def _send(endpoint):
+    response = await get_http_client().get(endpoint.url + "/api/ticker")
+    response.raise_for_status()
+    return response.json()["host"]
+
+
+def _pool(**kwargs):
+    options = {"probe_interval": 0, "failure_threshold": 1, **kwargs}
+    return EndpointPool([EU, US], **options)
+
+
+def test_endpoint_urls_are_split_and_deduplicated():
+    assert parse_endpoint_urls(f" {EU}/, {US}\n{EU} ") == [EU, US]
+
+
+@pytest.mark.parametrize("failure", ["connect", 502, 503, 504])
+def test_reads_fail_over_to_the_next_endpoint(backends, failure):
+    backends.down["eu.alara.test"] = failure
+    pool = _pool()
+    assert asyncio.run(pool.request("GET", _send)) == "us.alara.test"
+    eu = pool.stats()["backends"][EU]
+    assert eu["failovers"] == 1 and not eu["healthy"]
+
+
+def test_writes_fail_over_only_when_nothing_was_sent(backends):
+    pool = _pool(failure_threshold=3)
+    backends.down["eu.alara.test"] = 503
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(pool.request("POST", _send))
+    assert backends.hits("us.alara.test") == 0
+
+    backends.down["eu.alara.test"] = "connect"
+    assert asyncio.run(pool.request("POST", _send)) == "us.alara.test"
+
+
+def test_client_errors_do_not_fail_over(backends):
+    backends.down["eu.alara.test"] = 404
+    pool = _pool()
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(pool.request("GET", _send))
+    assert backends.hits("us.alara.test") == 0
+    assert pool.stats()["backends"][EU]["healthy"]
+
+
+def test_unhealthy_endpoint_is_skipped_until_its_retry_is_due(backends, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    backends.down["eu.alara.test"] = "connect"
+    pool = _pool()
+    asyncio.run(pool.request("GET", _send))
+    del backends.down["eu.alara.test"]
+
+    for _ in range(3):
+        assert asyncio.run(pool.request("GET", _send)) == "us.alara.test"
+    assert backends.hits("eu.alara.test") == 1
+
+    now[0] += module.UNHEALTHY_RETRY_AFTER  # Probes are off: a request tries it again
+    assert asyncio.run(pool.request("GET", _send)) == "eu.alara.test"
+    assert pool.stats()["healthy"] == 2
+
+
+def test_every_endpoint_down_still_tries_the_least_failing_one(backends):
+    backends.down.update({"eu.alara.test": 503, "us.alara.test": 503})
+    pool = _pool()
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(pool.request("GET", _send))
+    assert pool.stats()["healthy"] == 0
+
+    del backends.down["us.alara.test"]
+    assert asyncio.run(pool.request("GET", _send)) == "us.alara.test"  # Tried after eu failed again
+    assert backends.hits("eu.alara.test") == 2
+    assert pool.stats()["healthy"] == 1
+
+
+def test_probes_bring_an_endpoint_back_and_prefer_the_faster_one(backends):
+    async def main():
+        backends.delay["us.alara.test"] = 0.02
+        backends.down["eu.alara.test"] = 503
+        pool = _pool(probe_interval=0.05)
+        try:
+            assert await pool.request("GET", _send) == "us.alara.test"  # Also starts the prober
+            assert not pool.endpoints[0].healthy
+            assert await pool.request("GET", _send) == "us.alara.test"
+
+            del backends.down["eu.alara.test"]
+            for _ in range(100):
+                if pool.endpoints[0].healthy:
+                    break
+                await asyncio.sleep(0.01)
+            assert pool.endpoints[0].healthy
+            assert backends.hits("eu.alara.test", "/") >= 2
+            assert await pool.request("GET", _send) == "eu.alara.test"
+        finally:
+            pool.stop_probes()
+
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import alara.bridge as bridge
+from alara.feeds import compute_delta, parse_feed_uri
+
+
+def _schema(parameters):
+    return {
+        "openapi": "3.1.0",
+        "info": {"title": "test", "version": "1"},
+        "paths": {"/api/ccxt/ticker": {"get": {
+            "operationId": "fetch_ticker", "tags": ["CCXT"],
+            "parameters": [{"name": name, "in": "query", "required": True, "schema": {"type": "string"}} for name in parameters],
+            "responses": {"200": {"description": "ok"}},
+        }}},
+    }
+
+
+@pytest.fixture
+def install_schema(monkeypatch, tmp_path):
+    monkeypatch.setenv("ALARA_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("ALARA_SCHEMA_CACHE", "0")
+
+    def install(parameters):
+        monkeypatch.setattr(bridge, "_schema", bridge._build_snapshot(_schema(parameters), None, None))
+    return install
+
+
+@pytest.mark.parametrize("exchange_param", ["exchange", "exchange_name", "exchange_id"])
+def test_feed_arguments_follow_the_declared_parameter_names(install_schema, exchange_param):
+    install_schema([exchange_param, "symbol"])
+    arguments = asyncio.run(bridge._feed_arguments("fetch_ticker", "binance", "BTC/USDT"))
+    assert arguments == {exchange_param: "binance", "symbol": "BTC/USDT"}
+
+
+def test_feed_arguments_reject_operations_without_matching_parameters(install_schema):
+    install_schema(["venue", "symbol"])
+    with pytest.raises(bridge.ToolError, match="exchange parameter"):
+        asyncio.run(bridge._feed_arguments("fetch_ticker", "binance", "BTC/USDT"))
+
+
+def test_parse_feed_uri_keeps_slashes_in_symbols():
+    assert parse_feed_uri("alara://ticker/Binance/BTC/USDT", {"ticker"}) == ("ticker", "binance", "BTC/USDT")
+    assert parse_feed_uri("alara://ticker/binance/BTC%2FUSDT", {"ticker"}) == ("ticker", "binance", "BTC/USDT")
+    assert parse_feed_uri("alara://trades/binance/BTC/USDT", {"ticker"}) is None
+
+
+def test_compute_delta_reports_changed_book_levels():
+    old = {"bids": [[100.0, 1.0], [99.0, 2.0]], "last": 1}
+    new = {"bids": [[100.0, 1.5]], "last": 1}
+    assert compute_delta(old, new, 10) == {"levels": {"bids": [[100.0, 1.5], [99.0, 0]]}}
+    assert compute_delta(old, new, 1) is None
+
+
+def test_stateless_servers_neither_advertise_nor_accept_subscriptions():
+    from mcp.server.lowlevel import NotificationOptions
+    from mcp.shared.exceptions import McpError
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    server = bridge.create_server(subscriptions=False)
+    assert not server.get_capabilities(NotificationOptions(), {}).resources.subscribe
+    assert bridge.create_server().get_capabilities(NotificationOptions(), {}).resources.subscribe
+
+    async def main():
+        async with create_connected_server_and_client_session(server) as client:
+            with pytest.raises(McpError, match="Method not found"):
+                await client.subscribe_resource("alara://ticker/binance/BTC/USDT")
+
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+
+import pytest
+
+import alara.bridge as bridge
+from alara.http_transport import MCPEndpoint
+
+
+class FakeSessionManager:
+    """Opens a session for every POST without a session id and echoes the session's API key."""
+
+    def __init__(self):
+        self._server_instances = {}
+        self._ids = itertools.count(1)
+        self.handled = 0
+        self.hold = None
+
+    async def handle_request(self, scope, receive, send):
+        self.handled += 1
+        if self.hold is not None:
+            await self.hold.wait()
+        headers = dict(scope["headers"])
+        session_id = headers.get(b"mcp-session-id", b"").decode()
+        if not session_id:
+            session_id = f"s{next(self._ids)}"
+            self._server_instances[session_id] = object()
+        elif session_id not in self._server_instances:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if scope["method"] == "DELETE":
+            del self._server_instances[session_id]
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"mcp-session-id", session_id.encode())]})
+        await send({"type": "http.response.body", "body": bridge.session_api_key.get().encode()})
+
+
+def _endpoint(manager, **options):
+    settings = {"max_inflight": 4, "queue_timeout": 1.0, "max_body": 1024}
+    settings.update(options)
+    return MCPEndpoint(manager, **settings)
+
+
+async def _request(endpoint, method="POST", api_key="key-a", session_id=None, content_length=None):
+    headers = []
+    if api_key:
+        headers.append((b"x-api-key", api_key.encode()))
+    if session_id:
+        headers.append((b"mcp-session-id", session_id.encode()))
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await endpoint({"type": "http", "method": method, "path": "/mcp", "headers": headers}, receive, send)
+    start = messages[0]
+    response_headers = dict(start.get("headers") or ())
+    return start["status"], response_headers.get(b"mcp-session-id", b"").decode(), messages[-1].get("body", b"")
+
+
+@pytest.fixture(autouse=True)
+def no_server_key(monkeypatch):
+    monkeypatch.setattr(bridge, "ALARA_API_KEY", None)
+
+
+def test_requests_without_a_key_are_rejected():
+    manager = FakeSessionManager()
+    status, _, _ = asyncio.run(_request(_endpoint(manager), api_key=None))
+    assert status == 401
+    assert manager.handled == 0
+
+
+def test_session_runs_with_the_key_that_opened_it():
+    async def main():
+        endpoint = _endpoint(FakeSessionManager())
+        status, session_id, _ = await _request(endpoint)
+        assert status == 200
+        assert await _request(endpoint, session_id=session_id) == (200, session_id, b"key-a")
+        status, _, _ = await _request(endpoint, api_key="key-b", session_id=session_id)
+        assert status == 404
+
+    asyncio.run(main())
+
+
+def test_session_ids_the_bridge_did_not_issue_are_rejected_with_any_key():
+    async def main():
+        manager = FakeSessionManager()
+        endpoint = _endpoint(manager)
+        manager._server_instances["s-other"] = object() # e.g. opened before a restart of the binding table
+        status, _, _ = await _request(endpoint, api_key="key-b", session_id="s-other")
+        assert status == 404
+        assert manager.handled == 0
+
+    asyncio.run(main())
+
+
+def test_ended_sessions_lose_their_binding():
+    async def main():
+        manager = FakeSessionManager()
+        endpoint = _endpoint(manager)
+        _, session_id, _ = await _request(endpoint)
+        del manager._server_instances[session_id] # Closed by the idle timeout
+        status, _, _ = await _request(endpoint, session_id=session_id)
+        assert status == 404
+        manager._server_instances[session_id] = object() # Even if the id were reused, it is no longer bound
+        status, _, _ = await _request(endpoint, session_id=session_id)
+        assert status == 404
+
+        _, session_id, _ = await _request(endpoint)
+        assert (await _request(endpoint, method="DELETE", session_id=session_id))[0] == 200
+        assert (await _request(endpoint, session_id=session_id))[0] == 404
+
+    asyncio.run(main())
+
+
+def test_many_live_sessions_keep_their_bindings():
+    async def main():
+        manager = FakeSessionManager()
+        endpoint = _endpoint(manager)
+        sessions = [(await _request(endpoint, api_key=f"key-{i}"))[1] for i in range(200)]
+        for i, session_id in enumerate(sessions):
+            assert (await _request(endpoint, api_key=f"key-{i}", session_id=session_id))[0] == 200
+            assert (await _request(endpoint, api_key="intruder", session_id=session_id))[0] == 404
+
+    asyncio.run(main())
+
+
+def test_oversized_bodies_are_rejected():
+    manager = FakeSessionManager()
+    status, _, _ = asyncio.run(_request(_endpoint(manager), content_length=1025))
+    assert status == 413
+    assert manager.handled == 0
+
+
+def test_requests_queued_past_the_timeout_get_503():
+    async def main():
+        manager = FakeSessionManager()
+        manager.hold = asyncio.Event()
+        endpoint = _endpoint(manager, max_inflight=1, queue_timeout=0.05)
+        first = asyncio.ensure_future(_request(endpoint))
+        await asyncio.sleep(0.01)
+        status, _, body = await _request(endpoint)
+        assert status == 503
+        assert endpoint.stats()["rejected_busy"] == 1
+        manager.hold.set()
+        assert (await first)[0] == 200
+
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+import logging.handlers
+import os
+
+import pytest
+
+from alara import logging_setup
+
+
+@pytest.fixture
+def file_handler(monkeypatch):
+    def configure(path, role="bridge", shared=None):
+        monkeypatch.setenv("ALARA_LOG_FILE", str(path))
+        logging_setup.configure_logging(role, shared)
+        return next(h for h in logging_setup._listener.handlers if isinstance(h, logging.FileHandler))
+    yield configure
+    logging_setup.shutdown_logging()
+
+
+def test_stdio_bridge_log_is_shared_and_rotated(file_handler, tmp_path):
+    handler = file_handler(tmp_path / "alara.log")
+    assert isinstance(handler, logging_setup.SharedRotatingFileHandler)
+    assert handler.maxBytes == 10 * 1024 * 1024
+
+
+@pytest.mark.skipif(logging_setup.fcntl is None, reason="needs flock")
+def test_writers_sharing_a_file_keep_it_under_the_size_cap(tmp_path):
+    path = str(tmp_path / "alara.log")
+    # Two handlers with their own file descriptions behave like two processes
+    writers = [logging_setup.SharedRotatingFileHandler(path, maxBytes=2000, backupCount=50) for _ in range(2)]
+    for writer in writers:
+        writer.setFormatter(logging.Formatter("%(message)s"))
+    for i in range(400):
+        writers[i % 2].handle(logging.makeLogRecord({"msg": f"record {i:04d} " + "x" * 20}))
+    for writer in writers:
+        writer.close()
+
+    files = [name for name in os.listdir(tmp_path) if name.startswith("alara.log") and not name.endswith(".lock")]
+    assert len(files) > 2
+    assert all(os.path.getsize(tmp_path / name) <= 2000 for name in files)
+    # Oldest backup first: every record landed in the file that was current when it was written
+    files.sort(key=lambda name: -int(name.rpartition(".")[2]) if name[-1].isdigit() else 0)
+    lines = [line for name in files for line in (tmp_path / name).read_text().splitlines()]
+    assert lines == [f"record {i:04d} " + "x" * 20 for i in range(400)]
+
+
+def test_pid_in_the_path_gives_a_private_rotated_file(file_handler, tmp_path):
+    handler = file_handler(tmp_path / "alara-{pid}.log")
+    assert isinstance(handler, logging.handlers.RotatingFileHandler)
+    assert handler.baseFilename == str(tmp_path / f"alara-{os.getpid()}.log")
+
+
+def test_single_process_roles_rotate_their_own_file(file_handler, tmp_path):
+    assert isinstance(file_handler(tmp_path / "d.log", "daemon", shared=False), logging.handlers.RotatingFileHandler)
+    assert logging_setup.default_log_file_path("daemon").endswith("alara-daemon.log")
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from alara.pagination import PaginationSpec, Paginator
+
+OFFSET = PaginationSpec(mode="offset", param="offset", limit_param="limit", max_limit=None)
+
+
+def _paginator(fetch_page, concurrency=4, max_records=1000):
+    return Paginator(OFFSET, fetch_page, max_records=max_records, max_pages=10, concurrency=concurrency)
+
+
+def test_later_page_failing_before_the_first_one_keeps_collected_pages():
+    async def fetch_page(arguments):
+        offset = arguments["offset"]
+        if offset == 2:
+            raise RuntimeError("boom") # Fails while page 0 is still in flight
+        await asyncio.sleep(0.05 if offset == 0 else 0.02)
+        return [{"id": offset}, {"id": offset + 1}]
+
+    result = asyncio.run(_paginator(fetch_page).run({"limit": 2}))
+    assert result["records"] == [{"id": 0}, {"id": 1}]
+    assert result["pages"] == 1
+    assert result["complete"] is False
+    assert result["error"] == "Stopped after 1 page(s): boom"
+    assert result["next"] == {"limit": 2, "offset": 2}
+
+
+def test_first_page_failure_is_the_calls_own_error():
+    async def fetch_page(arguments):
+        if arguments["offset"] == 0:
+            await asyncio.sleep(0.02)
+            raise RuntimeError("backend down")
+        return [{"id": arguments["offset"]}, {"id": arguments["offset"] + 1}]
+
+    with pytest.raises(RuntimeError, match="backend down"):
+        asyncio.run(_paginator(fetch_page).run({"limit": 2}))
+
+
+def test_prefetched_pages_stop_at_the_short_page():
+    calls = []
+
+    async def fetch_page(arguments):
+        calls.append(arguments["offset"])
+        offset = arguments["offset"]
+        return [{"id": i} for i in range(offset, min(offset + 2, 5))]
+
+    result = asyncio.run(_paginator(fetch_page, concurrency=2).run({"limit": 2}))
+    assert [record["id"] for record in result["records"]] == [0, 1, 2, 3, 4]
+    assert result["complete"] is True
+    assert "error" not in result
+
+
+def test_pages_failing_after_an_earlier_stop_are_not_reported():
+    async def fetch_page(arguments):
+        offset = arguments["offset"]
+        if offset:
+            await asyncio.sleep(0.01)
+            raise RuntimeError(f"page at {offset} failed")
+        await asyncio.sleep(0.03)
+        return [{"id": 0}, {"id": 1}]
+
+    result = asyncio.run(_paginator(fetch_page).run({"limit": 2}))
+    assert result["error"] == "Stopped after 1 page(s): page at 2 failed"
+    assert result["next"]["offset"] == 2
+
+
+def test_record_limit_cancels_the_pages_still_in_flight():
+    cancelled = []
+
+    async def fetch_page(arguments):
+        offset = arguments["offset"]
+        try:
+            await asyncio.sleep(0 if offset == 0 else 0.05)
+        except asyncio.CancelledError:
+            cancelled.append(offset)
+            raise
+        return [{"id": offset}, {"id": offset + 1}]
+
+    result = asyncio.run(_paginator(fetch_page, max_records=2).run({"limit": 2}))
+    assert result["count"] == 2
+    assert result["next"]["offset"] == 2
+    assert sorted(cancelled) == [2, 4, 6]
+
+
+def _trades_backend(backend):
+    from conftest import operation, query
+
+    def trades(request):
+        since, limit = int(request.url.params.get("since", 0)), int(request.url.params["limit"])
+        return [{"id": i, "timestamp": i} for i in range(since, min(since + limit, 30))]
+    backend.route("/api/trades", operation("fetch_trades", query("symbol", required=True), query("since", "integer"),
+                                          query("limit", "integer")), trades)
+
+
+def test_batch_items_walk_pages_like_direct_calls(backend):
+    from conftest import call_tool
+
+    _trades_backend(backend)
+    item = {"operationId": "fetch_trades", "arguments": {"symbol": "BTC/USDT", "since": 0, "limit": 5, "_fetch_all": True, "_max_records": 12}}
+    direct = call_tool("fetch_trades", dict(item["arguments"]))
+    batch = call_tool("alara_batch", {"items": [item, {"operationId": "fetch_trades", "arguments": {"symbol": "x", "_max_records": 3}}]})
+    first, second = batch["results"]
+    assert first["ok"] and first["result"] == direct
+    assert first["result"]["count"] == 12 and first["result"]["next"]["since"] == 12
+    assert not second["ok"] and "'_max_records' only applies together with '_fetch_all'" in second["error"]
+
+
+def test_ohlcv_windows_continue_across_a_gap(backend):
+    from conftest import call_tool, operation, query
+
+    minute = 60_000
+    candles = [[t * minute, 1, 1, 1, 1, 0] for t in range(40) if not 7 <= t <= 21]  # No trading for 15 minutes
+
+    def ohlcv(request):
+        since, limit = int(request.url.params["since"]), int(request.url.params["limit"])
+        until = int(request.url.params["until"])
+        return [candle for candle in candles if since <= candle[0] < since + limit * minute and candle[0] <= until]
+    backend.route("/api/ohlcv", operation("fetch_ohlcv", query("symbol", required=True), query("timeframe"), query("since", "integer"),
+                                         query("until", "integer"), query("limit", "integer")), ohlcv)
+
+    result = call_tool("fetch_ohlcv", {"symbol": "BTC/USDT", "timeframe": "1m", "since": 0, "until": 39 * minute, "limit": 5,
+                                       "_fetch_all": True})
+    assert [candle[0] // minute for candle in result["records"]] == [t for t in range(40) if not 7 <= t <= 21]
+    assert result["pages"] == 8
+    assert result["complete"] is True
+    assert "next" not in result
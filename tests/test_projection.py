@@ -0,0 +1,70 @@
+import pytest
+
+from alara.projection import ProjectionError, compile_filter, compile_projection
+
+TRADES = [
+    {"id": 1, "side": "buy", "price": "101.5", "amount": 2, "info": {"maker": True}},
+    {"id": 2, "side": "sell", "price": 99, "amount": 1, "info": {"maker": False}},
+    {"id": 3, "side": "buy", "price": 98, "amount": 5, "fee": None},
+]
+
+
+def _ids(expression):
+    predicate = compile_filter(expression)
+    return [trade["id"] for trade in TRADES if predicate(trade)]
+
+
+@pytest.mark.parametrize("expression, ids", [
+    ('side == "buy"', [1, 3]),
+    ("side == 'sell'", [2]),
+    ("price >= 99", [1, 2]),  # "101.5" compares as a number
+    ("price < 99 or amount == 1", [2, 3]),
+    ('side == "buy" and price > 100 or id == 2', [1, 2]),  # `and` binds tighter than `or`
+    ("info.maker == true", [1]),
+    ("fee == null", [3]),
+    ("fee != null", [1, 2]),  # A missing field differs from every value
+    ("missing > 1", []),
+    ("amount >= 1e0 AND amount <= 2", [1, 2]),
+    ("id != -1", [1, 2, 3]),
+])
+def test_filter_grammar(expression, ids):
+    assert _ids(expression) == ids
+
+
+@pytest.mark.parametrize("expression", [
+    "side",
+    'side == "buy" and',
+    'side = "buy"',
+    "price > amount",
+    'side == "buy" xor id == 1',
+    "== 1",
+    "price > 'unterminated",
+    "x" * 1001,
+])
+def test_malformed_filters_are_rejected(expression):
+    with pytest.raises(ProjectionError):
+        compile_filter(expression)
+
+
+def test_fields_filter_and_limit_on_a_record_list():
+    projection = compile_projection(["id", "info.maker"], 'side == "buy"', 1)
+    assert projection.apply({"trades": TRADES, "count": 3}) == {"trades": [{"id": 1, "info": {"maker": True}}], "count": 1}
+    assert TRADES[0]["price"] == "101.5"  # The input is not modified
+
+
+def test_fields_on_a_single_result():
+    book = {"bids": [[100, 1], [99, 2]], "asks": [[101, 1], [102, 3]], "timestamp": 1}
+    assert compile_projection("bids.0,asks.-1").apply(book) == {"bids": [[100, 1]], "asks": [[102, 3]]}
+    balance = {"free": {"USDT": 10, "BTC": 1}, "total": {"USDT": 12, "BTC": 1}}
+    assert compile_projection(["*.USDT"]).apply(balance) == {"free": {"USDT": 10}, "total": {"USDT": 12}}
+
+
+def test_invalid_projection_arguments():
+    with pytest.raises(ProjectionError):
+        compile_projection(limit=-1)
+    with pytest.raises(ProjectionError):
+        compile_projection(fields=["a..b"])
+    with pytest.raises(ProjectionError, match="list of records"):
+        compile_projection(filter_expression="a == 1").apply({"free": {}})
+    assert compile_projection() is None
+    assert compile_projection(["id"], None, "2") is compile_projection(["id"], None, 2)  # Compiled once
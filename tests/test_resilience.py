@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+
+from alara.resilience import CircuitOpenError, Resilience
+
+
+def _failing_send():
+    request = httpx.Request("POST", "http://backend/api")
+
+    async def send():
+        raise httpx.HTTPStatusError("boom", request=request, response=httpx.Response(502, request=request))
+    return send
+
+
+async def _ok():
+    return "ok"
+
+
+@pytest.fixture
+def resilience(monkeypatch):
+    monkeypatch.setenv("ALARA_CIRCUIT_FAILURES", "2")
+    monkeypatch.delenv("ALARA_RATE_LIMIT_EXCHANGE_RPS", raising=False)
+    return Resilience()
+
+
+def test_exchange_rate_limit_is_opt_in(resilience):
+    assert resilience.exchange_rps == 0
+    assert asyncio.run(resilience.run("fetch_ticker", "binance", "GET", _ok)) == "ok"
+    assert resilience.stats()["exchange_rates"] == {}
+
+
+def test_calls_without_an_exchange_get_a_circuit_per_operation(resilience):
+    async def main():
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await resilience.run("create_api_key", None, "POST", _failing_send())
+        with pytest.raises(CircuitOpenError):
+            await resilience.run("create_api_key", None, "POST", _ok)
+        assert await resilience.run("list_exchanges", None, "GET", _ok) == "ok"
+
+    asyncio.run(main())
+    circuits = resilience.stats()["circuits"]
+    assert circuits["operation:create_api_key"]["state"] == "open"
+    assert circuits["operation:list_exchanges"]["state"] == "closed"
+
+
+def test_breaker_opens_then_lets_one_probe_through(monkeypatch):
+    from alara import resilience as module
+    from alara.resilience import CircuitBreaker
+
+    now = [100.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    breaker.before_call("binance")
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.before_call("binance")
+    assert raised.value.retry_in == pytest.approx(30)
+
+    now[0] += 30
+    assert breaker.state == "half_open"
+    breaker.before_call("binance")  # The probe
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("binance")  # Only one at a time
+
+    breaker.record_failure()  # Probe failed: open for another full period
+    assert breaker.state == "open"
+    now[0] += 30
+    breaker.before_call("binance")
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call("binance")
+
+
+def test_probe_without_a_verdict_frees_the_half_open_slot(monkeypatch):
+    from alara import resilience as module
+    from alara.resilience import CircuitBreaker
+
+    now = [0.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5)
+    breaker.record_failure()
+    now[0] = 5
+    breaker.before_call("bybit")
+    breaker.release_probe()  # e.g. a 400 or a cancelled call
+    breaker.before_call("bybit")
+    assert breaker.state == "half_open"
+
+
+def test_idempotent_calls_are_retried_on_5xx(resilience, monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_base", 0.001)
+    monkeypatch.setattr(resilience, "circuit_failures", 5)
+    attempts = []
+    failing = _failing_send()
+
+    async def send():
+        attempts.append(1)
+        if len(attempts) < 3:
+            await failing()
+        return "ok"
+
+    assert asyncio.run(resilience.run("fetch_ticker", "binance", "GET", send)) == "ok"
+    assert resilience.stats()["retries"] == 2
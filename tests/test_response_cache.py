@@ -0,0 +1,35 @@
+from alara.response_cache import ResponseCache
+
+
+def test_read_started_before_a_write_is_not_cached():
+    cache = ResponseCache()
+    generation = cache.generation("binance")
+    cache.invalidate_scope("binance") # create_order on binance finished while the read was in flight
+    cache.set("balance", {"USDT": 100}, 5, "binance", generation)
+    assert cache.get("balance") is None
+    assert cache.stats()["discarded"] == 1
+
+
+def test_writes_to_other_exchanges_do_not_discard_reads():
+    cache = ResponseCache()
+    generation = cache.generation("binance")
+    cache.invalidate_scope("bybit")
+    cache.set("ticker", {"last": 1}, 5, "binance", generation)
+    assert cache.get("ticker").data == {"last": 1}
+
+
+def test_scope_less_reads_are_discarded_by_any_write():
+    cache = ResponseCache()
+    generation = cache.generation(None)
+    cache.invalidate_scope("bybit")
+    cache.set("exchanges", ["binance"], 5, None, generation)
+    assert cache.get("exchanges") is None
+
+
+def test_account_state_is_not_cached_by_default(monkeypatch):
+    monkeypatch.setenv("ALARA_RESPONSE_CACHE_TTLS", "fetch_my_trades=2")
+    cache = ResponseCache.from_env()
+    assert cache.ttl_for("fetch_balance", ()) == 0
+    assert cache.ttl_for("fetch_open_orders", ()) == 0
+    assert cache.ttl_for("fetch_my_trades", ()) == 2
+    assert cache.ttl_for("fetch_ticker", ()) == cache.default_ttl
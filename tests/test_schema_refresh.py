@@ -0,0 +1,50 @@
+import asyncio
+
+import alara.bridge as bridge
+
+
+def test_schema_refresher_does_not_capture_the_session_api_key(monkeypatch):
+    seen = []
+
+    async def refresh(delay):
+        seen.append(bridge.session_api_key.get())
+
+    monkeypatch.setattr(bridge, "_refresh_schema_periodically", refresh)
+    monkeypatch.setattr(bridge, "_schema_refresh_task", None)
+
+    async def session():
+        bridge.session_api_key.set("session-key")
+        bridge._start_schema_refresher(0.0)
+        await bridge._schema_refresh_task
+
+    asyncio.run(session())
+    assert seen == [None]
+
+
+def test_refresh_rewrites_the_disk_cache_only_when_the_schema_changed(backend, monkeypatch):
+    import threading
+
+    from alara import schema_cache
+    from conftest import operation
+
+    monkeypatch.setenv("ALARA_SCHEMA_CACHE", "1")
+    writes = []
+    save = schema_cache.save_cached_schema
+
+    def record_save(*args):
+        writes.append(threading.current_thread() is threading.main_thread())
+        save(*args)
+
+    monkeypatch.setattr(schema_cache, "save_cached_schema", record_save)
+    backend.route("/api/ticker", operation("fetch_ticker"), lambda request: {})
+
+    async def refresh_three_times():
+        assert await bridge._fetch_openapi_schema()
+        assert await bridge._fetch_openapi_schema()  # Same content: nothing to write
+        backend.route("/api/trades", operation("fetch_trades"), lambda request: [])
+        assert await bridge._fetch_openapi_schema()
+
+    asyncio.run(refresh_three_times())
+    assert writes == [False, False]  # Two writes, both off the event loop thread
+    cached = schema_cache.load_cached_schema(bridge.ALARA_PROD_URL)
+    assert set(cached["schema"]["paths"]) == {"/api/ticker", "/api/trades"}
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from alara.deadlines import CallTimeoutError, run_with_deadline, time_left
+from alara.singleflight import SingleFlight
+
+
+def test_shared_call_does_not_inherit_the_first_callers_deadline():
+    async def main():
+        flight = SingleFlight()
+        seen = []
+
+        async def fetch():
+            seen.append(time_left())
+            await asyncio.sleep(0.2)
+            return "ok"
+
+        short = asyncio.ensure_future(run_with_deadline(0.05, lambda: flight.do("k", fetch)))
+        await asyncio.sleep(0)
+        patient = asyncio.ensure_future(run_with_deadline(5, lambda: flight.do("k", fetch)))
+        with pytest.raises(CallTimeoutError):
+            await short
+        assert await patient == "ok"
+        assert seen == [None]
+        assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 1}
+
+    asyncio.run(main())
+
+
+def test_concurrent_callers_share_one_call_and_its_error():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("backend said no")
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)), return_exceptions=True)
+        assert len(calls) == 1
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+        assert await flight.do("k", _value) == "fresh"  # Finished flights are not reused
+
+    asyncio.run(main())
+
+
+async def _value():
+    return "fresh"
+
+
+def test_cancelling_one_waiter_leaves_the_call_running_for_the_others():
+    async def main():
+        flight = SingleFlight()
+        cancelled = []
+
+        async def fetch():
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return 42
+
+        first = asyncio.ensure_future(flight.do("k", fetch))
+        second = asyncio.ensure_future(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == 42
+        assert first.cancelled()
+        assert cancelled == []
+
+    asyncio.run(main())
+
+
+def test_call_is_cancelled_once_every_waiter_has_gone():
+    async def main():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.ensure_future(flight.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert flight.in_flight() == 0
+
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+import pytest
+
+from alara.validation import ArgumentValidationError, SchemaCompiler, compile_argument_validator
+
+
+def _validator(parameters, body_schema=None):
+    return compile_argument_validator(SchemaCompiler(), "create_order", parameters, body_schema)
+
+
+@pytest.mark.parametrize("schema, value, expected", [
+    ({"type": "integer"}, "42", 42),
+    ({"type": "integer"}, 5.0, 5),
+    ({"type": "number"}, "0.25", 0.25),
+    ({"type": "number"}, "7", 7),
+    ({"type": "boolean"}, " TRUE ", True),
+    ({"type": "string"}, 1700000000, "1700000000"),
+    ({"type": "array", "items": {"type": "number"}}, '["1", 2.5]', [1, 2.5]),
+    ({"type": "object", "properties": {"limit": {"type": "integer"}}}, '{"limit": "10"}', {"limit": 10}),
+    ({"type": ["string", "number"]}, "5", "5"),  # An exact match wins over a coercion
+    ({"type": "object", "properties": {"stop": {"type": "number", "nullable": True}}}, {"stop": None}, {"stop": None}),
+    ({"anyOf": [{"type": "integer"}, {"type": "string", "enum": ["max"]}]}, "max", "max"),
+    ({"type": "integer", "enum": [1, 5, 15]}, "15", 15),
+])
+def test_unambiguous_values_are_coerced(schema, value, expected):
+    assert _validator([("value", True, schema)])({"value": value}) == {"value": expected}
+
+
+@pytest.mark.parametrize("schema, value, message", [
+    ({"type": "integer"}, "1.5", "value: expected integer, got string"),
+    ({"type": "number"}, "nan", "value: expected number, got string"),
+    ({"type": "boolean"}, "yes", "value: expected boolean, got string"),
+    ({"type": "array"}, "[1,", "value: expected array, got string"),
+    ({"type": "object"}, "[1]", "value: expected object, got string"),
+    ({"type": "string", "enum": ["buy", "sell"]}, "hold", "value: must be one of ['buy', 'sell'], got 'hold'"),
+    ({"type": "integer", "minimum": 1}, "0", "value: must be >= 1, got 0"),
+])
+def test_values_that_cannot_be_coerced_are_reported(schema, value, message):
+    with pytest.raises(ArgumentValidationError) as raised:
+        _validator([("value", True, schema)])({"value": value})
+    assert raised.value.errors == [message]
+
+
+def test_body_errors_name_the_nested_path():
+    body = {
+        "type": "object",
+        "required": ["orders"],
+        "properties": {"orders": {"type": "array", "items": {
+            "type": "object", "required": ["amount"], "properties": {"amount": {"type": "number"}},
+        }}},
+    }
+    validate = _validator([("exchange", True, {"type": "string"})], body)
+    assert validate({"exchange": "binance", "orders": [{"amount": "1.5"}]}) == {"exchange": "binance", "orders": [{"amount": 1.5}]}
+    with pytest.raises(ArgumentValidationError) as raised:
+        validate({"exchange": "binance", "orders": [{"amount": 1}, {"amount": "lots"}, {}]})
+    assert raised.value.errors == [
+        "orders[1].amount: expected number, got string",
+        "orders[2].amount: required property is missing",
+    ]
+
+
+def test_null_optional_arguments_are_dropped_and_missing_required_ones_reported():
+    validate = _validator([("symbol", True, {"type": "string"}), ("limit", False, {"type": "integer"})])
+    assert validate({"symbol": "BTC/USDT", "limit": None}) == {"symbol": "BTC/USDT"}
+    with pytest.raises(ArgumentValidationError, match="symbol: required argument is missing"):
+        validate({"symbol": None})
+
+
+def test_order_arguments_are_checked_together():
+    validate = _validator([
+        ("symbol", True, {"type": "string"}),
+        ("side", True, {"type": "string", "enum": ["buy", "sell"]}),
+        ("amount", True, {"type": "number"}),
+    ])
+    assert validate({"symbol": "BTC/USDT", "side": "buy", "amount": "0.5"}) == {"symbol": "BTC/USDT", "side": "buy", "amount": 0.5}
+    with pytest.raises(ArgumentValidationError) as raised:
+        validate({"side": "hold", "amount": "abc"})
+    assert raised.value.errors == [
+        "symbol: required argument is missing",
+        "side: must be one of ['buy', 'sell'], got 'hold'",
+        "amount: expected number, got string",
+    ]
+    assert str(raised.value).startswith("Invalid arguments for tool 'create_order': symbol: required argument is missing; ")
+
+
+def test_underscore_control_arguments_pass_through_unchecked():
+    validate = _validator([("amount", True, {"type": "number"})])
+    control = {"_timeout": "5", "_fields": "id,price", "_fetch_all": "true"}
+    assert validate({"amount": 1, **control}) == {"amount": 1, **control}
+
+
+def test_bridge_rejects_bad_arguments_before_calling_the_backend(backend):
+    from conftest import call_tool, operation, query
+
+    backend.route("/api/orders", operation("create_order", query("symbol", required=True), query("amount", "number", required=True),
+                                          method="post"), lambda request: {"id": 7, "amount": float(request.url.params["amount"])})
+    error = call_tool("create_order", {"symbol": "BTC/USDT", "amount": "abc"})
+    assert error.startswith("Error:") and "amount: expected number, got string" in error
+    assert [request.url.path for request in backend.requests] == ["/openapi.json"]
+
+    assert call_tool("create_order", {"symbol": "BTC/USDT", "amount": "1.5", "_fields": "id", "_timeout": 5}) == {"id": 7}
+    assert dict(backend.requests[-1].url.params) == {"symbol": "BTC/USDT", "amount": "1.5"}